@@ -0,0 +1,109 @@
+"""
+Benchmark da disponibilidade em lote (psicólogos × dias)
+
+Monta um banco SQLite temporário com N psicólogos, agenda de segunda a
+sexta e algumas sessões por dia, e compara o padrão antigo do frontend (uma
+chamada por psicólogo por data) com services.availability_service resolvendo
+o período inteiro em lotes, sem cache e com o cache de disponibilidade quente.
+
+Uso:
+    python benchmarks/availability.py [--psychologists 200] [--days 30]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from core.database import Base, build_async_engine, build_engine, make_async_sessionmaker
+from models.models import Appointment, AppointmentStatus, Schedule, User, UserType
+from services.availability_service import (
+    AVAILABILITY_CHUNK_SIZE, availability_cache, daterange, load_availability
+)
+
+
+def seed(url: str, psychologists: int, start: date, days: int):
+    engine = build_engine(url)
+    Base.metadata.create_all(bind=engine)
+    random.seed(42)
+    users, schedules, appointments = [], [], []
+    for i in range(1, psychologists + 1):
+        users.append({"id": i, "email": f"psi{i}@bench.com", "name": f"Psi {i}", "type": UserType.PSICOLOGO})
+        for weekday in range(5):
+            schedules.append({"psychologist_id": i, "day_of_week": weekday, "start_time": "08:00",
+                              "end_time": "18:00", "slot_duration": 50, "is_active": True})
+        for day in daterange(start, start + timedelta(days=days - 1)):
+            for hour in random.sample(range(8, 17), 3):
+                appointments.append({"psychologist_id": i, "date": day, "time": f"{hour:02d}:00",
+                                     "duration": 50, "status": AppointmentStatus.AGENDADO})
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), users)
+        connection.execute(Schedule.__table__.insert(), schedules)
+    # Pelo ORM, para preencher start_at/end_at
+    from sqlalchemy.orm import Session
+    with Session(engine) as db:
+        db.add_all(Appointment(**values) for values in appointments)
+        db.commit()
+    engine.dispose()
+    return len(appointments)
+
+
+async def run(url: str, psychologists: int, start: date, days: int):
+    engine = build_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"))
+    sessions = make_async_sessionmaker(engine)
+    queries = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: queries.append(1))
+    end = start + timedelta(days=days - 1)
+    ids = list(range(1, psychologists + 1))
+
+    availability_cache.clear()
+    begin = time.perf_counter()
+    for psychologist_id in ids:
+        for day in daterange(start, end):
+            async with sessions() as db:
+                await load_availability(db, [psychologist_id], day, day)
+    per_call = time.perf_counter() - begin
+    per_call_queries = len(queries)
+
+    async def bulk_pass():
+        queries.clear()
+        begin = time.perf_counter()
+        async with sessions() as db:
+            for offset in range(0, len(ids), AVAILABILITY_CHUNK_SIZE):
+                await load_availability(db, ids[offset:offset + AVAILABILITY_CHUNK_SIZE], start, end)
+        return time.perf_counter() - begin, len(queries)
+
+    availability_cache.clear()
+    bulk, bulk_queries = await bulk_pass()
+    cached, cached_queries = await bulk_pass()
+
+    await engine.dispose()
+    print(f"  {'modo':<28}{'tempo (s)':>10}{'consultas':>11}")
+    print(f"  {'uma chamada por psi/dia':<28}{per_call:>10.2f}{per_call_queries:>11}")
+    print(f"  {'em lote':<28}{bulk:>10.2f}{bulk_queries:>11}")
+    print(f"  {'em lote, cache quente':<28}{cached:>10.2f}{cached_queries:>11}")
+    print(f"  em lote: {per_call / bulk:.1f}x mais rápido")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--psychologists", type=int, default=200)
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+
+    start = date.today() + timedelta(days=1)
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'availability.db')}"
+        booked = seed(url, args.psychologists, start, args.days)
+        print(f"\n{args.psychologists} psicólogos × {args.days} dias ({booked} sessões)")
+        asyncio.run(run(url, args.psychologists, start, args.days))
+
+
+if __name__ == "__main__":
+    main()
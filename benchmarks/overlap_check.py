@@ -0,0 +1,83 @@
+"""
+Benchmark da verificação de sobreposição com agendas cheias
+
+Preenche a agenda de um psicólogo com sessões seguidas (8h às 18h, todos
+os dias) e mede o custo de conferir um novo horário de duas formas:
+só com start_at < fim AND end_at > início (percorre o índice desde a
+primeira sessão do psicólogo) e com services.booking_service.overlap_clause,
+que limita a busca a MAX_APPOINTMENT_MINUTES antes do início.
+
+Uso:
+    python benchmarks/overlap_check.py [--sizes 1000 10000 100000] [--checks 500]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import and_, select
+from core.database import Base, build_engine
+from models.models import Appointment, AppointmentStatus
+from services.booking_service import overlap_clause
+
+FIRST_DAY = datetime(2030, 1, 7)
+
+
+def fill(engine, sessions: int):
+    rows = []
+    for n in range(sessions):
+        day, slot = divmod(n, 10)
+        start = FIRST_DAY + timedelta(days=day, hours=8 + slot)
+        rows.append({
+            "psychologist_id": 1, "patient_id": 1, "date": start.date(), "time": start.strftime("%H:%M"),
+            "duration": 50, "status": AppointmentStatus.AGENDADO,
+            "start_at": start, "end_at": start + timedelta(minutes=50),
+        })
+    with engine.begin() as connection:
+        connection.execute(Appointment.__table__.delete())
+        connection.execute(Appointment.__table__.insert(), rows)
+
+
+def measure(engine, predicate, sessions: int, checks: int) -> float:
+    random.seed(7)
+    days = sessions // 10
+    with engine.connect() as connection:
+        begin = time.perf_counter()
+        for _ in range(checks):
+            start = FIRST_DAY + timedelta(days=random.randrange(days), hours=random.randrange(8, 18), minutes=30)
+            connection.execute(select(Appointment.id).where(
+                Appointment.psychologist_id == 1,
+                Appointment.status == AppointmentStatus.AGENDADO,
+                predicate(start, start + timedelta(minutes=50))
+            )).all()
+        return (time.perf_counter() - begin) / checks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--checks", type=int, default=500)
+    args = parser.parse_args()
+
+    def unbounded(start, end):
+        return and_(Appointment.start_at < end, Appointment.end_at > start)
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = build_engine(f"sqlite:///{os.path.join(directory, 'overlap.db')}")
+        Base.metadata.create_all(bind=engine)
+        print(f"\n  {'sessões':>10}{'sem limite (µs)':>18}{'overlap_clause (µs)':>22}")
+        for size in args.sizes:
+            fill(engine, size)
+            plain = measure(engine, unbounded, size, args.checks)
+            bounded = measure(engine, overlap_clause, size, args.checks)
+            print(f"  {size:>10}{plain * 1e6:>18.0f}{bounded * 1e6:>22.0f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark da verificação de senhas (logins/s por núcleo)
+
+Simula rajadas de logins concorrentes e compara a verificação bcrypt feita
+direto no event loop com a feita pelo pool de services.password_service.
+Além do throughput, mede o maior atraso de um "tick" de 10 ms no event
+loop, que representa a latência imposta às demais requisições do worker.
+
+Uso:
+    python benchmarks/password_hashing.py [--logins 200] [--rounds 10 12] [--workers 4]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passlib.context import CryptContext
+import services.password_service as password_service
+from services.password_service import PasswordHasher
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def run_burst(verify, logins: int):
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await asyncio.gather(*(verify() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return elapsed, await lag_task
+
+
+async def benchmark(rounds: int, logins: int, workers: int):
+    context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+    password_service.pwd_context = context
+    hashed = context.hash("senha-de-teste")
+
+    async def inline():
+        context.verify("senha-de-teste", hashed)
+
+    hasher = PasswordHasher(workers=workers, max_queue=logins)
+
+    async def pooled():
+        await hasher.verify_and_update("senha-de-teste", hashed)
+
+    inline_time, inline_lag = await run_burst(inline, logins)
+    pooled_time, pooled_lag = await run_burst(pooled, logins)
+    hasher.shutdown()
+
+    print(f"\nbcrypt rounds={rounds} ({logins} logins, pool com {workers} threads)")
+    print(f"  {'modo':<12}{'logins/s':>10}{'por núcleo':>12}{'atraso máx. do loop':>22}")
+    print(f"  {'no loop':<12}{logins / inline_time:>10.1f}{logins / inline_time:>12.1f}{inline_lag * 1000:>19.0f} ms")
+    print(f"  {'pool':<12}{logins / pooled_time:>10.1f}{logins / pooled_time / workers:>12.1f}{pooled_lag * 1000:>19.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 12])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+    for rounds in args.rounds:
+        asyncio.run(benchmark(rounds, args.logins, args.workers))
+
+
+if __name__ == "__main__":
+    main()
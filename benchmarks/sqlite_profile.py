@@ -0,0 +1,115 @@
+"""
+Benchmark do perfil de produção do SQLite
+
+Compara o throughput de leituras e escritas concorrentes numa cópia do
+blurosiere.db com o perfil padrão (rollback journal) e com o perfil
+aplicado por core.database (WAL, synchronous=NORMAL, mmap, cache, busy_timeout).
+
+Uso:
+    python benchmarks/sqlite_profile.py [--seconds 5] [--readers 8] [--writers 2]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from core.database import SQLITE_PRAGMAS, install_sqlite_profile
+
+SOURCE_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "blurosiere.db")
+
+READ_QUERY = text(
+    "SELECT COUNT(*) FROM appointments WHERE psychologist_id = :pid AND status = 'AGENDADO'"
+)
+WRITE_QUERY = text(
+    "INSERT INTO notifications (user_id, type, title, message, read, created_at) "
+    "VALUES (:uid, 'sistema', 'benchmark', 'benchmark', 0, CURRENT_TIMESTAMP)"
+)
+
+
+def build_engine(path: str, tuned: bool):
+    engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False},
+        pool_size=32,
+        max_overflow=0
+    )
+    if tuned:
+        install_sqlite_profile(engine, SQLITE_PRAGMAS)
+    else:
+        install_sqlite_profile(engine, {"journal_mode": "DELETE", "synchronous": "FULL"})
+    return engine
+
+
+def run_workload(engine, seconds: float, readers: int, writers: int):
+    counters = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def reader():
+        done = errors = 0
+        while time.perf_counter() < deadline:
+            try:
+                with engine.connect() as connection:
+                    connection.execute(READ_QUERY, {"pid": 1}).scalar()
+                done += 1
+            except OperationalError:
+                errors += 1
+        with lock:
+            counters["reads"] += done
+            counters["errors"] += errors
+
+    def writer():
+        done = errors = 0
+        while time.perf_counter() < deadline:
+            try:
+                with engine.begin() as connection:
+                    connection.execute(WRITE_QUERY, {"uid": 1})
+                done += 1
+            except OperationalError:
+                errors += 1
+        with lock:
+            counters["writes"] += done
+            counters["errors"] += errors
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, tuned in (("padrão", False), ("produção", True)):
+            path = os.path.join(tmp, f"bench_{int(tuned)}.db")
+            shutil.copyfile(SOURCE_DB, path)
+            engine = build_engine(path, tuned)
+            results[name] = run_workload(engine, args.seconds, args.readers, args.writers)
+            engine.dispose()
+
+    print(f"{'perfil':<10} {'leituras/s':>12} {'escritas/s':>12} {'erros':>8}")
+    for name, counters in results.items():
+        print(
+            f"{name:<10} {counters['reads'] / args.seconds:>12.0f} "
+            f"{counters['writes'] / args.seconds:>12.0f} {counters['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
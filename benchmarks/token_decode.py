@@ -0,0 +1,54 @@
+"""
+Benchmark da verificação de access tokens (custo por requisição)
+
+Compara jwt.decode a cada requisição com services.auth_service.decode_access_token,
+que reaproveita a verificação de tokens já vistos. O cenário simula o
+frontend repetindo o mesmo token várias vezes durante a sua validade.
+
+Uso:
+    python benchmarks/token_decode.py [--requests 20000] [--tokens 50]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jose import jwt
+from services.auth_service import decode_access_token, token_cache
+from utils import ALGORITHM, SECRET_KEY, create_access_token
+
+
+def measure(decode, tokens, requests: int) -> float:
+    start = time.perf_counter()
+    for i in range(requests):
+        decode(tokens[i % len(tokens)])
+    return (time.perf_counter() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--tokens", type=int, default=50)
+    args = parser.parse_args()
+
+    tokens = [
+        create_access_token({"sub": f"usuario{i}@test.com", "uid": i, "typ": "paciente", "ver": 0})
+        for i in range(args.tokens)
+    ]
+    token_cache.clear()
+
+    plain = measure(lambda token: jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]), tokens, args.requests)
+    cached = measure(decode_access_token, tokens, args.requests)
+    stats = token_cache.snapshot()
+
+    print(f"\n{args.requests} requisições, {args.tokens} tokens distintos")
+    print(f"  {'modo':<14}{'µs/requisição':>16}")
+    print(f"  {'jwt.decode':<14}{plain * 1e6:>16.1f}")
+    print(f"  {'com cache':<14}{cached * 1e6:>16.1f}")
+    print(f"  taxa de acerto: {stats['hit_rate']:.2%}  ({plain / cached:.1f}x mais rápido)")
+
+
+if __name__ == "__main__":
+    main()
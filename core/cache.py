@@ -0,0 +1,94 @@
+"""
+Cache em memória com limite de tamanho (LRU) e expiração (TTL)
+
+Cada processo/worker tem a sua cópia; por isso o TTL limita por quanto
+tempo um valor pode ficar desatualizado quando a invalidação acontece em
+outro worker. Os caches nomeados ficam registrados para expor as
+estatísticas em /internal/caches.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 60.0, register: bool = True):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+        if register:
+            caches[name] = self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.stats["misses"] += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return default
+            self._data.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Grava um valor; ttl sobrepõe o padrão do cache (nunca o ultrapassa)"""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            if self._data.pop(key, _MISSING) is not _MISSING:
+                self.stats["invalidations"] += 1
+
+    def invalidate_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Remove as entradas cujo (chave, valor) satisfaz o predicado"""
+        with self._lock:
+            keys = [key for key, (value, _) in self._data.items() if predicate(key, value)]
+            for key in keys:
+                del self._data[key]
+            self.stats["invalidations"] += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                **self.stats,
+                "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+
+caches: Dict[str, TTLCache] = {}
+
+
+def snapshot_all() -> dict:
+    return {name: cache.snapshot() for name, cache in caches.items()}
@@ -1,18 +1,149 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from contextlib import asynccontextmanager
+from fastapi import Request
+from core.pool_metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool, instrument_engine, unregister
 
+import hashlib
+import itertools
 import os
+import threading
+import time
 
 SQLITE_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./blurosiere.db")
+IS_SQLITE = SQLITE_DATABASE_URL.startswith("sqlite")
 
-engine = create_engine(
-    SQLITE_DATABASE_URL, 
-    connect_args={"check_same_thread": False} if SQLITE_DATABASE_URL.startswith("sqlite") else {},
-    pool_pre_ping=True
-)
+# Perfil de produção do SQLite: WAL permite leitores concorrentes com um escritor,
+# busy_timeout faz o escritor esperar o lock em vez de falhar com "database is locked"
+SQLITE_TUNING = os.getenv("SQLITE_TUNING", "True").lower() == "true"
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-64000")),  # negativo = KiB
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+}
+SQLITE_WAL_CHECKPOINT_INTERVAL = int(os.getenv("SQLITE_WAL_CHECKPOINT_INTERVAL", "300"))
+
+# Dimensionamento do pool (por engine e por worker)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+
+# Réplicas de leitura (URLs separadas por vírgula) e janela de read-your-writes
+READ_REPLICA_URLS = [url.strip() for url in os.getenv("READ_REPLICA_URLS", "").split(",") if url.strip()]
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+
+def to_async_url(url: str) -> str:
+    """Converte a URL síncrona para o driver assíncrono equivalente (aiosqlite/asyncpg)"""
+    if url.startswith("sqlite+aiosqlite:") or url.startswith("postgresql+asyncpg:"):
+        return url
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    if url.startswith("postgres://"):
+        return "postgresql+asyncpg://" + url[len("postgres://"):]
+    if url.startswith("postgresql://") or url.startswith("postgresql+psycopg2://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    return url
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record, pragmas=None):
+    """Aplica o perfil de PRAGMAs em cada nova conexão do pool"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in (pragmas or SQLITE_PRAGMAS).items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def install_sqlite_profile(target_engine, pragmas=None):
+    """Registra o perfil de PRAGMAs no evento connect de um engine síncrono"""
+    event.listen(
+        target_engine,
+        "connect",
+        lambda conn, record: apply_sqlite_pragmas(conn, record, pragmas)
+    )
+
+
+def _is_memory_url(url: str) -> bool:
+    return ":memory:" in url or url.rstrip("/").endswith("sqlite:") or url.endswith("sqlite+aiosqlite://")
+
+
+def pool_options(url: str, poolclass) -> dict:
+    """Parâmetros do pool; bancos SQLite em memória mantêm o pool padrão"""
+    if _is_memory_url(url):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+
+
+def build_engine(url: str, name: str = None):
+    """Cria um engine síncrono com as opções padrão da aplicação"""
+    is_sqlite = url.startswith("sqlite")
+    new_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False} if is_sqlite else {},
+        pool_pre_ping=True,
+        **pool_options(url, InstrumentedQueuePool)
+    )
+    if is_sqlite and SQLITE_TUNING:
+        install_sqlite_profile(new_engine)
+    if name:
+        instrument_engine(new_engine, name)
+    return new_engine
+
+
+def build_async_engine(url: str, name: str = None):
+    """Cria um engine assíncrono com as opções padrão da aplicação"""
+    new_engine = create_async_engine(
+        url,
+        pool_pre_ping=True,
+        **pool_options(url, InstrumentedAsyncQueuePool)
+    )
+    if url.startswith("sqlite") and SQLITE_TUNING:
+        install_sqlite_profile(new_engine.sync_engine)
+    if name:
+        instrument_engine(new_engine.sync_engine, name)
+    return new_engine
+
+
+def make_async_sessionmaker(bind):
+    return async_sessionmaker(
+        bind=bind,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False
+    )
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(SQLITE_DATABASE_URL))
+
+engine = build_engine(SQLITE_DATABASE_URL, "primary")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Engine assíncrono: as esperas do banco liberam o event loop em vez de bloquear o worker
+async_engine = build_async_engine(ASYNC_DATABASE_URL, "primary_async")
+AsyncSessionLocal = make_async_sessionmaker(async_engine)
+
+
+def checkpoint_wal(mode: str = "PASSIVE"):
+    """Transfere o conteúdo do arquivo -wal para o banco, evitando que ele cresça sem limite"""
+    if not IS_SQLITE:
+        return None
+    with engine.connect() as connection:
+        return connection.execute(text(f"PRAGMA wal_checkpoint({mode})")).fetchone()
+
 Base = declarative_base()
 
 def get_db():
@@ -20,4 +151,128 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+@asynccontextmanager
+async def session_scope():
+    """Sessão curta para trabalho fora de uma requisição HTTP (websockets, tarefas)
+
+    A conexão volta ao pool ao sair do bloco: com commit se tudo correu bem,
+    com rollback em caso de erro. Conexões longas (como um websocket) nunca
+    devem segurar uma sessão entre uma operação e outra.
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
+
+
+# ============================================================
+# RÉPLICAS DE LEITURA
+# ============================================================
+
+class ReadReplicaRouter:
+    """Distribui sessões somente leitura entre as réplicas em round-robin
+
+    Depois que um cliente escreve, suas leituras voltam ao primário durante
+    sticky_seconds, para que ele não leia uma réplica ainda atrasada.
+    """
+
+    def __init__(self, urls=(), sticky_seconds: float = READ_YOUR_WRITES_SECONDS):
+        self.sticky_seconds = sticky_seconds
+        self.engines = [build_engine(url, f"replica_{i}") for i, url in enumerate(urls)]
+        self.async_engines = [
+            build_async_engine(to_async_url(url), f"replica_{i}_async") for i, url in enumerate(urls)
+        ]
+        self.sessions = [sessionmaker(autocommit=False, autoflush=False, bind=e) for e in self.engines]
+        self.async_sessions = [make_async_sessionmaker(e) for e in self.async_engines]
+        self._counter = itertools.count()
+        self._recent_writes = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.engines)
+
+    def mark_write(self, key):
+        if not key or not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._recent_writes[key] = now + self.sticky_seconds
+            if len(self._recent_writes) > 10000:
+                self._recent_writes = {k: v for k, v in self._recent_writes.items() if v > now}
+
+    def is_sticky(self, key) -> bool:
+        if not key:
+            return False
+        expires = self._recent_writes.get(key)
+        return expires is not None and expires > time.monotonic()
+
+    def pick(self, key=None) -> int:
+        """Índice da réplica a usar, ou -1 para o primário"""
+        if not self.enabled or self.is_sticky(key):
+            return -1
+        return next(self._counter) % len(self.engines)
+
+    def dispose(self):
+        """Fecha os engines síncronos; os assíncronos só soltam o pool (use adispose)"""
+        for i, replica in enumerate(self.engines):
+            replica.dispose()
+            unregister(f"replica_{i}")
+        for i, replica in enumerate(self.async_engines):
+            # Fechar conexões assíncronas exige o event loop; aqui o pool é apenas descartado
+            replica.sync_engine.dispose(close=False)
+            unregister(f"replica_{i}_async")
+
+    async def adispose(self):
+        """Fecha todas as conexões das réplicas, síncronas e assíncronas"""
+        for replica in self.async_engines:
+            await replica.dispose()
+        self.dispose()
+
+
+read_replicas = ReadReplicaRouter(READ_REPLICA_URLS)
+
+
+def configure_read_replicas(urls, sticky_seconds: float = READ_YOUR_WRITES_SECONDS):
+    """Substitui o conjunto de réplicas (usado em testes e ferramentas)"""
+    global read_replicas
+    read_replicas.dispose()
+    read_replicas = ReadReplicaRouter(urls, sticky_seconds)
+    return read_replicas
+
+
+def read_your_writes_key(request: Request):
+    """Identifica o cliente pela credencial enviada, sem decodificar o token"""
+    authorization = request.headers.get("authorization")
+    if not authorization:
+        return None
+    return hashlib.sha256(authorization.encode()).hexdigest()
+
+
+def mark_recent_write(request: Request):
+    """Fixa as próximas leituras deste cliente no primário (read-your-writes)"""
+    read_replicas.mark_write(read_your_writes_key(request))
+
+
+def get_read_db(request: Request):
+    index = read_replicas.pick(read_your_writes_key(request))
+    db = SessionLocal() if index < 0 else read_replicas.sessions[index]()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db(request: Request):
+    index = read_replicas.pick(read_your_writes_key(request))
+    maker = AsyncSessionLocal if index < 0 else read_replicas.async_sessions[index]
+    async with maker() as db:
+        yield db
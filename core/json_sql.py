@@ -0,0 +1,44 @@
+"""
+Expressões SQL sobre colunas JSON
+
+Compiladas de acordo com o dialeto, para que os filtros em arrays JSON
+rodem no banco em vez de decodificar cada linha em Python.
+"""
+from sqlalchemy import Boolean
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement, literal
+
+
+class json_array_contains(FunctionElement):
+    """Verdadeiro quando o array JSON da coluna contém o valor informado"""
+    type = Boolean()
+    name = "json_array_contains"
+    inherit_cache = True
+
+    def __init__(self, column, value):
+        super().__init__(column, literal(value))
+
+
+@compiles(json_array_contains)
+def _compile_generic(element, compiler, **kw):
+    # Fallback genérico: procura o valor serializado dentro do texto do array
+    column, value = list(element.clauses)
+    return "(%s LIKE '%%' || '\"' || %s || '\"' || '%%')" % (
+        compiler.process(column, **kw), compiler.process(value, **kw)
+    )
+
+
+@compiles(json_array_contains, "sqlite")
+def _compile_sqlite(element, compiler, **kw):
+    column, value = list(element.clauses)
+    return "EXISTS (SELECT 1 FROM json_each(%s) WHERE json_each.value = %s)" % (
+        compiler.process(column, **kw), compiler.process(value, **kw)
+    )
+
+
+@compiles(json_array_contains, "postgresql")
+def _compile_postgresql(element, compiler, **kw):
+    column, value = list(element.clauses)
+    return "(CAST(%s AS JSONB) @> jsonb_build_array(%s))" % (
+        compiler.process(column, **kw), compiler.process(value, **kw)
+    )
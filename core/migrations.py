@@ -0,0 +1,429 @@
+"""
+Migrações versionadas do schema
+
+Cada migração recebe o engine síncrono e deve ser idempotente (IF NOT EXISTS,
+checkfirst, backfill só de linhas pendentes), para que uma execução
+interrompida possa ser repetida com segurança. A versão aplicada fica
+registrada na tabela schema_version; na inicialização basta comparar
+MAX(version) com a última migração conhecida.
+"""
+import json
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Callable, List, Optional
+
+from sqlalchemy import (
+    Column, DateTime, Integer, MetaData, String, Table, bindparam, inspect, select, func, update
+)
+from sqlalchemy import column as sql_column, table as sql_table
+from sqlalchemy.sql import sqltypes
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+from sqlalchemy.schema import CreateIndex
+
+from core.database import Base, engine
+
+logger = logging.getLogger(__name__)
+
+version_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    version_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String),
+    Column("applied_at", DateTime),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    upgrade: Callable
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str):
+    """Registra uma função como migração de uma versão específica"""
+    def decorator(fn):
+        if any(m.version == version for m in MIGRATIONS):
+            raise ValueError(f"Migração {version} registrada duas vezes")
+        MIGRATIONS.append(Migration(version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return fn
+    return decorator
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def get_schema_version(target_engine=None) -> int:
+    """Versão atual do banco: uma única consulta, sem refletir o metadata"""
+    bind = target_engine or engine
+    try:
+        with bind.connect() as connection:
+            return connection.execute(select(func.max(schema_version.c.version))).scalar() or 0
+    except (OperationalError, ProgrammingError):
+        # Tabela de versões ainda não existe: banco anterior ao sistema de migrações
+        return 0
+
+
+def run_migrations(target_engine=None, target: Optional[int] = None) -> List[int]:
+    """Aplica, em ordem, as migrações pendentes até a versão alvo"""
+    bind = target_engine or engine
+    version_metadata.create_all(bind=bind)
+    current = get_schema_version(bind)
+    target = latest_version() if target is None else target
+    applied = []
+
+    for step in MIGRATIONS:
+        if step.version <= current or step.version > target:
+            continue
+        logger.info(f"Aplicando migração {step.version}: {step.description}")
+        step.upgrade(bind)
+        try:
+            with bind.begin() as connection:
+                connection.execute(schema_version.insert().values(
+                    version=step.version,
+                    description=step.description,
+                    applied_at=datetime.now(timezone.utc)
+                ))
+        except IntegrityError:
+            # Outro worker aplicou a mesma migração em paralelo
+            pass
+        applied.append(step.version)
+
+    return applied
+
+
+def ensure_schema(target_engine=None, auto_migrate: bool = True) -> int:
+    """Verificação de inicialização: compara a versão do banco com a última migração"""
+    bind = target_engine or engine
+    current = get_schema_version(bind)
+    latest = latest_version()
+    if current >= latest:
+        return current
+    if not auto_migrate:
+        raise RuntimeError(
+            f"Schema na versão {current}, esperado {latest}. Execute: python migrate_db.py"
+        )
+    run_migrations(bind)
+    return latest_version()
+
+
+# ============================================================
+# AUXILIARES PARA MIGRAÇÕES
+# ============================================================
+
+def create_index_online(bind, index):
+    """Cria um índice sem bloquear escritas quando o banco suporta
+
+    No PostgreSQL usa CREATE INDEX CONCURRENTLY (fora de transação). No SQLite
+    a criação é feita direto; em modo WAL os leitores continuam atendidos.
+    """
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=bind.dialect))
+    if bind.dialect.name == "postgresql":
+        ddl = ddl.replace("INDEX", "INDEX CONCURRENTLY", 1)
+    with bind.connect() as connection:
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        connection.exec_driver_sql(ddl)
+
+
+def add_column(bind, table_name: str, column: Column):
+    """Adiciona uma coluna a uma tabela existente, se ainda não existir"""
+    existing = {col["name"] for col in inspect(bind).get_columns(table_name)}
+    if column.name in existing:
+        return
+    ddl = f'ALTER TABLE {table_name} ADD COLUMN "{column.name}" {column.type.compile(dialect=bind.dialect)}'
+    if column.server_default is not None:
+        ddl += f" DEFAULT {column.server_default.arg}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+    with bind.begin() as connection:
+        connection.exec_driver_sql(ddl)
+
+
+def backfill_in_batches(bind, table, pending, compute, batch_size: int = 500, columns=None) -> int:
+    """Preenche linhas pendentes em lotes curtos, com um commit por lote
+
+    - pending: condição que identifica as linhas ainda não preenchidas
+    - compute: recebe a linha (Row) e devolve o dict de valores a gravar
+    - columns: colunas lidas (padrão: todas); restrinja-as quando o modelo já
+      tiver colunas que versões posteriores ainda vão criar
+    Cada lote percorre a tabela pela chave primária, mantendo as transações
+    pequenas para não segurar o lock de escrita em tabelas grandes.
+    """
+    total = 0
+    last_id = 0
+    while True:
+        with bind.begin() as connection:
+            rows = connection.execute(
+                select(*(columns or table.c)).where(pending, table.c.id > last_id)
+                .order_by(table.c.id).limit(batch_size)
+            ).fetchall()
+            if not rows:
+                break
+            for row in rows:
+                values = compute(row)
+                if values:
+                    connection.execute(
+                        table.update().where(table.c.id == row.id).values(**values)
+                    )
+            last_id = rows[-1].id
+            total += len(rows)
+    return total
+
+
+# ============================================================
+# MIGRAÇÕES
+# ============================================================
+
+@migration(1, "schema inicial")
+def _create_initial_schema(bind):
+    import models.models  # noqa: F401 - registra os modelos no metadata
+    Base.metadata.create_all(bind=bind)
+
+
+def create_indexes_by_name(bind, table_name: str, names):
+    """Cria os índices do modelo com os nomes informados (migrações antigas não
+    devem depender de índices adicionados por versões posteriores)"""
+    for index in Base.metadata.tables[table_name].indexes:
+        if index.name in names:
+            create_index_online(bind, index)
+
+
+@migration(2, "índices compostos das consultas mais frequentes")
+def _create_hot_path_indexes(bind):
+    import models.models  # noqa: F401
+    create_indexes_by_name(bind, "patients", {"ix_patients_psychologist_id", "ix_patients_email_psychologist"})
+    create_indexes_by_name(bind, "appointments", {"ix_appointments_psychologist_date_status", "ix_appointments_patient_id"})
+    create_indexes_by_name(bind, "requests", {"ix_requests_psychologist_status", "ix_requests_patient_email"})
+    create_indexes_by_name(bind, "notifications", {"ix_notifications_user_read_created"})
+    create_indexes_by_name(bind, "chat_messages", {"ix_chat_messages_user_created"})
+
+
+@migration(3, "start_at/end_at dos agendamentos")
+def _add_appointment_bounds(bind):
+    from models.models import Appointment, appointment_bounds
+    table = Appointment.__table__
+    add_column(bind, "appointments", Column("start_at", DateTime))
+    add_column(bind, "appointments", Column("end_at", DateTime))
+
+    def compute(row):
+        start_at, end_at = appointment_bounds(row.date, row.time, row.duration)
+        return {"start_at": start_at, "end_at": end_at} if start_at else None
+
+    backfill_in_batches(
+        bind,
+        table,
+        table.c.start_at.is_(None),
+        compute,
+        columns=(table.c.id, table.c.date, table.c.time, table.c.duration)
+    )
+    create_indexes_by_name(bind, "appointments", {"ix_appointments_psychologist_start", "ix_appointments_patient_start"})
+
+
+JSON_COLUMNS = (
+    ("requests", "preferred_dates", "[]"),
+    ("requests", "preferred_times", "[]"),
+    ("chat_messages", "meta_data", "{}"),
+    ("audit_logs", "changes", "{}"),
+    ("reports", "data", "{}"),
+)
+
+
+def wrap_invalid_json(connection, table_name: str, column: str, empty: str) -> int:
+    """Embrulha em array/objeto os valores de texto que não são JSON válido"""
+    target = sql_table(table_name, sql_column("id"), sql_column(column))
+    invalid = []
+    for row_id, raw in connection.execute(select(target.c.id, target.c[column])):
+        try:
+            json.loads(raw)
+        except (TypeError, ValueError):
+            wrapped = [raw] if empty == "[]" else {"raw": raw}
+            invalid.append({"row_id": row_id, "wrapped": json.dumps(wrapped)})
+    if invalid:
+        connection.execute(
+            update(target).where(target.c.id == bindparam("row_id")).values({column: bindparam("wrapped")}),
+            invalid
+        )
+    return len(invalid)
+
+
+@migration(4, "colunas JSON nativas e tabela schedule_exceptions")
+def _native_json_and_schedule_exceptions(bind):
+    from models.models import ScheduleException
+
+    # JSON em texto continua legível pelo tipo JSON; basta normalizar vazios e inválidos
+    inspector = inspect(bind)
+    with bind.begin() as connection:
+        for table_name, column, empty in JSON_COLUMNS:
+            if bind.dialect.name == "postgresql":
+                column_type = next(col["type"] for col in inspector.get_columns(table_name) if col["name"] == column)
+                if isinstance(column_type, sqltypes.JSON):
+                    # Já convertida numa execução anterior
+                    continue
+            connection.exec_driver_sql(
+                f"UPDATE {table_name} SET {column} = '{empty}' WHERE {column} IS NULL OR {column} = ''"
+            )
+            if bind.dialect.name == "sqlite":
+                # Texto que não é JSON válido é preservado dentro de um array/objeto
+                expression = f"json_array({column})" if empty == "[]" else f"json_object('raw', {column})"
+                connection.exec_driver_sql(
+                    f"UPDATE {table_name} SET {column} = {expression} WHERE json_valid({column}) = 0"
+                )
+            elif bind.dialect.name == "postgresql":
+                # O cast aborta no primeiro texto inválido: embrulha antes, como no SQLite
+                wrap_invalid_json(connection, table_name, column, empty)
+                connection.exec_driver_sql(
+                    f"ALTER TABLE {table_name} ALTER COLUMN {column} TYPE JSON USING {column}::json"
+                )
+
+    # Exceções da agenda: do array JSON em schedules.exceptions para linhas indexadas por data
+    ScheduleException.__table__.create(bind=bind, checkfirst=True)
+    create_indexes_by_name(bind, "schedule_exceptions", {
+        "ix_schedule_exceptions_psychologist_date", "ix_schedule_exceptions_schedule_id"
+    })
+    if "exceptions" not in {col["name"] for col in inspect(bind).get_columns("schedules")}:
+        return
+
+    with bind.begin() as connection:
+        rows = connection.exec_driver_sql(
+            "SELECT id, psychologist_id, exceptions FROM schedules "
+            "WHERE exceptions IS NOT NULL AND exceptions NOT IN ('', '[]')"
+        ).fetchall()
+        for schedule_id, psychologist_id, raw in rows:
+            try:
+                dates = json.loads(raw)
+            except ValueError:
+                dates = []
+            entries = []
+            for value in dict.fromkeys(dates if isinstance(dates, list) else []):
+                try:
+                    entries.append({
+                        "psychologist_id": psychologist_id,
+                        "schedule_id": schedule_id,
+                        "date": date.fromisoformat(str(value)),
+                        "reason": "",
+                    })
+                except ValueError:
+                    logger.warning(f"Exceção de agenda ignorada (schedule {schedule_id}): {value!r}")
+            if entries:
+                connection.execute(ScheduleException.__table__.insert(), entries)
+        connection.exec_driver_sql("ALTER TABLE schedules DROP COLUMN exceptions")
+
+
+@migration(5, "índices para paginação por cursor")
+def _create_keyset_indexes(bind):
+    import models.models  # noqa: F401
+    create_indexes_by_name(bind, "requests", {"ix_requests_psychologist_created", "ix_requests_patient_email_created"})
+    create_indexes_by_name(bind, "notifications", {"ix_notifications_user_created"})
+
+
+@migration(6, "versão dos tokens de acesso por usuário")
+def _add_user_token_version(bind):
+    add_column(bind, "users", Column("token_version", Integer, server_default="0", nullable=False))
+    create_indexes_by_name(bind, "users", {"ix_users_token_version"})
+
+
+@migration(7, "refresh tokens com hash e rotação no lugar")
+def _hash_refresh_tokens(bind):
+    from models.models import RefreshToken
+    table = RefreshToken.__table__
+    add_column(bind, "refresh_tokens", Column("token_hash", String(64)))
+    add_column(bind, "refresh_tokens", Column("rotated_at", DateTime))
+    columns = {col["name"] for col in inspect(bind).get_columns("refresh_tokens")}
+
+    # Sessões encerradas não precisam ser migradas
+    with bind.begin() as connection:
+        connection.execute(table.delete().where(
+            (table.c.is_revoked == True) |
+            (table.c.expires_at < datetime.now(timezone.utc).replace(tzinfo=None))
+        ))
+
+    if "token" in columns:
+        token = Column("token", String)
+        legacy = Table("refresh_tokens", MetaData(), Column("id", Integer, primary_key=True), token,
+                       Column("token_hash", String(64)))
+        backfill_in_batches(
+            bind,
+            legacy,
+            legacy.c.token_hash.is_(None) & legacy.c.token.isnot(None),
+            lambda row: {"token_hash": RefreshToken.hash_token(row.token)},
+            columns=(legacy.c.id, legacy.c.token)
+        )
+        with bind.begin() as connection:
+            connection.exec_driver_sql("DROP INDEX IF EXISTS ix_refresh_tokens_token")
+            connection.exec_driver_sql("ALTER TABLE refresh_tokens DROP COLUMN token")
+
+    with bind.begin() as connection:
+        connection.execute(table.delete().where(table.c.token_hash.is_(None)))
+    create_indexes_by_name(bind, "refresh_tokens", {
+        "ix_refresh_tokens_token_hash", "ix_refresh_tokens_user_created", "ix_refresh_tokens_expires_at"
+    })
+
+
+@migration(8, "índices da disponibilidade em lote")
+def _create_availability_indexes(bind):
+    import models.models  # noqa: F401
+    create_indexes_by_name(bind, "schedules", {"ix_schedules_psychologist_day"})
+    create_indexes_by_name(bind, "users", {"ix_users_type_specialty"})
+
+
+@migration(9, "índice único dos horários agendados")
+def _create_active_slot_index(bind):
+    from models.models import Appointment, AppointmentStatus
+    table = Appointment.__table__
+    active = (table.c.status == AppointmentStatus.AGENDADO) & table.c.start_at.isnot(None)
+    with bind.begin() as connection:
+        # Reservas duplicadas anteriores ao índice: mantém a mais antiga de cada horário
+        kept = select(func.min(table.c.id)).where(active).group_by(table.c.psychologist_id, table.c.start_at)
+        duplicates = connection.execute(
+            select(table.c.id).where(active, table.c.id.notin_(kept))
+        ).scalars().all()
+        if duplicates:
+            logger.warning(f"Cancelando agendamentos em horário duplicado: {duplicates}")
+            connection.execute(
+                table.update().where(table.c.id.in_(duplicates)).values(status=AppointmentStatus.CANCELADO)
+            )
+    create_indexes_by_name(bind, "appointments", {"ix_appointments_active_slot"})
+
+
+@migration(10, "séries de agendamentos recorrentes")
+def _create_appointment_series(bind):
+    from models.models import AppointmentSeries
+    AppointmentSeries.__table__.create(bind=bind, checkfirst=True)
+    add_column(bind, "appointments", Column("series_id", Integer))
+    create_indexes_by_name(bind, "appointments", {"ix_appointments_series_start"})
+
+
+@migration(11, "log de mudanças dos agendamentos")
+def _create_appointment_changes(bind):
+    from models.models import AppointmentChange
+    AppointmentChange.__table__.create(bind=bind, checkfirst=True)
+
+
+@migration(12, "detecção de reuso de refresh tokens")
+def _add_refresh_token_previous_hash(bind):
+    import models.models  # noqa: F401
+    add_column(bind, "refresh_tokens", Column("previous_token_hash", String(64)))
+    create_indexes_by_name(bind, "refresh_tokens", {"ix_refresh_tokens_previous_hash"})
+
+
+@migration(13, "revogação da URL da agenda em iCalendar")
+def _add_calendar_token_nonce(bind):
+    add_column(bind, "users", Column("calendar_token_nonce", String(32)))
+
+
+@migration(14, "retenção do log de mudanças dos agendamentos")
+def _create_change_log_state(bind):
+    from models.models import ChangeLogState
+    ChangeLogState.__table__.create(bind=bind, checkfirst=True)
+
+
+@migration(15, "versão monotônica da agenda em iCalendar")
+def _add_calendar_version(bind):
+    add_column(bind, "users", Column("calendar_version", Integer, server_default="0", nullable=False))
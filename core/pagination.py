@@ -0,0 +1,164 @@
+"""
+Paginação por cursor (keyset)
+
+A página seguinte é buscada a partir do último (sort_key, id) visto, com
+WHERE (sort_key, id) > (valor, id) em vez de OFFSET, de modo que a página N
+custa o mesmo que a primeira quando existe índice em (filtro, sort_key).
+O cursor é opaco para o cliente: JSON em base64 devolvido no cabeçalho
+X-Next-Cursor; o corpo da resposta continua sendo a lista.
+
+Listas que antes devolviam todas as linhas usam legacy_page_params: sem
+cursor nem limit a resposta continua completa, marcada com o cabeçalho
+Deprecation, até os clientes migrarem para a paginação por cursor.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Optional
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import and_, or_
+
+from constants import PAGINATION
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+@dataclass
+class PageParams:
+    cursor: Optional[str]
+    limit: int
+    # Compatibilidade: devolve todas as linhas, sem LIMIT nem cursor
+    unbounded: bool = False
+
+
+def page_params_with(default_limit: int):
+    """Dependência de paginação com limite padrão próprio do endpoint"""
+    def dependency(
+        cursor: Optional[str] = Query(None, description="Cursor devolvido em X-Next-Cursor"),
+        limit: int = Query(default_limit, ge=1, le=PAGINATION["MAX_LIMIT"])
+    ) -> PageParams:
+        return PageParams(cursor=cursor, limit=limit)
+    return dependency
+
+
+# Dependência com os parâmetros de paginação da requisição
+page_params = page_params_with(PAGINATION["DEFAULT_LIMIT"])
+
+
+def legacy_page_params(
+    cursor: Optional[str] = Query(None, description="Cursor devolvido em X-Next-Cursor"),
+    limit: Optional[int] = Query(
+        None, ge=1, le=PAGINATION["MAX_LIMIT"],
+        description="Tamanho da página; sem cursor nem limit a lista vem completa (obsoleto)"
+    )
+) -> PageParams:
+    """Paginação para listas que antes não eram paginadas"""
+    return PageParams(
+        cursor=cursor,
+        limit=limit or PAGINATION["DEFAULT_LIMIT"],
+        unbounded=cursor is None and limit is None
+    )
+
+
+def _dump_value(value: Any):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    if hasattr(value, "value"):  # enums
+        return value.value
+    return value
+
+
+def _load_value(value: Any):
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+    return value
+
+
+def encode_cursor(sort_value: Any, row_id: int) -> str:
+    payload = json.dumps([_dump_value(sort_value), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Devolve (sort_value, id); cursores malformados viram 400"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return _load_value(sort_value), int(row_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Cursor de paginação inválido")
+
+
+def keyset(query, params: PageParams, id_column, sort_column=None, descending: bool = False):
+    """Aplica filtro do cursor, ordenação (sort_key, id) e LIMIT à consulta
+
+    Funciona tanto com select() quanto com Query. Linhas com sort_key NULL
+    vêm primeiro nas duas direções; depois delas o filtro do cursor é um
+    intervalo sobre o índice. Busca limit + 1 linhas para saber se há
+    próxima página (ver finish_page).
+    """
+    if params.cursor and not params.unbounded:
+        last_value, last_id = decode_cursor(params.cursor)
+        query = query.filter(_after(sort_column, id_column, last_value, last_id, descending))
+
+    if descending:
+        order = [id_column.desc()]
+        if sort_column is not None:
+            order.insert(0, sort_column.desc().nulls_first())
+    else:
+        order = [id_column.asc()]
+        if sort_column is not None:
+            order.insert(0, sort_column.asc().nulls_first())
+    if params.unbounded:
+        return query.order_by(*order)
+    return query.order_by(*order).limit(params.limit + 1)
+
+
+def _after(sort_column, id_column, last_value, last_id, descending: bool):
+    """Condição "vem depois de (last_value, last_id)" na ordem da paginação"""
+    id_after = id_column < last_id if descending else id_column > last_id
+    if sort_column is None:
+        return id_after
+    if last_value is None:
+        return or_(and_(sort_column.is_(None), id_after), sort_column.isnot(None))
+    # Forma "sort <= v AND (sort < v OR id < last)" permite busca por intervalo no índice
+    if descending:
+        return and_(sort_column <= last_value, or_(sort_column < last_value, id_after))
+    return and_(sort_column >= last_value, or_(sort_column > last_value, id_after))
+
+
+def offset_page(query, params: PageParams, offset: int, id_column, sort_column=None,
+                descending: bool = False, response: Optional[Response] = None):
+    """Paginação antiga por OFFSET, mantida para clientes que ainda enviam page/offset
+
+    Mesma ordenação de keyset(); marca a resposta com o cabeçalho Deprecation.
+    """
+    if response is not None:
+        response.headers["Deprecation"] = "true"
+    direction = "desc" if descending else "asc"
+    order = [getattr(id_column, direction)()]
+    if sort_column is not None:
+        order.insert(0, getattr(sort_column, direction)().nulls_first())
+    return query.order_by(*order).offset(offset).limit(params.limit)
+
+
+def finish_page(rows, params: PageParams, response: Response, sort_attr: Optional[str] = None, id_attr: str = "id"):
+    """Corta a linha extra e publica o cursor da próxima página no cabeçalho"""
+    rows = list(rows)
+    if params.unbounded:
+        response.headers["Deprecation"] = "true"
+        return rows
+    if len(rows) > params.limit:
+        rows = rows[:params.limit]
+        last = rows[-1]
+        sort_value = getattr(last, sort_attr) if sort_attr else None
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(sort_value, getattr(last, id_attr))
+    return rows
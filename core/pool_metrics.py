@@ -0,0 +1,180 @@
+"""
+Instrumentação dos pools de conexão
+
+Coleta, por engine, a latência de checkout (tempo esperando uma conexão
+livre), contadores de checkout/checkin/overflow/timeouts e o tempo de vida
+das conexões, a partir dos eventos do pool do SQLAlchemy.
+"""
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Limites superiores dos buckets (ms para checkout, s para tempo de vida)
+CHECKOUT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+LIFETIME_BUCKETS_S = (1, 10, 60, 300, 900, 1800, 3600, 14400, 86400)
+
+
+class Histogram:
+    """Histograma cumulativo com buckets fixos"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.total += value
+            self.max = max(self.max, value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(self.buckets + ("+Inf",), self._counts):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            return {
+                "buckets": buckets,
+                "count": self.count,
+                "sum": round(self.total, 3),
+                "avg": round(self.total / self.count, 3) if self.count else 0.0,
+                "max": round(self.max, 3),
+            }
+
+
+class PoolMetrics:
+    def __init__(self, name: str):
+        self.name = name
+        self.checkout_latency_ms = Histogram(CHECKOUT_BUCKETS_MS)
+        self.connection_lifetime_s = Histogram(LIFETIME_BUCKETS_S)
+        self.counters = {
+            "connects": 0,
+            "checkouts": 0,
+            "checkins": 0,
+            "closes": 0,
+            "invalidations": 0,
+            "timeouts": 0,
+            "overflow_checkouts": 0,
+        }
+        self.pool = None
+        self._lock = threading.Lock()
+
+    def incr(self, counter: str):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def snapshot(self) -> dict:
+        data = {
+            "name": self.name,
+            "counters": dict(self.counters),
+            "checkout_latency_ms": self.checkout_latency_ms.snapshot(),
+            "connection_lifetime_s": self.connection_lifetime_s.snapshot(),
+        }
+        pool = self.pool
+        if pool is not None and hasattr(pool, "checkedout"):
+            data["pool"] = {
+                "class": type(pool).__name__,
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "timeout": pool.timeout(),
+            }
+        return data
+
+
+class _TimedCheckoutMixin:
+    """Mede o tempo que cada checkout espera por uma conexão do pool"""
+
+    metrics: PoolMetrics = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            if self.metrics:
+                self.metrics.incr("timeouts")
+            raise
+        finally:
+            if self.metrics:
+                self.metrics.checkout_latency_ms.observe((time.perf_counter() - start) * 1000)
+        if self.metrics and self.overflow() > 0:
+            self.metrics.incr("overflow_checkouts")
+        return connection
+
+    def recreate(self):
+        new_pool = super().recreate()
+        new_pool.metrics = self.metrics
+        if self.metrics:
+            self.metrics.pool = new_pool
+        return new_pool
+
+
+class InstrumentedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+registry: Dict[str, PoolMetrics] = {}
+
+
+def instrument_engine(engine, name: str) -> PoolMetrics:
+    """Registra os eventos de pool de um engine síncrono sob um nome"""
+    metrics = PoolMetrics(name)
+    metrics.pool = engine.pool
+    if isinstance(engine.pool, _TimedCheckoutMixin):
+        engine.pool.metrics = metrics
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        connection_record.info["connected_at"] = time.monotonic()
+        metrics.incr("connects")
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.incr("checkouts")
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        metrics.incr("checkins")
+
+    @event.listens_for(engine, "close")
+    def _on_close(dbapi_connection, connection_record):
+        metrics.incr("closes")
+        connected_at = connection_record.info.get("connected_at")
+        if connected_at is not None:
+            metrics.connection_lifetime_s.observe(time.monotonic() - connected_at)
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.incr("invalidations")
+
+    registry[name] = metrics
+    return metrics
+
+
+def unregister(name: str):
+    registry.pop(name, None)
+
+
+def snapshot_all() -> dict:
+    return {name: metrics.snapshot() for name, metrics in registry.items()}
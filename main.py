@@ -1,15 +1,23 @@
 import os
+import asyncio
 import logging
 from datetime import datetime
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
-from core.database import engine, Base
+from core import database
+from core.database import engine, AsyncSessionLocal, IS_SQLITE, SQLITE_WAL_CHECKPOINT_INTERVAL, checkpoint_wal, mark_recent_write
+from core.migrations import ensure_schema
+from core.pagination import NEXT_CURSOR_HEADER
+from services.password_service import password_hasher
+from services.refresh_token_service import REFRESH_TOKEN_PURGE_INTERVAL, purge_refresh_tokens
+from services.change_feed_service import CHANGE_LOG_COMPACT_INTERVAL, compact_change_log
 from routers import (
-    auth, patients, psychologists, appointments, reports, requests, ml_analysis,
-    schedule, notifications, chat, dashboard, analytics, search, export, upload, websocket, email, contact
+    auth, patients, psychologists, appointments, appointment_series, reports, requests, ml_analysis,
+    schedule, notifications, chat, dashboard, analytics, search, export, upload, websocket, email, contact,
+    internal, calendar
 )
 from dotenv import load_dotenv
 
@@ -23,22 +31,74 @@ logger = logging.getLogger(__name__)
 # Carrega variáveis de ambiente
 load_dotenv()
 
+async def wal_checkpoint_loop(interval: int):
+    """Executa wal_checkpoint periodicamente para manter o arquivo -wal pequeno"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(checkpoint_wal)
+        except Exception as e:
+            logger.warning(f"Falha no checkpoint do WAL: {e}")
+
+async def refresh_token_purge_loop(interval: int):
+    """Remove periodicamente refresh tokens expirados ou revogados"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with AsyncSessionLocal() as db:
+                removed = await purge_refresh_tokens(db)
+            if removed:
+                logger.info(f"{removed} refresh token(s) expirados removidos")
+        except Exception as e:
+            logger.warning(f"Falha ao remover refresh tokens expirados: {e}")
+
+async def change_log_compaction_loop(interval: int):
+    """Compacta periodicamente o log de mudanças dos agendamentos"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with AsyncSessionLocal() as db:
+                removed = await compact_change_log(db)
+            if removed:
+                logger.info(f"{removed} entrada(s) removidas do log de agendamentos")
+        except Exception as e:
+            logger.warning(f"Falha ao compactar o log de agendamentos: {e}")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Gerencia o ciclo de vida da aplicação"""
     # Startup
     logger.info("Iniciando aplicação Blurosiere API")
     try:
-        Base.metadata.create_all(bind=engine)
-        logger.info("Banco de dados inicializado com sucesso")
+        auto_migrate = os.getenv("AUTO_MIGRATE", "True").lower() == "true"
+        version = ensure_schema(engine, auto_migrate=auto_migrate)
+        logger.info(f"Banco de dados inicializado com sucesso (schema v{version})")
     except Exception as e:
         logger.error(f"Erro ao inicializar banco de dados: {e}")
         raise
     
+    checkpoint_task = None
+    if IS_SQLITE and SQLITE_WAL_CHECKPOINT_INTERVAL > 0:
+        checkpoint_task = asyncio.create_task(wal_checkpoint_loop(SQLITE_WAL_CHECKPOINT_INTERVAL))
+    purge_task = None
+    if REFRESH_TOKEN_PURGE_INTERVAL > 0:
+        purge_task = asyncio.create_task(refresh_token_purge_loop(REFRESH_TOKEN_PURGE_INTERVAL))
+    compaction_task = None
+    if CHANGE_LOG_COMPACT_INTERVAL > 0:
+        compaction_task = asyncio.create_task(change_log_compaction_loop(CHANGE_LOG_COMPACT_INTERVAL))
+    
     yield
     
     # Shutdown
     logger.info("Encerrando aplicação Blurosiere API")
+    if checkpoint_task:
+        checkpoint_task.cancel()
+    if purge_task:
+        purge_task.cancel()
+    if compaction_task:
+        compaction_task.cancel()
+    password_hasher.shutdown()
+    await database.read_replicas.adispose()
 
 # Configuração da aplicação
 debug_mode = os.getenv("DEBUG", "False").lower() == "true"
@@ -72,9 +132,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["*"]
+    # Com credenciais o navegador não aceita "*": os cabeçalhos lidos pelo frontend vão listados
+    expose_headers=[NEXT_CURSOR_HEADER, "Deprecation", "Content-Disposition", "Retry-After"]
 )
 
+# Read-your-writes: após uma escrita, as leituras do cliente vão ao primário por alguns segundos
+@app.middleware("http")
+async def read_your_writes_middleware(request: Request, call_next):
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        mark_recent_write(request)
+    return response
+
 # Tratamento global de exceções
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
@@ -95,7 +164,9 @@ async def http_exception_handler(request, exc):
 app.include_router(auth.router, prefix="/api/v1")
 app.include_router(patients.router, prefix="/api/v1")
 app.include_router(psychologists.router, prefix="/api/v1")
+app.include_router(appointment_series.router, prefix="/api/v1")
 app.include_router(appointments.router, prefix="/api/v1")
+app.include_router(calendar.router, prefix="/api/v1")
 app.include_router(requests.router, prefix="/api/v1")
 app.include_router(reports.router, prefix="/api/v1")
 app.include_router(ml_analysis.router, prefix="/api/v1")
@@ -110,6 +181,7 @@ app.include_router(upload.router, prefix="/api/v1")
 app.include_router(email.router, prefix="/api/v1")
 app.include_router(contact.router, prefix="/api/v1")
 app.include_router(websocket.router)
+app.include_router(internal.router)
 
 # Endpoints principais
 @app.get("/", tags=["Sistema"])
@@ -1,30 +1,27 @@
 """
 Script para atualizar o banco de dados com os novos modelos
+
+Aplica as migrações versionadas pendentes (core/migrations.py).
 """
-from core.database import engine, Base
-from models.models import *
-from models.refresh_token import RefreshToken
+from core.database import engine
+from core.migrations import get_schema_version, latest_version, run_migrations
 
 def migrate():
     print("Atualizando banco de dados...")
     try:
-        # Cria todas as tabelas
-        Base.metadata.create_all(bind=engine)
-        print("Banco de dados atualizado com sucesso!")
-        print("\nTabelas criadas/atualizadas:")
-        print("  - users")
-        print("  - patients")
-        print("  - appointments")
-        print("  - requests")
-        print("  - schedules")
-        print("  - notifications")
-        print("  - chat_messages")
-        print("  - audit_logs")
-        print("  - reports")
-        print("  - refresh_tokens")
+        current = get_schema_version(engine)
+        print(f"Versão atual do schema: {current} (última: {latest_version()})")
+        applied = run_migrations(engine)
+        if applied:
+            print("Banco de dados atualizado com sucesso!")
+            print("\nMigrações aplicadas:")
+            for version in applied:
+                print(f"  - {version}")
+        else:
+            print("Banco de dados já está na versão mais recente.")
     except Exception as e:
         print(f"❌ Erro ao atualizar banco: {e}")
         raise
 
 if __name__ == "__main__":
-    migrate()
\ No newline at end of file
+    migrate()
@@ -1,9 +1,11 @@
-from sqlalchemy import Column, Integer, String, DateTime, Date, ForeignKey, Text, Enum, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Date, ForeignKey, Text, Enum, Boolean, Index, JSON, event, inspect, text
 from sqlalchemy.orm import relationship
 from core.database import Base
-from datetime import datetime, timezone, timedelta
+from datetime import date as date_type, datetime, time as time_type, timezone, timedelta
 import enum
+import hashlib
 import secrets
+from typing import Iterable
 
 class UserType(str, enum.Enum):
     PSICOLOGO = "psicologo"
@@ -42,8 +44,20 @@ class User(Base):
     emergency_contact = Column(String, nullable=True)
     medical_history = Column(Text, nullable=True)
     
+    # Incrementada para invalidar todos os access tokens já emitidos
+    token_version = Column(Integer, default=0, server_default="0", nullable=False)
+    # Segredo da URL de assinatura da agenda (iCalendar); None = assinatura desativada
+    calendar_token_nonce = Column(String(32), nullable=True)
+    # Versão da agenda do psicólogo: só cresce, a cada mudança nos seus agendamentos (ETag do iCalendar)
+    calendar_version = Column(Integer, default=0, server_default="0", nullable=False)
+    
     # Relacionamentos
     refresh_tokens = relationship("RefreshToken", back_populates="user")
+    
+    __table_args__ = (
+        Index("ix_users_token_version", "token_version"),
+        Index("ix_users_type_specialty", "type", "specialty"),
+    )
 
 class Patient(Base):
     __tablename__ = "patients"
@@ -59,6 +73,11 @@ class Patient(Base):
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     
     psychologist = relationship("User", foreign_keys=[psychologist_id])
+    
+    __table_args__ = (
+        Index("ix_patients_psychologist_id", "psychologist_id"),
+        Index("ix_patients_email_psychologist", "email", "psychologist_id"),
+    )
 
 class Appointment(Base):
     __tablename__ = "appointments"
@@ -71,12 +90,166 @@ class Appointment(Base):
     status = Column(Enum(AppointmentStatus))
     description = Column(String)
     duration = Column(Integer, default=50)
+    # Início e fim da sessão (horário local), derivados de date + time + duration
+    start_at = Column(DateTime, nullable=True)
+    end_at = Column(DateTime, nullable=True)
+    series_id = Column(Integer, ForeignKey("appointment_series.id"), nullable=True)
     notes = Column(Text, default="")
     full_report = Column(Text, default="")
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     
     patient = relationship("Patient")
     psychologist = relationship("User")
+    series = relationship("AppointmentSeries", back_populates="appointments")
+    
+    __table_args__ = (
+        Index("ix_appointments_psychologist_date_status", "psychologist_id", "date", "status"),
+        Index("ix_appointments_patient_id", "patient_id"),
+        Index("ix_appointments_psychologist_start", "psychologist_id", "start_at"),
+        Index("ix_appointments_patient_start", "patient_id", "start_at"),
+        # Um único agendamento ativo por horário do psicólogo
+        Index(
+            "ix_appointments_active_slot", "psychologist_id", "start_at",
+            unique=True,
+            sqlite_where=text("status = 'AGENDADO'"),
+            postgresql_where=text("status = 'AGENDADO'"),
+        ),
+        Index("ix_appointments_series_start", "series_id", "start_at"),
+    )
+
+
+class AppointmentSeries(Base):
+    """Regra de sessões recorrentes (a cada interval_weeks semanas, no mesmo horário)"""
+    __tablename__ = "appointment_series"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    patient_id = Column(Integer, ForeignKey("patients.id"), nullable=False)
+    psychologist_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    start_date = Column(Date, nullable=False)
+    time = Column(String, nullable=False)
+    duration = Column(Integer, default=50)
+    interval_weeks = Column(Integer, default=1)
+    # Fim da série: número de sessões e/ou data limite
+    occurrences = Column(Integer, nullable=True)
+    until = Column(Date, nullable=True)
+    description = Column(String, default="")
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    appointments = relationship("Appointment", back_populates="series", order_by="Appointment.start_at")
+    
+    __table_args__ = (
+        Index("ix_appointment_series_psychologist_id", "psychologist_id"),
+    )
+
+
+def parse_time(value):
+    """Converte "HH:MM" ou "HH:MM:SS" em time; devolve None se inválido"""
+    if isinstance(value, time_type):
+        return value
+    if not value:
+        return None
+    for fmt in ("%H:%M", "%H:%M:%S"):
+        try:
+            return datetime.strptime(value.strip(), fmt).time()
+        except ValueError:
+            continue
+    return None
+
+
+def appointment_bounds(day, time_value, duration):
+    """Calcula (start_at, end_at) de uma sessão; (None, None) se a data ou hora forem inválidas"""
+    if isinstance(day, str):
+        try:
+            day = date_type.fromisoformat(day)
+        except ValueError:
+            return None, None
+    parsed = parse_time(time_value)
+    if day is None or parsed is None:
+        return None, None
+    start_at = datetime.combine(day, parsed)
+    return start_at, start_at + timedelta(minutes=duration or 50)
+
+
+@event.listens_for(Appointment, "before_insert")
+@event.listens_for(Appointment, "before_update")
+def _sync_appointment_bounds(mapper, connection, target):
+    target.start_at, target.end_at = appointment_bounds(target.date, target.time, target.duration)
+
+
+class AppointmentChange(Base):
+    """Log de mudanças dos agendamentos; o id crescente é o cursor do feed"""
+    __tablename__ = "appointment_changes"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    appointment_id = Column(Integer, nullable=False)
+    psychologist_id = Column(Integer, nullable=True)
+    patient_id = Column(Integer, nullable=True)
+    action = Column(String(16), nullable=False)  # insert, update, cancel
+    changed_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    __table_args__ = (
+        Index("ix_appointment_changes_psychologist", "psychologist_id", "id"),
+        Index("ix_appointment_changes_patient", "patient_id", "id"),
+        Index("ix_appointment_changes_appointment", "appointment_id", "id"),
+    )
+
+
+class ChangeLogState(Base):
+    """Estado da retenção do log de mudanças (linha única, id = 1)"""
+    __tablename__ = "change_log_state"
+    
+    id = Column(Integer, primary_key=True)
+    # Maior id removido pela retenção: cursores abaixo dele precisam ressincronizar
+    watermark = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+def change_action(status) -> str:
+    return "cancel" if status == AppointmentStatus.CANCELADO else "update"
+
+
+def log_appointment_changes(connection, rows, action: str = None, moved_from: Iterable[int] = ()):
+    """Registra mudanças de (id, psychologist_id, patient_id, status); usado também por UPDATEs em lote
+
+    Na mesma transação, incrementa a versão da agenda dos psicólogos afetados
+    (inclusive os de moved_from, que perderam o agendamento).
+    """
+    now = datetime.now(timezone.utc)
+    entries = [
+        {
+            "appointment_id": row[0],
+            "psychologist_id": row[1],
+            "patient_id": row[2],
+            "action": action or change_action(row[3]),
+            "changed_at": now,
+        }
+        for row in rows
+    ]
+    if entries:
+        connection.execute(AppointmentChange.__table__.insert(), entries)
+    psychologist_ids = {row[1] for row in rows if row[1] is not None} | {pid for pid in moved_from if pid is not None}
+    if psychologist_ids:
+        users = User.__table__
+        connection.execute(
+            users.update().where(users.c.id.in_(psychologist_ids)).values(calendar_version=users.c.calendar_version + 1)
+        )
+
+
+# Mesma transação da mudança: o log nunca diverge dos agendamentos
+@event.listens_for(Appointment, "after_insert")
+def _log_appointment_insert(mapper, connection, target):
+    log_appointment_changes(connection, [(target.id, target.psychologist_id, target.patient_id, target.status)], "insert")
+
+
+@event.listens_for(Appointment, "after_update")
+def _log_appointment_update(mapper, connection, target):
+    # after_update também dispara para objetos "sujos" sem mudança real (ex.: valor igual ao atual)
+    state = inspect(target)
+    if not any(state.attrs[column.key].history.has_changes() for column in mapper.column_attrs):
+        return
+    log_appointment_changes(
+        connection, [(target.id, target.psychologist_id, target.patient_id, target.status)],
+        moved_from=state.attrs.psychologist_id.history.deleted
+    )
 
 class Request(Base):
     __tablename__ = "requests"
@@ -88,14 +261,21 @@ class Request(Base):
     preferred_psychologist = Column(Integer, ForeignKey("users.id"))
     description = Column(Text)
     urgency = Column(String)
-    preferred_dates = Column(Text)  # JSON string
-    preferred_times = Column(Text)  # JSON string
+    preferred_dates = Column(JSON, default=list)
+    preferred_times = Column(JSON, default=list)
     status = Column(Enum(RequestStatus), default=RequestStatus.PENDENTE)
     notes = Column(Text, default="")
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime, nullable=True)
     
     psychologist = relationship("User")
+    
+    __table_args__ = (
+        Index("ix_requests_psychologist_status", "preferred_psychologist", "status"),
+        Index("ix_requests_patient_email", "patient_email"),
+        Index("ix_requests_psychologist_created", "preferred_psychologist", "created_at"),
+        Index("ix_requests_patient_email_created", "patient_email", "created_at"),
+    )
 
 class Schedule(Base):
     __tablename__ = "schedules"
@@ -107,11 +287,43 @@ class Schedule(Base):
     end_time = Column(String)
     slot_duration = Column(Integer, default=50)
     is_active = Column(Boolean, default=True)
-    exceptions = Column(Text, default="[]")  # JSON array of dates
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime, nullable=True)
     
     psychologist = relationship("User")
+    exception_entries = relationship(
+        "ScheduleException",
+        order_by="ScheduleException.date",
+        lazy="selectin",
+        cascade="all, delete-orphan"
+    )
+    
+    @property
+    def exceptions(self):
+        """Datas de exceção (AAAA-MM-DD) desta agenda"""
+        return [entry.date.isoformat() for entry in self.exception_entries]
+    
+    __table_args__ = (
+        Index("ix_schedules_psychologist_day", "psychologist_id", "day_of_week"),
+    )
+
+class ScheduleException(Base):
+    """Data (ou faixa de horário nela) em que o psicólogo não atende"""
+    __tablename__ = "schedule_exceptions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    psychologist_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    schedule_id = Column(Integer, ForeignKey("schedules.id", ondelete="CASCADE"), nullable=True)
+    date = Column(Date, nullable=False)
+    start_time = Column(String, nullable=True)  # vazio = dia inteiro
+    end_time = Column(String, nullable=True)
+    reason = Column(String, default="")
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    __table_args__ = (
+        Index("ix_schedule_exceptions_psychologist_date", "psychologist_id", "date"),
+        Index("ix_schedule_exceptions_schedule_id", "schedule_id"),
+    )
 
 class Notification(Base):
     __tablename__ = "notifications"
@@ -126,6 +338,11 @@ class Notification(Base):
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     
     user = relationship("User")
+    
+    __table_args__ = (
+        Index("ix_notifications_user_read_created", "user_id", "read", "created_at"),
+        Index("ix_notifications_user_created", "user_id", "created_at"),
+    )
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
@@ -134,10 +351,14 @@ class ChatMessage(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     role = Column(String)  # user, assistant
     content = Column(Text)
-    meta_data = Column(Text, default="{}")  # JSON
+    meta_data = Column(JSON, default=dict)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     
     user = relationship("User")
+    
+    __table_args__ = (
+        Index("ix_chat_messages_user_created", "user_id", "created_at"),
+    )
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
@@ -147,7 +368,7 @@ class AuditLog(Base):
     action = Column(String)
     entity = Column(String)
     entity_id = Column(Integer)
-    changes = Column(Text, default="{}")  # JSON
+    changes = Column(JSON, default=dict)
     ip_address = Column(String, nullable=True)
     user_agent = Column(String, nullable=True)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
@@ -163,7 +384,7 @@ class Report(Base):
     type = Column(String)  # individual, geral, estatistico
     title = Column(String)
     content = Column(Text)
-    data = Column(Text, default="{}")  # JSON
+    data = Column(JSON, default=dict)
     start_date = Column(Date, nullable=True)
     end_date = Column(Date, nullable=True)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
@@ -172,36 +393,72 @@ class Report(Base):
     patient = relationship("User", foreign_keys=[patient_id])
 
 class RefreshToken(Base):
+    """Sessão de refresh: uma linha por login, rotacionada no lugar a cada /refresh
+
+    Apenas o SHA-256 do token é guardado; o valor em texto fica disponível
+    em plain_token somente logo após ser gerado.
+    """
     __tablename__ = "refresh_tokens"
     
     id = Column(Integer, primary_key=True, index=True)
-    token = Column(String, unique=True, index=True)
+    token_hash = Column(String(64), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"))
     expires_at = Column(DateTime)
     is_revoked = Column(Boolean, default=False)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    rotated_at = Column(DateTime, nullable=True)
+    # Hash substituído na última rotação: apresentá-lo de novo indica reuso
+    previous_token_hash = Column(String(64), nullable=True)
     
     user = relationship("User", back_populates="refresh_tokens")
     
+    __table_args__ = (
+        Index("ix_refresh_tokens_token_hash", "token_hash", unique=True),
+        Index("ix_refresh_tokens_user_created", "user_id", "created_at"),
+        Index("ix_refresh_tokens_expires_at", "expires_at"),
+        Index("ix_refresh_tokens_previous_hash", "previous_token_hash"),
+    )
+    
+    plain_token = None
+    
+    @staticmethod
+    def hash_token(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+    
     @classmethod
     def create_token(cls, user_id: int, days: int = 7):
         """Cria um novo refresh token"""
-        token = secrets.token_urlsafe(32)
-        expires_at = datetime.now(timezone.utc) + timedelta(days=days)
-        
-        return cls(
-            token=token,
-            user_id=user_id,
-            expires_at=expires_at
-        )
+        refresh_token = cls(user_id=user_id)
+        refresh_token.rotate(days)
+        refresh_token.rotated_at = None
+        return refresh_token
+    
+    @staticmethod
+    def generate_token() -> str:
+        return secrets.token_urlsafe(32)
+    
+    def rotate(self, days: int = 7) -> str:
+        """Gera um novo valor para esta sessão, invalidando o anterior"""
+        token = self.generate_token()
+        now = datetime.now(timezone.utc)
+        self.token_hash = self.hash_token(token)
+        self.expires_at = now + timedelta(days=days)
+        self.rotated_at = now
+        self.plain_token = token
+        return token
     
     def is_valid(self) -> bool:
         """Verifica se o token é válido"""
+        expires_at = self.expires_at
+        if expires_at is not None and expires_at.tzinfo is None:
+            # SQLite devolve datetimes sem fuso; os valores são gravados em UTC
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
         return (
             not self.is_revoked and 
-            self.expires_at > datetime.now(timezone.utc)
+            expires_at is not None and
+            expires_at > datetime.now(timezone.utc)
         )
     
     def revoke(self):
         """Revoga o token"""
-        self.is_revoked = True
\ No newline at end of file
+        self.is_revoked = True
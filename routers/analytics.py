@@ -1,10 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import func, extract
-from core.database import get_db
-from models.models import User, Patient, Appointment, AppointmentStatus, UserType
+from core.database import get_read_db
+from models.models import Patient, Appointment, AppointmentStatus, UserType
 from schemas.advanced_schemas import AnalyticsOverview, AnalyticsTrends
-from services.auth_service import get_current_user
+from services.auth_service import Principal, get_current_user
 from datetime import datetime, timedelta
 from typing import List
 
@@ -14,8 +14,8 @@ router = APIRouter(prefix="/analytics", tags=["analytics"])
 async def get_analytics_overview(
     start_date: str = None,
     end_date: str = None,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
 ):
     if current_user.type != UserType.PSICOLOGO:
         raise HTTPException(status_code=403, detail="Apenas psicólogos")
@@ -90,8 +90,8 @@ async def get_analytics_overview(
 async def get_analytics_trends(
     metric: str = "sessions",
     period: str = "month",
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
 ):
     if current_user.type != UserType.PSICOLOGO:
         raise HTTPException(status_code=403, detail="Apenas psicólogos")
@@ -0,0 +1,237 @@
+from datetime import date, timedelta
+import logging
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from core.database import get_async_db
+from models.models import (
+    Appointment, AppointmentSeries, AppointmentStatus, Patient, UserType, appointment_bounds,
+    log_appointment_changes, parse_time
+)
+from schemas.schemas import AppointmentSeriesCreate, AppointmentSeriesSchema, AppointmentSeriesUpdate
+from services.auth_service import Principal, get_current_user
+from services.availability_service import invalidate_availability
+from services.booking_service import (
+    MAX_SERIES_OCCURRENCES, commit_with_retry, expand_series, find_conflicts, lock_psychologist, validate_duration
+)
+from services.email_service import send_email_appointment_series, send_email_appointment_status_cancel
+
+logger = logging.getLogger(__name__)
+
+# Sessões avulsas de uma série continuam editáveis por /appointments/{id};
+# aqui ficam a criação e as alterações de todas as sessões futuras.
+router = APIRouter(prefix="/appointments/series", tags=["appointments"])
+
+
+def notify(send, *args):
+    """Envia o e-mail em segundo plano sem derrubar a resposta já entregue"""
+    try:
+        send(*args)
+    except Exception as e:
+        logger.warning(f"Falha ao enviar e-mail da série: {e}")
+
+
+def conflict_error(intervals) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail={
+            "message": "Horários não disponíveis",
+            "conflicts": sorted({start.date().isoformat() for start, _ in intervals}),
+        },
+    )
+
+
+async def get_owned_series(db: AsyncSession, series_id: int, current_user: Principal) -> AppointmentSeries:
+    series = (await db.execute(
+        select(AppointmentSeries).options(selectinload(AppointmentSeries.appointments))
+        .where(AppointmentSeries.id == series_id)
+    )).scalars().first()
+    if not series:
+        raise HTTPException(status_code=404, detail="Série não encontrada")
+    if series.psychologist_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Sem permissão para alterar esta série")
+    return series
+
+
+# ================================
+# CRIAR SÉRIE
+# ================================
+@router.post("/", response_model=AppointmentSeriesSchema)
+async def create_series(
+    series_data: AppointmentSeriesCreate,
+    background_tasks: BackgroundTasks,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if current_user.type != UserType.PSICOLOGO:
+        raise HTTPException(status_code=403, detail="Apenas psicólogos podem criar séries")
+    if parse_time(series_data.time) is None:
+        raise HTTPException(status_code=400, detail="Horário inválido, use HH:MM")
+    if series_data.interval_weeks < 1:
+        raise HTTPException(status_code=400, detail="interval_weeks deve ser pelo menos 1")
+    if not series_data.occurrences and not series_data.until:
+        raise HTTPException(status_code=400, detail="Informe occurrences ou until")
+    if series_data.occurrences and series_data.occurrences > MAX_SERIES_OCCURRENCES:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_SERIES_OCCURRENCES} sessões por série")
+    validate_duration(series_data.duration)
+
+    # Uma data além do limite mostra que until não cabe: recusa em vez de cortar a série
+    dates = expand_series(
+        series_data.start_date, series_data.interval_weeks, series_data.occurrences, series_data.until,
+        limit=MAX_SERIES_OCCURRENCES + 1
+    )
+    if len(dates) > MAX_SERIES_OCCURRENCES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A série passaria de {MAX_SERIES_OCCURRENCES} sessões; use um until anterior a {dates[-1].isoformat()}"
+        )
+    bounds = {day: appointment_bounds(day, series_data.time, series_data.duration) for day in dates}
+
+    async def apply():
+        # Todas as datas conferidas de uma vez, com a agenda travada
+        await lock_psychologist(db, current_user.id)
+        conflicts = await find_conflicts(db, current_user.id, list(bounds.values()))
+        if conflicts and not series_data.skip_conflicts:
+            raise conflict_error(conflicts)
+        skipped = {start.date() for start, _ in conflicts}
+        free_dates = [day for day in dates if day not in skipped]
+        if not free_dates:
+            raise conflict_error(conflicts)
+        series = AppointmentSeries(
+            patient_id=series_data.patient_id,
+            psychologist_id=current_user.id,
+            start_date=series_data.start_date,
+            time=series_data.time,
+            duration=series_data.duration,
+            interval_weeks=series_data.interval_weeks,
+            occurrences=series_data.occurrences,
+            until=series_data.until,
+            description=series_data.description or "",
+            appointments=[
+                Appointment(
+                    patient_id=series_data.patient_id,
+                    psychologist_id=current_user.id,
+                    date=day,
+                    time=series_data.time,
+                    duration=series_data.duration,
+                    description=series_data.description or "",
+                    status=AppointmentStatus.AGENDADO,
+                )
+                for day in free_dates
+            ],
+        )
+        series.skipped_dates = sorted(skipped)
+        db.add(series)
+        await db.flush()
+        return series
+
+    # Série e sessões num único commit
+    series = await commit_with_retry(db, apply)
+
+    # Um único e-mail com todas as datas
+    patient = await db.get(Patient, series.patient_id)
+    if patient:
+        background_tasks.add_task(
+            notify, send_email_appointment_series,
+            patient.email, patient.name, [a.date.isoformat() for a in series.appointments], series.time
+        )
+
+    return series
+
+
+# ================================
+# CONSULTAR SÉRIE
+# ================================
+@router.get("/{series_id}", response_model=AppointmentSeriesSchema)
+async def get_series(
+    series_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await get_owned_series(db, series_id, current_user)
+
+
+# ================================
+# ALTERAR SESSÕES FUTURAS
+# ================================
+@router.put("/{series_id}", response_model=AppointmentSeriesSchema)
+async def update_series(
+    series_id: int,
+    update_data: AppointmentSeriesUpdate,
+    from_date: date = None,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Aplica as mudanças às sessões agendadas a partir de from_date (padrão: hoje)"""
+    series = await get_owned_series(db, series_id, current_user)
+    changes = update_data.dict(exclude_unset=True)
+    if "time" in changes and parse_time(changes["time"]) is None:
+        raise HTTPException(status_code=400, detail="Horário inválido, use HH:MM")
+    validate_duration(changes.get("duration"))
+
+    from_date = from_date or date.today()
+    future = [
+        appointment for appointment in series.appointments
+        if appointment.status == AppointmentStatus.AGENDADO and appointment.date >= from_date
+    ]
+    time_value = changes.get("time", series.time)
+    duration = changes.get("duration", series.duration)
+    bounds = [appointment_bounds(appointment.date, time_value, duration) for appointment in future]
+    future_ids = [appointment.id for appointment in future]
+    psychologist_id = series.psychologist_id
+
+    async def apply():
+        if {"time", "duration"} & set(changes):
+            await lock_psychologist(db, psychologist_id)
+            conflicts = await find_conflicts(db, psychologist_id, bounds, exclude_ids=future_ids)
+            if conflicts:
+                raise conflict_error(conflicts)
+        for field, value in changes.items():
+            setattr(series, field, value)
+            for appointment in future:
+                setattr(appointment, field, value)
+
+    await commit_with_retry(db, apply)
+    return series
+
+
+# ================================
+# CANCELAR SESSÕES FUTURAS
+# ================================
+@router.delete("/{series_id}")
+async def cancel_series(
+    series_id: int,
+    background_tasks: BackgroundTasks,
+    from_date: date = None,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Cancela as sessões agendadas a partir de from_date (padrão: hoje) e encerra a série"""
+    series = await get_owned_series(db, series_id, current_user)
+    from_date = from_date or date.today()
+
+    cancelled = (await db.execute(
+        update(Appointment)
+        .where(
+            Appointment.series_id == series.id,
+            Appointment.date >= from_date,
+            Appointment.status == AppointmentStatus.AGENDADO
+        )
+        .values(status=AppointmentStatus.CANCELADO)
+        .returning(Appointment.id, Appointment.psychologist_id, Appointment.patient_id, Appointment.status)
+        .execution_options(synchronize_session="fetch")
+    )).all()
+    # UPDATE em lote não dispara os eventos do ORM: log e cache tratados aqui
+    await db.run_sync(lambda session: log_appointment_changes(session.connection(), cancelled, "cancel"))
+    last_day = from_date - timedelta(days=1)
+    if series.until is None or series.until > last_day:
+        series.until = last_day
+    await db.commit()
+    invalidate_availability(series.psychologist_id)
+
+    patient = await db.get(Patient, series.patient_id)
+    if patient and cancelled:
+        background_tasks.add_task(notify, send_email_appointment_status_cancel, patient.email, patient.name)
+
+    return {"message": "Sessões futuras canceladas com sucesso", "cancelled": len(cancelled)}
@@ -1,36 +1,100 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from core.database import get_db
-from models.models import Appointment, User, Patient, AppointmentStatus, UserType
-from schemas.schemas import AppointmentCreate, AppointmentUpdate, AppointmentSchema
-from services.auth_service import get_current_user
-from services.email_service import send_email_appointment
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date
+from typing import List, Optional
+import json
+from core.database import get_async_db
+from core.pagination import PageParams, legacy_page_params, keyset, finish_page, encode_cursor, decode_cursor
+from models.models import Appointment, Patient, AppointmentStatus, UserType, parse_time
+from schemas.schemas import (
+    AppointmentCreate, AppointmentUpdate, AppointmentSchema, AppointmentChangesPage, AppointmentBulkStatusUpdate,
+    AppointmentStatusResult
+)
+from services.auth_service import Principal, get_current_user
+from services.change_feed_service import CHANGE_FEED_LIMIT, fetch_changes
+from services.booking_service import MAX_BULK_STATUS_ITEMS, book_appointment, bulk_update_status, reschedule_appointment
+from services.availability_service import MAX_AVAILABILITY_DAYS, invalidate_availability, iter_availability, load_availability
+from services.email_service import send_email_appointment, send_email_appointment_status_batch
  
 router = APIRouter(prefix="/appointments", tags=["appointments"])
  
  
+# Consultas da listagem (também usadas pelos testes de plano de consulta)
+def psychologist_appointments_query(psychologist_id: int, page: PageParams):
+    return keyset(
+        select(Appointment).where(Appointment.psychologist_id == psychologist_id),
+        page, Appointment.id, Appointment.start_at
+    )
+ 
+ 
+def patient_by_email_query(email: str):
+    return select(Patient).where(Patient.email == email)
+ 
+ 
+def patient_appointments_query(patient_id: int, page: PageParams):
+    return keyset(
+        select(Appointment).where(Appointment.patient_id == patient_id),
+        page, Appointment.id, Appointment.start_at
+    )
+ 
+ 
 # ================================
 # LISTAR AGENDAMENTOS
 # ================================
 @router.get("/", response_model=List[AppointmentSchema])
 async def get_appointments(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    page: PageParams = Depends(legacy_page_params),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.type == UserType.PSICOLOGO:
-        return db.query(Appointment).filter(
-            Appointment.psychologist_id == current_user.id
-        ).all()
+        result = await db.execute(psychologist_appointments_query(current_user.id, page))
+        return finish_page(result.scalars().all(), page, response, "start_at")
  
     # Para pacientes → busca pelo e-mail do usuário
-    patient = db.query(Patient).filter(Patient.email == current_user.email).first()
+    patient = (await db.execute(patient_by_email_query(current_user.email))).scalars().first()
     if not patient:
         return []
  
-    return db.query(Appointment).filter(
-        Appointment.patient_id == patient.id
-    ).all()
+    result = await db.execute(patient_appointments_query(patient.id, page))
+    return finish_page(result.scalars().all(), page, response, "start_at")
+ 
+ 
+# ================================
+# FEED DE MUDANÇAS
+# ================================
+@router.get("/changes", response_model=AppointmentChangesPage)
+async def get_appointment_changes(
+    since: Optional[str] = None,
+    limit: int = Query(CHANGE_FEED_LIMIT, ge=1, le=CHANGE_FEED_LIMIT),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Inserções, alterações e cancelamentos depois do cursor (sem cursor: desde o início)
+
+    Guarde o cursor devolvido e repita enquanto has_more for verdadeiro. Um
+    cursor anterior à retenção do log recebe 410: recarregue a lista
+    completa e continue pelo cursor do cabeçalho X-Next-Cursor.
+    """
+    since_id = decode_cursor(since)[1] if since else 0
+    items, last_id, has_more = await fetch_changes(db, current_user, since_id, limit)
+    return {
+        "changes": [
+            {
+                "id": change.id,
+                "appointment_id": change.appointment_id,
+                "action": change.action,
+                "changed_at": change.changed_at,
+                "appointment": appointment,
+            }
+            for change, appointment in items
+        ],
+        "cursor": encode_cursor(None, last_id),
+        "has_more": has_more,
+    }
  
  
 # ================================
@@ -39,36 +103,21 @@ async def get_appointments(
 @router.post("/", response_model=AppointmentSchema)
 async def create_appointment(
     appointment_data: AppointmentCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
  
-    # Verifica horário disponível
-    existing = db.query(Appointment).filter(
-        Appointment.psychologist_id == appointment_data.psychologist_id,
-        Appointment.date == appointment_data.date,
-        Appointment.time == appointment_data.time,
-        Appointment.status == AppointmentStatus.AGENDADO
-    ).first()
- 
-    if existing:
+    if parse_time(appointment_data.time) is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Horário não disponível"
+            detail="Horário inválido, use HH:MM"
         )
  
-    # Criar agendamento
-    db_appointment = Appointment(
-        **appointment_data.dict(),
-        status=AppointmentStatus.AGENDADO
-    )
- 
-    db.add(db_appointment)
-    db.commit()
-    db.refresh(db_appointment)
+    # O índice único de horários decide reservas simultâneas (409 para a perdedora)
+    db_appointment = await book_appointment(db, appointment_data.dict())
  
     # Buscar infos do paciente para enviar e-mail
-    patient = db.query(Patient).filter(Patient.id == db_appointment.patient_id).first()
+    patient = await db.get(Patient, db_appointment.patient_id)
  
     if patient:
         send_email_appointment(
@@ -81,6 +130,55 @@ async def create_appointment(
     return db_appointment
  
  
+# ================================
+# ALTERAR STATUS EM LOTE
+# ================================
+@router.put("/bulk-status", response_model=List[AppointmentStatusResult])
+async def bulk_update_appointment_status(
+    update_data: AppointmentBulkStatusUpdate,
+    background_tasks: BackgroundTasks,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Altera o status de vários agendamentos numa única transação (ex.: encerrar o dia)
+
+    O resultado vem por item, na ordem pedida; cada paciente recebe uma única
+    notificação no app e os e-mails seguem num único lote.
+    """
+    if current_user.type != UserType.PSICOLOGO:
+        raise HTTPException(status_code=403, detail="Apenas psicólogos podem alterar agendamentos em lote")
+    if len(update_data.items) > MAX_BULK_STATUS_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_BULK_STATUS_ITEMS} agendamentos por chamada")
+
+    # Ids repetidos: vale o último status pedido
+    changes = {item.id: item.status for item in update_data.items}
+    results, changed = await bulk_update_status(db, current_user.id, changes)
+
+    if changed:
+        invalidate_availability(current_user.id, {row["date"] for row in changed})
+        patients = {
+            patient.id: patient
+            for patient in (await db.execute(
+                select(Patient).where(Patient.id.in_({row["patient_id"] for row in changed}))
+            )).scalars().all()
+        }
+        messages = [
+            {
+                "patient_email": patients[row["patient_id"]].email,
+                "patient_name": patients[row["patient_id"]].name,
+                "appointment_date": str(row["date"]),
+                "appointment_time": row["time"],
+                "old_status": row["old_status"].value,
+                "new_status": row["status"].value,
+            }
+            for row in changed if row["patient_id"] in patients
+        ]
+        if messages:
+            background_tasks.add_task(send_email_appointment_status_batch, messages)
+
+    return [{"id": appointment_id, **results[appointment_id]} for appointment_id in changes]
+
+
 # ================================
 # ATUALIZAR AGENDAMENTO
 # ================================
@@ -88,10 +186,10 @@ async def create_appointment(
 async def update_appointment(
     appointment_id: int,
     update_data: AppointmentUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
+    appointment = await db.get(Appointment, appointment_id)
     if not appointment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -107,17 +205,20 @@ async def update_appointment(
     # Registrar o status atual antes da alteração
     old_status = appointment.status
  
-    # Aplicar as mudanças
-    for field, value in update_data.dict(exclude_unset=True).items():
-        setattr(appointment, field, value)
+    changes = update_data.dict(exclude_unset=True)
+    if "time" in changes and parse_time(changes["time"]) is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Horário inválido, use HH:MM"
+        )
  
-    db.commit()
-    db.refresh(appointment)
+    # Aplicar as mudanças; remarcar sobre outra sessão dá 409
+    await reschedule_appointment(db, appointment, changes)
  
     # Verificar se o status foi alterado
     if old_status != appointment.status:
         # Buscar dados do paciente
-        patient = db.query(Patient).filter(Patient.id == appointment.patient_id).first()
+        patient = await db.get(Patient, appointment.patient_id)
         
         if patient:
             from services.email_service import send_email_appointment_status_update
@@ -141,10 +242,10 @@ async def update_appointment(
 @router.delete("/{appointment_id}")
 async def cancel_appointment(
     appointment_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
+    appointment = await db.get(Appointment, appointment_id)
     if not appointment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -152,10 +253,10 @@ async def cancel_appointment(
         )
  
     # Buscar dados do paciente antes de cancelar
-    patient = db.query(Patient).filter(Patient.id == appointment.patient_id).first()
+    patient = await db.get(Patient, appointment.patient_id)
     
     appointment.status = AppointmentStatus.CANCELADO
-    db.commit()
+    await db.commit()
     
     # Enviar e-mail de cancelamento
     if patient:
@@ -171,23 +272,74 @@ async def cancel_appointment(
 # ================================
 # HORÁRIOS DISPONÍVEIS
 # ================================
+def parse_day(value: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Data inválida, use AAAA-MM-DD")
+
+
+def parse_period(date_from: str, date_to: str):
+    start, end = parse_day(date_from), parse_day(date_to)
+    if end < start or (end - start).days >= MAX_AVAILABILITY_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Período inválido (máximo de {MAX_AVAILABILITY_DAYS} dias)"
+        )
+    return start, end
+
+
 @router.get("/available-slots")
 async def get_available_slots(
     date: str,
     psychologist_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    all_slots = ['09:00', '10:00', '11:00', '14:00', '15:00', '16:00', '17:00']
- 
-    occupied = db.query(Appointment.time).filter(
-        Appointment.date == date,
-        Appointment.psychologist_id == psychologist_id,
-        Appointment.status == AppointmentStatus.AGENDADO
-    ).all()
- 
-    occupied_times = [t[0] for t in occupied]
-    available = [slot for slot in all_slots if slot not in occupied_times]
- 
-    return available
- 
- 
\ No newline at end of file
+    day = parse_day(date)
+    availability = await load_availability(db, [psychologist_id], day, day)
+    return availability[psychologist_id][day]
+
+
+@router.get("/available-slots/range")
+async def get_available_slots_range(
+    psychologist_id: int,
+    date_from: str,
+    date_to: str,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Horários livres de cada dia do período, resolvidos de uma vez"""
+    start, end = parse_period(date_from, date_to)
+    availability = await load_availability(db, [psychologist_id], start, end)
+    return {day.isoformat(): slots for day, slots in availability[psychologist_id].items()}
+
+
+@router.get("/availability")
+async def get_bulk_availability(
+    date_from: str,
+    date_to: str,
+    specialty: Optional[str] = None,
+    psychologist_id: Optional[List[int]] = Query(None),
+):
+    """Horários livres de vários psicólogos no período, em streaming
+
+    Filtra por especialidade e/ou ids (psychologist_id repetido); sem filtros,
+    considera todos os psicólogos. Cada item do array JSON traz o psicólogo e
+    os slots livres de cada dia.
+    """
+    start, end = parse_period(date_from, date_to)
+
+    async def body():
+        yield "["
+        first = True
+        async for psychologist, availability in iter_availability(start, end, specialty, psychologist_id):
+            item = {
+                "psychologist_id": psychologist.id,
+                "name": psychologist.name,
+                "specialty": psychologist.specialty or "",
+                "availability": {day.isoformat(): slots for day, slots in availability.items()},
+            }
+            yield ("" if first else ",") + json.dumps(item, ensure_ascii=False)
+            first = False
+        yield "]"
+
+    return StreamingResponse(body(), media_type="application/json")
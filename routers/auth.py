@@ -1,20 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from core.database import get_db
-from models.models import User, Patient, UserType, RefreshToken
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.database import get_async_db
+from models.models import User, Patient, UserType
 from schemas.schemas import (
     UserCreate, UserLogin, Token, User as UserSchema,
     RefreshTokenRequest, ForgotPasswordRequest, ResetPasswordRequest
 )
-from services.auth_service import authenticate_user
-from utils import get_password_hash, create_access_token, calculate_age
+from services.auth_service import Principal, authenticate_user, get_current_user, user_token_claims
+from services.password_service import password_hasher
+from services.refresh_token_service import (
+    issue_refresh_token, rotate_refresh_token, revoke_refresh_token, revoke_user_refresh_tokens
+)
+from utils import create_access_token, calculate_age
 from datetime import timedelta
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 @router.post("/login", response_model=Token)
-async def login(user_data: UserLogin, db: Session = Depends(get_db)):
-    user = authenticate_user(db, user_data.email, user_data.password)
+async def login(user_data: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    user = await authenticate_user(db, user_data.email, user_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -22,26 +27,27 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
         )
     
     access_token = create_access_token(
-        data={"sub": user.email}, 
+        data=user_token_claims(user), 
         expires_delta=timedelta(minutes=30)
     )
     
     # Criar refresh token
-    refresh_token = RefreshToken.create_token(user.id)
-    db.add(refresh_token)
-    db.commit()
+    refresh_token = await issue_refresh_token(db, user.id)
+    await db.commit()
     
     return Token(
         access_token=access_token,
         token_type="bearer",
-        refresh_token=refresh_token.token,
+        refresh_token=refresh_token.plain_token,
         user=UserSchema.from_orm(user)
     )
 
 @router.post("/register", response_model=Token)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     # Verifica se usuário já existe
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = (await db.execute(
+        select(User).where(User.email == user_data.email)
+    )).scalars().first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -49,7 +55,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Cria novo usuário
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await password_hasher.hash(user_data.password)
     db_user = User(
         email=user_data.email,
         password=hashed_password,
@@ -61,8 +67,8 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     # Se for paciente, cria registro na tabela de pacientes
     if user_data.type == UserType.PACIENTE and user_data.birth_date:
@@ -77,75 +83,76 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
             status="Ativo"
         )
         db.add(db_patient)
-        db.commit()
+        await db.commit()
     
     access_token = create_access_token(
-        data={"sub": db_user.email},
+        data=user_token_claims(db_user),
         expires_delta=timedelta(minutes=30)
     )
     
     # Criar refresh token
-    refresh_token = RefreshToken.create_token(db_user.id)
-    db.add(refresh_token)
-    db.commit()
+    refresh_token = await issue_refresh_token(db, db_user.id)
+    await db.commit()
     
     return Token(
         access_token=access_token,
         token_type="bearer",
-        refresh_token=refresh_token.token,
+        refresh_token=refresh_token.plain_token,
         user=UserSchema.from_orm(db_user)
     )
 
 @router.post("/refresh", response_model=Token)
-async def refresh_token(token_data: RefreshTokenRequest, db: Session = Depends(get_db)):
-    # Buscar refresh token
-    refresh_token = db.query(RefreshToken).filter(
-        RefreshToken.token == token_data.refresh_token
-    ).first()
+async def refresh_token(token_data: RefreshTokenRequest, db: AsyncSession = Depends(get_async_db)):
+    # Validar e rotacionar a sessão (o valor anterior deixa de valer)
+    refresh_token = await rotate_refresh_token(db, token_data.refresh_token)
     
-    if not refresh_token or not refresh_token.is_valid():
+    if not refresh_token:
+        # Persiste a revogação da sessão quando o token era reuso de um substituído
+        await db.commit()
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token inválido ou expirado"
         )
     
-    # Revogar token atual
-    refresh_token.revoke()
-    
-    # Criar novos tokens
-    user = refresh_token.user
+    # Criar novo access token
+    user = await db.get(User, refresh_token.user_id)
     access_token = create_access_token(
-        data={"sub": user.email},
+        data=user_token_claims(user),
         expires_delta=timedelta(minutes=30)
     )
-    
-    new_refresh_token = RefreshToken.create_token(user.id)
-    db.add(new_refresh_token)
-    db.commit()
+    await db.commit()
     
     return Token(
         access_token=access_token,
         token_type="bearer",
-        refresh_token=new_refresh_token.token,
+        refresh_token=refresh_token.plain_token,
         user=UserSchema.from_orm(user)
     )
 
 @router.post("/logout")
-async def logout(token_data: RefreshTokenRequest, db: Session = Depends(get_db)):
-    # Revogar refresh token
-    refresh_token = db.query(RefreshToken).filter(
-        RefreshToken.token == token_data.refresh_token
-    ).first()
-    
-    if refresh_token:
-        refresh_token.revoke()
-        db.commit()
+async def logout(token_data: RefreshTokenRequest, db: AsyncSession = Depends(get_async_db)):
+    # Encerrar a sessão de refresh
+    if await revoke_refresh_token(db, token_data.refresh_token):
+        await db.commit()
     
     return {"message": "Logout realizado com sucesso"}
 
+@router.post("/logout-all")
+async def logout_all(
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Invalida todos os access tokens emitidos (versão) e todos os refresh tokens
+    user = await db.get(User, current_user.id)
+    user.token_version = (user.token_version or 0) + 1
+    await revoke_user_refresh_tokens(db, user.id)
+    await db.commit()
+    
+    return {"message": "Todas as sessões foram encerradas"}
+
 @router.post("/forgot-password")
-async def forgot_password(request: ForgotPasswordRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == request.email).first()
+async def forgot_password(request: ForgotPasswordRequest, db: AsyncSession = Depends(get_async_db)):
+    user = (await db.execute(select(User).where(User.email == request.email))).scalars().first()
     
     if not user:
         # Por segurança, sempre retorna sucesso
@@ -158,7 +165,7 @@ async def forgot_password(request: ForgotPasswordRequest, db: Session = Depends(
     return {"message": "Se o email existir, você receberá instruções de recuperação"}
 
 @router.post("/reset-password")
-async def reset_password(request: ResetPasswordRequest, db: Session = Depends(get_db)):
+async def reset_password(request: ResetPasswordRequest, db: AsyncSession = Depends(get_async_db)):
     # TODO: Implementar validação de token de reset
     # Por enquanto, apenas validação básica
     
@@ -0,0 +1,101 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from core.database import get_async_db
+from models.models import User, UserType
+from services.auth_service import Principal, get_current_user
+from services.calendar_service import (
+    cached_calendar, calendar_etag, calendar_version, create_calendar_token, etag_matches,
+    new_calendar_nonce, resolve_calendar_token, stream_calendar
+)
+
+router = APIRouter(prefix="/calendar", tags=["calendar"])
+
+ICS_MEDIA_TYPE = "text/calendar; charset=utf-8"
+
+
+# ================================
+# URL DE ASSINATURA
+# ================================
+async def get_calendar_owner(current_user: Principal, db: AsyncSession) -> User:
+    if current_user.type != UserType.PSICOLOGO:
+        raise HTTPException(status_code=403, detail="Apenas psicólogos possuem agenda")
+    return await db.get(User, current_user.id)
+
+
+def subscription_url(request: Request, user: User) -> dict:
+    token = create_calendar_token(user.id, user.calendar_token_nonce, user.token_version)
+    return {"url": str(request.url_for("get_calendar_feed", token=token))}
+
+
+@router.get("/subscription")
+async def get_calendar_subscription(
+    request: Request,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """URL para assinar a agenda em apps de calendário (ativa a assinatura na primeira chamada)"""
+    user = await get_calendar_owner(current_user, db)
+    if not user.calendar_token_nonce:
+        user.calendar_token_nonce = new_calendar_nonce()
+        await db.commit()
+    return subscription_url(request, user)
+
+
+@router.post("/subscription/regenerate")
+async def regenerate_calendar_subscription(
+    request: Request,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Gera uma nova URL de assinatura; as URLs anteriores deixam de funcionar"""
+    user = await get_calendar_owner(current_user, db)
+    user.calendar_token_nonce = new_calendar_nonce()
+    await db.commit()
+    return subscription_url(request, user)
+
+
+@router.delete("/subscription", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_calendar_subscription(
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Desativa a assinatura: qualquer URL emitida passa a responder 404"""
+    user = await get_calendar_owner(current_user, db)
+    user.calendar_token_nonce = None
+    await db.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+# ================================
+# AGENDA EM ICALENDAR
+# ================================
+@router.get("/{token}.ics")
+async def get_calendar_feed(
+    token: str,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Agenda do psicólogo em iCalendar, acessada pela URL de assinatura
+
+    O token da URL não expira de propósito: apps de calendário só guardam a
+    URL e não conseguem renovar credenciais. Para revogá-lo, use
+    POST /calendar/subscription/regenerate (nova URL) ou
+    DELETE /calendar/subscription (desativa); logout-all também o revoga.
+    """
+    psychologist_id = await resolve_calendar_token(token, db)
+    if psychologist_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Calendário não encontrado")
+
+    version = await calendar_version(db, psychologist_id)
+    etag = calendar_etag(psychologist_id, version)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    # Nada mudou desde a última consulta do app: nenhuma renderização
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    body = cached_calendar(psychologist_id, version)
+    if body is not None:
+        return Response(content=body, media_type=ICS_MEDIA_TYPE, headers=headers)
+    return StreamingResponse(stream_calendar(psychologist_id, version), media_type=ICS_MEDIA_TYPE, headers=headers)
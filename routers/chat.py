@@ -1,19 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from core.database import get_db
-from models.models import ChatMessage, User
+from core.pagination import PageParams, page_params_with, keyset, offset_page, finish_page
+from models.models import ChatMessage
 from schemas.advanced_schemas import ChatMessageCreate, ChatMessage as ChatMessageSchema
-from services.auth_service import get_current_user
+from services.auth_service import Principal, get_current_user
 from services.ai_service import ai_service
-import json
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+# Histórico do usuário (também usado pelos testes de plano de consulta)
+def history_query(db: Session, user_id: int):
+    return db.query(ChatMessage).filter(ChatMessage.user_id == user_id)
+
 @router.post("/message")
 async def send_message(
     message_data: ChatMessageCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     # Salvar mensagem do usuário
@@ -21,7 +25,7 @@ async def send_message(
         user_id=current_user.id,
         role="user",
         content=message_data.message,
-        meta_data=json.dumps({"context": message_data.context})
+        meta_data={"context": message_data.context}
     )
     db.add(user_message)
     db.commit()
@@ -34,7 +38,7 @@ async def send_message(
         user_id=current_user.id,
         role="assistant",
         content=ai_response,
-        meta_data=json.dumps({})
+        meta_data={}
     )
     db.add(ai_message)
     db.commit()
@@ -47,23 +51,25 @@ async def send_message(
 
 @router.get("/history", response_model=List[ChatMessageSchema])
 async def get_history(
-    limit: int = 50,
-    offset: int = 0,
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    offset: Optional[int] = Query(None, ge=0, deprecated=True, description="Obsoleto: use cursor"),
+    page: PageParams = Depends(page_params_with(50)),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    messages = db.query(ChatMessage).filter(
-        ChatMessage.user_id == current_user.id
-    ).order_by(ChatMessage.created_at.desc()).offset(offset).limit(limit).all()
-    
-    for msg in messages:
-        msg.metadata = json.loads(msg.meta_data) if msg.meta_data else {}
+    query = history_query(db, current_user.id)
+    # Clientes antigos paginam por deslocamento
+    if offset is not None and not page.cursor:
+        return offset_page(
+            query, page, offset, ChatMessage.id, ChatMessage.created_at, descending=True, response=response
+        ).all()
+    messages = keyset(query, page, ChatMessage.id, ChatMessage.created_at, descending=True).all()
     
-    return messages
+    return finish_page(messages, page, response, "created_at")
 
 @router.delete("/history")
 async def clear_history(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     db.query(ChatMessage).filter(ChatMessage.user_id == current_user.id).delete()
@@ -1,49 +1,70 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from core.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+from core.database import get_async_read_db
 from models.models import User, Patient, Appointment, AppointmentStatus, UserType
 from schemas.advanced_schemas import DashboardPsychologist, DashboardPatient, DashboardStats
-from services.auth_service import get_current_user
-from datetime import datetime, timedelta
+from services.auth_service import Principal, get_current_user
+from datetime import datetime, time, timedelta
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
+async def _count(db: AsyncSession, model, *criteria) -> int:
+    """Executa um COUNT com os filtros informados"""
+    return await db.scalar(select(func.count(model.id)).where(*criteria))
+
+def _start_of_today() -> datetime:
+    return datetime.combine(datetime.now().date(), time.min)
+
+def upcoming_appointments_query(owner_column, owner_id: int, today: datetime):
+    """Próximas 5 sessões do psicólogo ou do paciente (owner_column)"""
+    return select(Appointment).where(
+        owner_column == owner_id,
+        Appointment.start_at >= today
+    ).order_by(Appointment.start_at).limit(5)
+
 @router.get("/psychologist", response_model=DashboardPsychologist)
 async def get_psychologist_dashboard(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
+    today = _start_of_today()
+    
     # Estatísticas
-    total_patients = db.query(Patient).filter(Patient.psychologist_id == current_user.id).count()
-    active_patients = db.query(Patient).filter(
+    total_patients = await _count(db, Patient, Patient.psychologist_id == current_user.id)
+    active_patients = await _count(
+        db, Patient,
         Patient.psychologist_id == current_user.id,
         Patient.status == "ativo"
-    ).count()
+    )
     
-    total_sessions = db.query(Appointment).filter(
+    total_sessions = await _count(
+        db, Appointment,
         Appointment.psychologist_id == current_user.id
-    ).count()
+    )
     
-    upcoming_sessions = db.query(Appointment).filter(
+    upcoming_sessions = await _count(
+        db, Appointment,
         Appointment.psychologist_id == current_user.id,
         Appointment.status == AppointmentStatus.AGENDADO,
-        Appointment.date >= datetime.now().date()
-    ).count()
+        Appointment.start_at >= today
+    )
     
     # Sessões do mês atual
-    first_day = datetime.now().replace(day=1)
-    completed_this_month = db.query(Appointment).filter(
+    first_day = today.replace(day=1)
+    completed_this_month = await _count(
+        db, Appointment,
         Appointment.psychologist_id == current_user.id,
         Appointment.status == AppointmentStatus.CONCLUIDO,
-        Appointment.date >= first_day.date()
-    ).count()
+        Appointment.start_at >= first_day
+    )
     
-    canceled_this_month = db.query(Appointment).filter(
+    canceled_this_month = await _count(
+        db, Appointment,
         Appointment.psychologist_id == current_user.id,
         Appointment.status == AppointmentStatus.CANCELADO,
-        Appointment.date >= first_day.date()
-    ).count()
+        Appointment.start_at >= first_day
+    )
     
     # Taxa de comparecimento
     total_scheduled = completed_this_month + canceled_this_month
@@ -60,22 +81,24 @@ async def get_psychologist_dashboard(
     )
     
     # Próximos agendamentos
-    upcoming_appointments = db.query(Appointment).filter(
-        Appointment.psychologist_id == current_user.id,
-        Appointment.date >= datetime.now().date()
-    ).order_by(Appointment.date, Appointment.time).limit(5).all()
+    upcoming_appointments = (await db.execute(
+        upcoming_appointments_query(Appointment.psychologist_id, current_user.id, today)
+    )).scalars().all()
     
     # Pacientes recentes
-    recent_patients = db.query(Patient).filter(
-        Patient.psychologist_id == current_user.id
-    ).order_by(Patient.created_at.desc()).limit(5).all()
+    recent_patients = (await db.execute(
+        select(Patient).where(
+            Patient.psychologist_id == current_user.id
+        ).order_by(Patient.created_at.desc()).limit(5)
+    )).scalars().all()
     
     # Alertas
     alerts = []
-    high_risk_patients = db.query(Patient).filter(
+    high_risk_patients = await _count(
+        db, Patient,
         Patient.psychologist_id == current_user.id,
         Patient.risk_level == "alto"
-    ).count()
+    )
     
     if high_risk_patients > 0:
         alerts.append({
@@ -93,29 +116,36 @@ async def get_psychologist_dashboard(
 
 @router.get("/patient", response_model=DashboardPatient)
 async def get_patient_dashboard(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
+    today = _start_of_today()
+    
     # Estatísticas do paciente
-    total_sessions = db.query(Appointment).filter(
+    total_sessions = await _count(
+        db, Appointment,
         Appointment.patient_id == current_user.id
-    ).count()
+    )
     
-    completed_sessions = db.query(Appointment).filter(
+    completed_sessions = await _count(
+        db, Appointment,
         Appointment.patient_id == current_user.id,
         Appointment.status == AppointmentStatus.CONCLUIDO
-    ).count()
+    )
     
-    upcoming_sessions = db.query(Appointment).filter(
+    upcoming_sessions = await _count(
+        db, Appointment,
         Appointment.patient_id == current_user.id,
         Appointment.status == AppointmentStatus.AGENDADO,
-        Appointment.date >= datetime.now().date()
-    ).count()
+        Appointment.start_at >= today
+    )
     
-    last_session = db.query(Appointment).filter(
-        Appointment.patient_id == current_user.id,
-        Appointment.status == AppointmentStatus.CONCLUIDO
-    ).order_by(Appointment.date.desc()).first()
+    last_session = (await db.execute(
+        select(Appointment).where(
+            Appointment.patient_id == current_user.id,
+            Appointment.status == AppointmentStatus.CONCLUIDO
+        ).order_by(Appointment.start_at.desc()).limit(1)
+    )).scalars().first()
     
     statistics = {
         "total_sessions": total_sessions,
@@ -125,16 +155,17 @@ async def get_patient_dashboard(
     }
     
     # Próximos agendamentos
-    upcoming_appointments = db.query(Appointment).filter(
-        Appointment.patient_id == current_user.id,
-        Appointment.date >= datetime.now().date()
-    ).order_by(Appointment.date, Appointment.time).limit(5).all()
+    upcoming_appointments = (await db.execute(
+        upcoming_appointments_query(Appointment.patient_id, current_user.id, today)
+    )).scalars().all()
     
     # Psicólogo
-    patient = db.query(Patient).filter(Patient.user_id == current_user.id).first()
+    patient = (await db.execute(
+        select(Patient).where(Patient.user_id == current_user.id)
+    )).scalars().first()
     psychologist = None
     if patient:
-        psychologist = db.query(User).filter(User.id == patient.psychologist_id).first()
+        psychologist = await db.get(User, patient.psychologist_id)
     
     return DashboardPatient(
         statistics=statistics,
@@ -2,8 +2,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel, EmailStr
 from typing import Optional
 from services.email_service import send_email, send_email_appointment, send_email_request_accepted
-from services.auth_service import get_current_user
-from models.models import User
+from services.auth_service import Principal, get_current_user
 
 router = APIRouter(prefix="/email", tags=["Email"])
 
@@ -34,7 +33,7 @@ class RequestAcceptedEmailRequest(BaseModel):
 @router.post("/send")
 async def send_generic_email(
     email_data: EmailRequest,
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Envia um e-mail genérico"""
     try:
@@ -56,7 +55,7 @@ async def send_generic_email(
 @router.post("/appointment")
 async def send_appointment_confirmation(
     email_data: AppointmentEmailRequest,
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Envia e-mail de confirmação de agendamento"""
     try:
@@ -75,7 +74,7 @@ async def send_appointment_confirmation(
 @router.post("/request-accepted")
 async def send_request_accepted_notification(
     email_data: RequestAcceptedEmailRequest,
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Envia e-mail notificando que a solicitação foi aceita"""
     try:
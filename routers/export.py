@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from core.database import get_db
+from core.database import get_read_db
 from models.models import User, Patient, Appointment, UserType
-from services.auth_service import get_current_user
+from services.auth_service import Principal, get_current_user
+from datetime import date, datetime, time, timedelta
 import csv
 import io
 
@@ -12,8 +13,8 @@ router = APIRouter(prefix="/export", tags=["export"])
 @router.get("/patients")
 async def export_patients(
     format: str = "csv",
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
 ):
     if current_user.type != UserType.PSICOLOGO:
         raise HTTPException(status_code=403, detail="Apenas psicólogos")
@@ -50,20 +51,28 @@ async def export_appointments(
     format: str = "csv",
     start_date: str = None,
     end_date: str = None,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
 ):
     if current_user.type != UserType.PSICOLOGO:
         raise HTTPException(status_code=403, detail="Apenas psicólogos")
     
     query = db.query(Appointment).filter(Appointment.psychologist_id == current_user.id)
     
-    if start_date:
-        query = query.filter(Appointment.date >= start_date)
-    if end_date:
-        query = query.filter(Appointment.date <= end_date)
+    try:
+        if start_date:
+            query = query.filter(
+                Appointment.start_at >= datetime.combine(date.fromisoformat(start_date), time.min)
+            )
+        if end_date:
+            # Inclui o dia final inteiro
+            query = query.filter(
+                Appointment.start_at < datetime.combine(date.fromisoformat(end_date) + timedelta(days=1), time.min)
+            )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Data inválida, use AAAA-MM-DD")
     
-    appointments = query.all()
+    appointments = query.order_by(Appointment.start_at).all()
     
     if format == "csv":
         output = io.StringIO()
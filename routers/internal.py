@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Header, HTTPException, status
+from typing import Optional
+from core.database import DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT
+from core.pool_metrics import snapshot_all
+from core import cache
+from services.password_service import password_hasher
+import hmac
+import os
+
+router = APIRouter(prefix="/internal", tags=["internal"])
+
+def check_internal_token(token: Optional[str]):
+    """Exige o cabeçalho X-Internal-Token; sem INTERNAL_METRICS_TOKEN as rotas não existem"""
+    expected = os.getenv("INTERNAL_METRICS_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not token or not hmac.compare_digest(token, expected):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acesso negado")
+
+@router.get("/db-pool")
+async def get_db_pool_metrics(x_internal_token: Optional[str] = Header(None)):
+    """Métricas dos pools de conexão: latência de checkout, ocupação e tempo de vida"""
+    check_internal_token(x_internal_token)
+    return {
+        "config": {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT
+        },
+        "engines": snapshot_all()
+    }
+
+@router.get("/caches")
+async def get_cache_metrics(x_internal_token: Optional[str] = Header(None)):
+    """Tamanho, acertos, falhas e taxa de acerto dos caches em memória"""
+    check_internal_token(x_internal_token)
+    return cache.snapshot_all()
+
+@router.get("/password-pool")
+async def get_password_pool_metrics(x_internal_token: Optional[str] = Header(None)):
+    """Ocupação do pool de bcrypt e logins recusados por fila cheia"""
+    check_internal_token(x_internal_token)
+    return password_hasher.snapshot()
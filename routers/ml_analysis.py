@@ -1,15 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from core.database import get_db
-from models.models import User, UserType
-from services.auth_service import get_current_user
+from models.models import UserType
+from services.auth_service import Principal, get_current_user
 from services.ml_service import calculate_patient_risk
 
 router = APIRouter(prefix="/ml", tags=["machine-learning"])
 
 @router.get("/risk-analysis")
 async def get_risk_analysis(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -47,7 +47,7 @@ async def get_risk_analysis(
 @router.get("/risk-analysis/{patient_id}")
 async def get_patient_risk_details(
     patient_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -1,106 +1,131 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from core.database import get_db
-from models.models import Notification, User
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from core.database import get_async_db
+from core.pagination import PageParams, page_params_with, keyset, offset_page, finish_page
+from models.models import Notification
 from schemas.advanced_schemas import NotificationCreate, Notification as NotificationSchema
-from services.auth_service import get_current_user
+from services.auth_service import Principal, get_current_user
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
 
+# Consultas das rotas (também usadas pelos testes de plano de consulta)
+def notifications_query(user_id: int, read: bool = None, type: str = None):
+    query = select(Notification).where(Notification.user_id == user_id)
+    if read is not None:
+        query = query.where(Notification.read == read)
+    if type:
+        query = query.where(Notification.type == type)
+    return query
+
+def unread_count_query(user_id: int):
+    return select(func.count(Notification.id)).where(
+        Notification.user_id == user_id,
+        Notification.read == False
+    )
+
 @router.get("/", response_model=List[NotificationSchema])
 async def get_notifications(
+    response: Response,
     read: bool = None,
     type: str = None,
-    page: int = 1,
-    limit: int = 10,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    page: Optional[int] = Query(None, ge=1, deprecated=True, description="Obsoleto: use cursor"),
+    params: PageParams = Depends(page_params_with(10)),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(Notification).filter(Notification.user_id == current_user.id)
+    query = notifications_query(current_user.id, read, type)
     
-    if read is not None:
-        query = query.filter(Notification.read == read)
-    if type:
-        query = query.filter(Notification.type == type)
-    
-    notifications = query.order_by(Notification.created_at.desc()).offset((page-1)*limit).limit(limit).all()
+    # Clientes antigos paginam por número de página
+    if page is not None and not params.cursor:
+        result = await db.execute(offset_page(
+            query, params, (page - 1) * params.limit, Notification.id, Notification.created_at,
+            descending=True, response=response
+        ))
+        return result.scalars().all()
     
-    return notifications
+    result = await db.execute(
+        keyset(query, params, Notification.id, Notification.created_at, descending=True)
+    )
+    return finish_page(result.scalars().all(), params, response, "created_at")
 
 @router.get("/unread-count")
 async def get_unread_count(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    count = db.query(Notification).filter(
-        Notification.user_id == current_user.id,
-        Notification.read == False
-    ).count()
+    count = await db.scalar(unread_count_query(current_user.id))
     
     return {"unread_count": count}
 
 @router.put("/{notification_id}/read", response_model=NotificationSchema)
 async def mark_as_read(
     notification_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    notification = db.query(Notification).filter(
-        Notification.id == notification_id,
-        Notification.user_id == current_user.id
-    ).first()
+    notification = (await db.execute(
+        select(Notification).where(
+            Notification.id == notification_id,
+            Notification.user_id == current_user.id
+        )
+    )).scalars().first()
     
     if not notification:
         raise HTTPException(status_code=404, detail="Notificação não encontrada")
     
     notification.read = True
-    db.commit()
-    db.refresh(notification)
+    await db.commit()
+    await db.refresh(notification)
     
     return notification
 
 @router.put("/read-all")
 async def mark_all_as_read(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db.query(Notification).filter(
-        Notification.user_id == current_user.id,
-        Notification.read == False
-    ).update({"read": True})
+    await db.execute(
+        update(Notification).where(
+            Notification.user_id == current_user.id,
+            Notification.read == False
+        ).values(read=True)
+    )
     
-    db.commit()
+    await db.commit()
     
     return {"message": "Todas notificações marcadas como lidas"}
 
 @router.delete("/{notification_id}")
 async def delete_notification(
     notification_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    notification = db.query(Notification).filter(
-        Notification.id == notification_id,
-        Notification.user_id == current_user.id
-    ).first()
+    notification = (await db.execute(
+        select(Notification).where(
+            Notification.id == notification_id,
+            Notification.user_id == current_user.id
+        )
+    )).scalars().first()
     
     if not notification:
         raise HTTPException(status_code=404, detail="Notificação não encontrada")
     
-    db.delete(notification)
-    db.commit()
+    await db.delete(notification)
+    await db.commit()
     
     return {"message": "Notificação removida"}
 
 @router.post("/send")
 async def send_notification(
     notification_data: NotificationCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     notification = Notification(**notification_data.dict())
     db.add(notification)
-    db.commit()
+    await db.commit()
     
     return {"message": "Notificação enviada com sucesso"}
\ No newline at end of file
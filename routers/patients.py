@@ -1,23 +1,31 @@
 # Importações necessárias
-from fastapi import APIRouter, Depends, HTTPException, status  # Importa classes do FastAPI para criar rotas, lidar com dependências e erros HTTP
-from sqlalchemy.orm import Session  # Importa Session do SQLAlchemy para interação com o banco de dados
+from fastapi import APIRouter, Depends, HTTPException, Response, status  # Importa classes do FastAPI para criar rotas, lidar com dependências e erros HTTP
+from sqlalchemy import select, func  # Construção de consultas no estilo SQLAlchemy 2.0
+from sqlalchemy.ext.asyncio import AsyncSession  # Sessão assíncrona: não bloqueia o event loop
 from typing import List  # Para tipagem de listas na resposta das rotas
-from core.database import get_db  # Função que retorna uma sessão do banco de dados
-from models.models import Patient, User, Appointment, UserType  # Importa os modelos do banco de dados
+from core.database import get_async_db  # Função que retorna uma sessão assíncrona do banco de dados
+from core.pagination import PageParams, legacy_page_params, keyset, finish_page  # Paginação por cursor
+from models.models import Patient, Appointment, UserType  # Importa os modelos do banco de dados
 from schemas.schemas import PatientCreate, Patient as PatientSchema  # Importa schemas para validação e resposta
-from services.auth_service import get_current_user  # Função que retorna o usuário autenticado
+from services.auth_service import Principal, get_current_user  # Função que retorna o usuário autenticado
 from utils import calculate_age  # Função auxiliar para calcular idade a partir da data de nascimento
 
 # Criação do roteador FastAPI para a entidade "patients"
 router = APIRouter(prefix="/patients", tags=["patients"])
 
+# Consulta de uma página dos pacientes do psicólogo (também usada pelos testes de plano de consulta)
+def patients_page_query(psychologist_id: int, page: PageParams):
+    return keyset(select(Patient).where(Patient.psychologist_id == psychologist_id), page, Patient.id)
+
 # ======================================
 # Rota para listar pacientes do psicólogo
 # ======================================
 @router.get("/", response_model=List[PatientSchema])
 async def get_patients(
-    current_user: User = Depends(get_current_user),  # Recupera o usuário autenticado
-    db: Session = Depends(get_db)  # Cria uma sessão com o banco de dados
+    response: Response,  # Usada para devolver o cursor da próxima página (X-Next-Cursor)
+    page: PageParams = Depends(legacy_page_params),  # Cursor e limite da página
+    current_user: Principal = Depends(get_current_user),  # Recupera o usuário autenticado
+    db: AsyncSession = Depends(get_async_db)  # Cria uma sessão com o banco de dados
 ):
     # Verifica se o usuário autenticado é um psicólogo
     if current_user.type != UserType.PSICOLOGO:
@@ -26,21 +34,23 @@ async def get_patients(
             detail="Apenas psicólogos podem acessar lista de pacientes"
         )
     
-    # Consulta todos os pacientes que pertencem ao psicólogo autenticado
-    patients = db.query(Patient).filter(
-        Patient.psychologist_id == current_user.id
-    ).all()
+    # Consulta uma página dos pacientes que pertencem ao psicólogo autenticado
+    patients = finish_page(
+        (await db.execute(patients_page_query(current_user.id, page))).scalars().all(), page, response
+    )
     
-    # Calcula o total de sessões para cada paciente
+    # Calcula o total de sessões dos pacientes da página numa única consulta agrupada
+    session_counts = dict((await db.execute(
+        select(Appointment.patient_id, func.count(Appointment.id)).where(
+            Appointment.psychologist_id == current_user.id,
+            Appointment.patient_id.in_([patient.id for patient in patients])
+        ).group_by(Appointment.patient_id)
+    )).all())
     for patient in patients:
-        total_sessions = db.query(Appointment).filter(
-            Appointment.patient_id == patient.id,
-            Appointment.psychologist_id == current_user.id
-        ).count()
         # Adiciona atributo "total_sessions" dinamicamente ao paciente
-        patient.total_session = total_sessions
+        patient.total_session = session_counts.get(patient.id, 0)
     
-    # Retorna a lista de pacientes com o total de sessões
+    # Retorna a página de pacientes com o total de sessões
     return patients
 
 # ======================================
@@ -49,8 +59,8 @@ async def get_patients(
 @router.get("/{patient_id}", response_model=PatientSchema)
 async def get_patient(
     patient_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.type != UserType.PSICOLOGO:
         raise HTTPException(
@@ -58,10 +68,12 @@ async def get_patient(
             detail="Apenas psicólogos podem acessar detalhes de pacientes"
         )
     
-    patient = db.query(Patient).filter(
-        Patient.id == patient_id,
-        Patient.psychologist_id == current_user.id
-    ).first()
+    patient = (await db.execute(
+        select(Patient).where(
+            Patient.id == patient_id,
+            Patient.psychologist_id == current_user.id
+        )
+    )).scalars().first()
     
     if not patient:
         raise HTTPException(
@@ -70,10 +82,12 @@ async def get_patient(
         )
     
     # Calcula total de sessões
-    total_sessions = db.query(Appointment).filter(
-        Appointment.patient_id == patient.id,
-        Appointment.psychologist_id == current_user.id
-    ).count()
+    total_sessions = await db.scalar(
+        select(func.count(Appointment.id)).where(
+            Appointment.patient_id == patient.id,
+            Appointment.psychologist_id == current_user.id
+        )
+    )
     patient.total_session = total_sessions
     
     return patient
@@ -84,8 +98,8 @@ async def get_patient(
 @router.post("/", response_model=PatientSchema)
 async def create_patient(
     patient_data: PatientCreate,  # Recebe os dados do paciente via schema
-    current_user: User = Depends(get_current_user),  # Usuário autenticado
-    db: Session = Depends(get_db)  # Sessão do banco
+    current_user: Principal = Depends(get_current_user),  # Usuário autenticado
+    db: AsyncSession = Depends(get_async_db)  # Sessão do banco
 ):
     # Verifica se o usuário é psicólogo
     if current_user.type != UserType.PSICOLOGO:
@@ -95,10 +109,12 @@ async def create_patient(
         )
     
     # Verifica se já existe um paciente com o mesmo email para este psicólogo
-    existing_patient = db.query(Patient).filter(
-        Patient.email == patient_data.email,
-        Patient.psychologist_id == patient_data.psychologist_id
-    ).first()
+    existing_patient = (await db.execute(
+        select(Patient.id).where(
+            Patient.email == patient_data.email,
+            Patient.psychologist_id == patient_data.psychologist_id
+        )
+    )).first()
     
     if existing_patient:
         raise HTTPException(
@@ -122,8 +138,8 @@ async def create_patient(
     
     # Adiciona o paciente no banco e confirma a transação
     db.add(db_patient)
-    db.commit()
-    db.refresh(db_patient)  # Atualiza o objeto com dados do banco (ex: id gerado)
+    await db.commit()
+    await db.refresh(db_patient)  # Atualiza o objeto com dados do banco (ex: id gerado)
     
     return db_patient
 
@@ -133,8 +149,8 @@ async def create_patient(
 @router.get("/{patient_id}/sessions")
 async def get_patient_sessions(
     patient_id: int,  # Recebe o id do paciente
-    current_user: User = Depends(get_current_user),  # Usuário autenticado
-    db: Session = Depends(get_db)  # Sessão do banco
+    current_user: Principal = Depends(get_current_user),  # Usuário autenticado
+    db: AsyncSession = Depends(get_async_db)  # Sessão do banco
 ):
     # Somente psicólogos podem acessar
     if current_user.type != UserType.PSICOLOGO:
@@ -144,10 +160,12 @@ async def get_patient_sessions(
         )
     
     # Consulta todas as sessões do paciente específico para o psicólogo
-    sessions = db.query(Appointment).filter(
-        Appointment.patient_id == patient_id,
-        Appointment.psychologist_id == current_user.id
-    ).all()
+    sessions = (await db.execute(
+        select(Appointment).where(
+            Appointment.patient_id == patient_id,
+            Appointment.psychologist_id == current_user.id
+        )
+    )).scalars().all()
     
     return sessions
 
@@ -158,8 +176,8 @@ async def get_patient_sessions(
 async def add_patient_note(
     patient_id: int,  # Recebe o id do paciente
     note_data: dict,  # Recebe os dados da anotação
-    current_user: User = Depends(get_current_user),  # Usuário autenticado
-    db: Session = Depends(get_db)  # Sessão do banco
+    current_user: Principal = Depends(get_current_user),  # Usuário autenticado
+    db: AsyncSession = Depends(get_async_db)  # Sessão do banco
 ):
     # Apenas psicólogos podem adicionar anotações
     if current_user.type != UserType.PSICOLOGO:
@@ -169,10 +187,12 @@ async def add_patient_note(
         )
     
     # Verifica se o paciente pertence ao psicólogo autenticado
-    patient = db.query(Patient).filter(
-        Patient.id == patient_id,
-        Patient.psychologist_id == current_user.id
-    ).first()
+    patient = (await db.execute(
+        select(Patient).where(
+            Patient.id == patient_id,
+            Patient.psychologist_id == current_user.id
+        )
+    )).scalars().first()
     
     if not patient:
         raise HTTPException(
@@ -1,21 +1,30 @@
 # Importações necessárias
-from fastapi import APIRouter, Depends  # FastAPI para criar rotas e lidar com dependências
+from fastapi import APIRouter, Depends, Response  # FastAPI para criar rotas e lidar com dependências
 from sqlalchemy.orm import Session  # Session do SQLAlchemy para interação com o banco de dados
 from typing import List  # Para definir que a resposta será uma lista de psicólogos
 from core.database import get_db  # Função que fornece a sessão do banco de dados
+from core.pagination import PageParams, legacy_page_params, keyset, finish_page  # Paginação por cursor
 from models.models import User, UserType  # Importa o modelo User e enumeração UserType
 from schemas.schemas import Psychologist  # Importa o schema para a resposta da rota
 
 # Criação do roteador FastAPI para a entidade "psychologists"
 router = APIRouter(prefix="/psychologists", tags=["psychologists"], redirect_slashes=False)
 
+# Consulta de uma página de psicólogos (também usada pelos testes de plano de consulta)
+def psychologists_page_query(db: Session, page: PageParams):
+    return keyset(db.query(User).filter(User.type == UserType.PSICOLOGO), page, User.id)
+
 # ======================================
 # Rota para listar todos os psicólogos
 # ======================================
 @router.get("/", response_model=List[Psychologist])
-async def get_psychologists(db: Session = Depends(get_db)):  # Recebe a sessão do banco como dependência
-    # Consulta todos os usuários do tipo PSICOLOGO
-    psychologists = db.query(User).filter(User.type == UserType.PSICOLOGO).all()
+async def get_psychologists(
+    response: Response,  # Usada para devolver o cursor da próxima página (X-Next-Cursor)
+    page: PageParams = Depends(legacy_page_params),  # Cursor e limite da página
+    db: Session = Depends(get_db)  # Recebe a sessão do banco como dependência
+):
+    # Consulta uma página dos usuários do tipo PSICOLOGO, ordenada por id
+    psychologists = finish_page(psychologists_page_query(db, page).all(), page, response)
     
     # Retorna a lista de psicólogos convertida para o schema de resposta
     # Para cada psicólogo, cria um objeto Psychologist preenchendo:
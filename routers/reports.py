@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from core.database import get_db
-from models.models import User, UserType
+from core.database import get_read_db
+from models.models import UserType
 from schemas.schemas import ReportsData
-from services.auth_service import get_current_user
+from services.auth_service import Principal, get_current_user
 from services.report_service import generate_report
 
 router = APIRouter(prefix="/reports", tags=["reports"])
@@ -11,8 +11,8 @@ router = APIRouter(prefix="/reports", tags=["reports"])
 @router.get("/{psychologist_id}", response_model=ReportsData)
 async def get_reports(
     psychologist_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
 ):
     if current_user.type != UserType.PSICOLOGO:
         raise HTTPException(
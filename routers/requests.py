@@ -1,43 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from typing import List
 from core.database import get_db
+from core.json_sql import json_array_contains
+from core.pagination import PageParams, legacy_page_params, keyset, finish_page
 from models.models import Request, User, UserType, RequestStatus
 from schemas.schemas import RequestCreate, RequestUpdate, Request as RequestSchema
-from services.auth_service import get_current_user
+from services.auth_service import Principal, get_current_user
 from services.email_service import send_email_new_request_to_psychologist, send_email_request_accepted, send_email_request_reject
-import json
 from datetime import datetime
  
 router = APIRouter(prefix="/requests", tags=["requests"], redirect_slashes=False)
  
-@router.get("/", response_model=List[RequestSchema])
-async def get_requests(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+# Consultas das rotas (também usadas pelos testes de plano de consulta)
+def requests_page_query(db: Session, current_user: Principal, page: PageParams, preferred_date: str = None):
     if current_user.type == UserType.PSICOLOGO:
         # Psicólogos veem solicitações direcionadas a eles
-        requests = db.query(Request).filter(
+        query = db.query(Request).filter(
             Request.preferred_psychologist == current_user.id
-        ).all()
+        )
     elif current_user.type == UserType.PACIENTE:
         # Pacientes veem suas próprias solicitações
-        requests = db.query(Request).filter(
+        query = db.query(Request).filter(
             Request.patient_email == current_user.email
-        ).all()
+        )
     else:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Acesso não autorizado"
         )
    
-    # Converte JSON strings de volta para listas
-    for req in requests:
-        req.preferred_dates = json.loads(req.preferred_dates) if req.preferred_dates else []
-        req.preferred_times = json.loads(req.preferred_times) if req.preferred_times else []
+    # Filtro aplicado no banco sobre o array JSON
+    if preferred_date:
+        query = query.filter(json_array_contains(Request.preferred_dates, preferred_date))
    
-    return requests
+    # Mais recentes primeiro
+    return keyset(query, page, Request.id, Request.created_at, descending=True)
+ 
+def pending_request_query(db: Session, patient_email: str, psychologist_id: int):
+    return db.query(Request).filter(
+        Request.patient_email == patient_email,
+        Request.preferred_psychologist == psychologist_id,
+        Request.status == RequestStatus.PENDENTE
+    )
+ 
+@router.get("/", response_model=List[RequestSchema])
+async def get_requests(
+    response: Response,
+    preferred_date: str = None,
+    page: PageParams = Depends(legacy_page_params),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    requests = requests_page_query(db, current_user, page, preferred_date).all()
+    return finish_page(requests, page, response, "created_at")
  
 @router.post("/", response_model=RequestSchema)
 async def create_request(
@@ -45,10 +61,8 @@ async def create_request(
     db: Session = Depends(get_db)
 ):
     # Verifica se já existe solicitação pendente
-    existing_request = db.query(Request).filter(
-        Request.patient_email == request_data.patient_email,
-        Request.preferred_psychologist == request_data.preferred_psychologist,
-        Request.status == RequestStatus.PENDENTE
+    existing_request = pending_request_query(
+        db, request_data.patient_email, request_data.preferred_psychologist
     ).first()
    
     if existing_request:
@@ -64,8 +78,8 @@ async def create_request(
         preferred_psychologist=request_data.preferred_psychologist,
         description=request_data.description,
         urgency=request_data.urgency,
-        preferred_dates=json.dumps(request_data.preferred_dates),
-        preferred_times=json.dumps(request_data.preferred_times),
+        preferred_dates=request_data.preferred_dates,
+        preferred_times=request_data.preferred_times,
         status=RequestStatus.PENDENTE
     )
    
@@ -85,17 +99,13 @@ async def create_request(
         except Exception as e:
             print(f"Erro ao enviar email para psicólogo: {e}")
    
-    # Converte de volta para retorno
-    db_request.preferred_dates = request_data.preferred_dates
-    db_request.preferred_times = request_data.preferred_times
-   
     return db_request
  
 @router.put("/{request_id}", response_model=RequestSchema)
 async def update_request_status(
     request_id: int,
     update_data: RequestUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     if current_user.type != UserType.PSICOLOGO:
@@ -139,9 +149,5 @@ async def update_request_status(
     except Exception as e:
         print(f"Erro ao enviar email para paciente: {e}")
    
-    # Converte JSON strings de volta para listas
-    request.preferred_dates = json.loads(request.preferred_dates) if request.preferred_dates else []
-    request.preferred_times = json.loads(request.preferred_times) if request.preferred_times else []
-   
     return request
  
\ No newline at end of file
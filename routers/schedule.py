@@ -1,36 +1,83 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import delete
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional, Union
 from core.database import get_db
-from models.models import Schedule, User, UserType
-from schemas.advanced_schemas import ScheduleCreate, ScheduleUpdate, Schedule as ScheduleSchema
-from services.auth_service import get_current_user
-import json
+from core.pagination import PageParams, legacy_page_params, keyset, finish_page
+from models.models import Schedule, ScheduleException, UserType, parse_time
+from schemas.advanced_schemas import (
+    ScheduleCreate, ScheduleUpdate, Schedule as ScheduleSchema, ScheduleExceptionSchema, ScheduleBlockSchema,
+    ScheduleExceptionBulkCreate
+)
+from services.auth_service import Principal, get_current_user
+from services.availability_service import invalidate_availability
+from datetime import date as date_type, timedelta
+import os
 
 router = APIRouter(prefix="/schedule", tags=["schedule"])
 
+# Maior período aceito por uma operação de exceções em lote (ex.: férias)
+MAX_EXCEPTION_RANGE_DAYS = int(os.getenv("MAX_EXCEPTION_RANGE_DAYS", "366"))
+
+
+def get_owned_schedule(db: Session, schedule_id: int, current_user: Principal) -> Schedule:
+    schedule = db.query(Schedule).filter(
+        Schedule.id == schedule_id,
+        Schedule.psychologist_id == current_user.id
+    ).first()
+    if not schedule:
+        raise HTTPException(status_code=404, detail="Agenda não encontrada")
+    return schedule
+
+
+def check_time_range(start_time: Optional[str], end_time: Optional[str]):
+    """Faixa de horário da exceção: as duas pontas ou nenhuma (dia inteiro)"""
+    if start_time is None and end_time is None:
+        return
+    start, end = parse_time(start_time), parse_time(end_time)
+    if start is None or end is None or start >= end:
+        raise HTTPException(status_code=400, detail="Faixa de horário inválida, use HH:MM com início antes do fim")
+
+
+def schedule_page_query(db: Session, psychologist_id: int, page: PageParams):
+    return keyset(db.query(Schedule).filter(Schedule.psychologist_id == psychologist_id), page, Schedule.id)
+
+
+def exceptions_query(query, psychologist_id: int, date_from: Optional[date_type], date_to: Optional[date_type]):
+    """Exceções do psicólogo no período, em ordem de data (query escolhe as colunas)"""
+    query = query.filter(ScheduleException.psychologist_id == psychologist_id)
+    if date_from:
+        query = query.filter(ScheduleException.date >= date_from)
+    if date_to:
+        query = query.filter(ScheduleException.date <= date_to)
+    return query.order_by(ScheduleException.date)
+
+
+def check_date_range(date_from: date_type, date_to: date_type):
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="date_to deve ser igual ou posterior a date_from")
+    if (date_to - date_from).days >= MAX_EXCEPTION_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Período máximo de {MAX_EXCEPTION_RANGE_DAYS} dias")
+
 @router.get("/", response_model=List[ScheduleSchema])
 async def get_schedule(
+    response: Response,
     psychologist_id: int = None,
-    current_user: User = Depends(get_current_user),
+    page: PageParams = Depends(legacy_page_params),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    if psychologist_id:
-        schedules = db.query(Schedule).filter(Schedule.psychologist_id == psychologist_id).all()
-    else:
+    if not psychologist_id:
         if current_user.type != UserType.PSICOLOGO:
             raise HTTPException(status_code=403, detail="Apenas psicólogos podem acessar agenda")
-        schedules = db.query(Schedule).filter(Schedule.psychologist_id == current_user.id).all()
-    
-    for schedule in schedules:
-        schedule.exceptions = json.loads(schedule.exceptions) if schedule.exceptions else []
+        psychologist_id = current_user.id
     
-    return schedules
+    return finish_page(schedule_page_query(db, psychologist_id, page).all(), page, response)
 
 @router.post("/", response_model=ScheduleSchema)
 async def create_schedule(
     schedule_data: ScheduleCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     if current_user.type != UserType.PSICOLOGO:
@@ -47,7 +94,6 @@ async def create_schedule(
     db.add(schedule)
     db.commit()
     db.refresh(schedule)
-    schedule.exceptions = []
     
     return schedule
 
@@ -55,7 +101,7 @@ async def create_schedule(
 async def update_schedule(
     schedule_id: int,
     schedule_data: ScheduleUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     schedule = db.query(Schedule).filter(
@@ -71,14 +117,13 @@ async def update_schedule(
     
     db.commit()
     db.refresh(schedule)
-    schedule.exceptions = json.loads(schedule.exceptions) if schedule.exceptions else []
     
     return schedule
 
 @router.delete("/{schedule_id}")
 async def delete_schedule(
     schedule_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     schedule = db.query(Schedule).filter(
@@ -99,21 +144,139 @@ async def add_exception(
     schedule_id: int,
     date: str,
     reason: str,
-    current_user: User = Depends(get_current_user),
+    start_time: str = None,
+    end_time: str = None,
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    schedule = db.query(Schedule).filter(
-        Schedule.id == schedule_id,
-        Schedule.psychologist_id == current_user.id
+    schedule = get_owned_schedule(db, schedule_id, current_user)
+    
+    try:
+        exception_date = date_type.fromisoformat(date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Data inválida, use AAAA-MM-DD")
+    check_time_range(start_time, end_time)
+    
+    existing = db.query(ScheduleException.id).filter(
+        ScheduleException.schedule_id == schedule.id,
+        ScheduleException.date == exception_date,
+        # Comparação com None vira IS NULL (exceção de dia inteiro)
+        ScheduleException.start_time == start_time,
+        ScheduleException.end_time == end_time
     ).first()
+    if not existing:
+        db.add(ScheduleException(
+            psychologist_id=current_user.id,
+            schedule_id=schedule.id,
+            date=exception_date,
+            start_time=start_time,
+            end_time=end_time,
+            reason=reason
+        ))
+        db.commit()
     
-    if not schedule:
-        raise HTTPException(status_code=404, detail="Agenda não encontrada")
+    return {"message": "Exceção adicionada com sucesso"}
+
+@router.post("/exceptions/bulk")
+async def add_exceptions_bulk(
+    exception_data: ScheduleExceptionBulkCreate,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Bloqueia todos os dias de um período (ex.: férias), inteiros ou numa faixa de horário"""
+    if current_user.type != UserType.PSICOLOGO:
+        raise HTTPException(status_code=403, detail="Apenas psicólogos podem alterar agenda")
+    check_date_range(exception_data.date_from, exception_data.date_to)
+    check_time_range(exception_data.start_time, exception_data.end_time)
+    if exception_data.schedule_id is not None:
+        get_owned_schedule(db, exception_data.schedule_id, current_user)
     
-    exceptions = json.loads(schedule.exceptions) if schedule.exceptions else []
-    exceptions.append(date)
-    schedule.exceptions = json.dumps(exceptions)
+    # Uma busca por faixa no índice (psicólogo, data) para pular as já existentes
+    existing = {
+        row.date for row in db.query(ScheduleException.date).filter(
+            ScheduleException.psychologist_id == current_user.id,
+            ScheduleException.date >= exception_data.date_from,
+            ScheduleException.date <= exception_data.date_to,
+            ScheduleException.schedule_id == exception_data.schedule_id,
+            ScheduleException.start_time == exception_data.start_time,
+            ScheduleException.end_time == exception_data.end_time
+        )
+    }
+    days = (exception_data.date_to - exception_data.date_from).days + 1
+    new_dates = [
+        day for day in (exception_data.date_from + timedelta(days=n) for n in range(days))
+        if day not in existing
+    ]
+    db.add_all([
+        ScheduleException(
+            psychologist_id=current_user.id,
+            schedule_id=exception_data.schedule_id,
+            date=day,
+            start_time=exception_data.start_time,
+            end_time=exception_data.end_time,
+            reason=exception_data.reason or ""
+        )
+        for day in new_dates
+    ])
+    db.commit()
     
+    return {"message": "Exceções adicionadas com sucesso", "created": len(new_dates), "skipped": len(existing)}
+
+@router.delete("/exceptions/bulk")
+async def delete_exceptions_bulk(
+    date_from: date_type,
+    date_to: date_type,
+    schedule_id: int = None,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Remove as exceções de um período (de uma agenda ou de todas)"""
+    if current_user.type != UserType.PSICOLOGO:
+        raise HTTPException(status_code=403, detail="Apenas psicólogos podem alterar agenda")
+    check_date_range(date_from, date_to)
+    
+    query = delete(ScheduleException).where(
+        ScheduleException.psychologist_id == current_user.id,
+        ScheduleException.date >= date_from,
+        ScheduleException.date <= date_to
+    )
+    if schedule_id is not None:
+        query = query.where(ScheduleException.schedule_id == schedule_id)
+    removed = db.execute(
+        query.returning(ScheduleException.date).execution_options(synchronize_session=False)
+    ).scalars().all()
     db.commit()
+    # DELETE em lote não dispara os eventos do ORM
+    invalidate_availability(current_user.id, removed)
     
-    return {"message": "Exceção adicionada com sucesso"}
\ No newline at end of file
+    return {"message": "Exceções removidas com sucesso", "removed": len(removed)}
+
+@router.get("/exceptions", response_model=List[Union[ScheduleExceptionSchema, ScheduleBlockSchema]])
+async def get_exceptions(
+    psychologist_id: int = None,
+    date_from: str = None,
+    date_to: str = None,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Exceções da agenda; quem não é o dono vê só os períodos bloqueados, sem o motivo"""
+    if not psychologist_id:
+        if current_user.type != UserType.PSICOLOGO:
+            raise HTTPException(status_code=403, detail="Apenas psicólogos podem acessar agenda")
+        psychologist_id = current_user.id
+    is_owner = current_user.type == UserType.PSICOLOGO and psychologist_id == current_user.id
+    
+    try:
+        start = date_type.fromisoformat(date_from) if date_from else None
+        end = date_type.fromisoformat(date_to) if date_to else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Data inválida, use AAAA-MM-DD")
+    
+    if is_owner:
+        query = db.query(ScheduleException)
+    else:
+        query = db.query(ScheduleException.date, ScheduleException.start_time, ScheduleException.end_time)
+    rows = exceptions_query(query, psychologist_id, start, end).all()
+    if is_owner:
+        return rows
+    return [ScheduleBlockSchema.model_validate(row) for row in rows]
\ No newline at end of file
@@ -1,10 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
-from core.database import get_db
+from core.database import get_read_db
 from models.models import User, Patient, Appointment, UserType
 from schemas.advanced_schemas import SearchResults
-from services.auth_service import get_current_user
+from services.auth_service import Principal, get_current_user
 
 router = APIRouter(prefix="/search", tags=["search"])
 
@@ -13,8 +13,8 @@ async def search(
     q: str,
     type: str = "all",
     limit: int = 10,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
 ):
     if current_user.type != UserType.PSICOLOGO:
         raise HTTPException(status_code=403, detail="Apenas psicólogos")
@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List
 from core.database import get_db
 from models.models import User, UserType
-from services.auth_service import get_current_user
+from services.auth_service import Principal, get_current_user, get_current_user_model
 from services.storage_service import storage_service
 
 router = APIRouter(prefix="/upload", tags=["upload"])
@@ -11,7 +11,7 @@ router = APIRouter(prefix="/upload", tags=["upload"])
 @router.post("/avatar")
 async def upload_avatar(
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(get_current_user_model),
     db: Session = Depends(get_db)
 ):
     # Validar tipo de arquivo
@@ -40,7 +40,7 @@ async def upload_avatar(
 @router.post("/attachment")
 async def upload_attachment(
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     if current_user.type != UserType.PSICOLOGO:
@@ -59,7 +59,7 @@ async def upload_attachment(
 @router.post("/bulk")
 async def upload_multiple(
     files: List[UploadFile] = File(...),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     if current_user.type != UserType.PSICOLOGO:
@@ -83,7 +83,7 @@ async def upload_multiple(
 @router.delete("/file")
 async def delete_file(
     file_url: str,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     if storage_service.delete_file(file_url):
@@ -1,27 +1,20 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from sqlalchemy.orm import Session
-from core.database import get_db
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from core.database import session_scope
 from services.websocket_manager import manager
-from jose import jwt, JWTError
-from utils import SECRET_KEY, ALGORITHM
-from models.models import User
+from services.auth_service import resolve_principal
 import json
 
 router = APIRouter()
 
-async def get_user_from_token(token: str, db: Session):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-        if email:
-            return db.query(User).filter(User.email == email).first()
-    except JWTError:
-        return None
-    return None
+async def get_user_from_token(token: str):
+    # Sessão só durante o handshake: o socket aberto não segura conexão do pool.
+    # Outras operações no banco em nome do socket também devem usar session_scope().
+    async with session_scope() as db:
+        return await resolve_principal(token, db)
 
 @router.websocket("/ws/{token}")
-async def websocket_endpoint(websocket: WebSocket, token: str, db: Session = Depends(get_db)):
-    user = await get_user_from_token(token, db)
+async def websocket_endpoint(websocket: WebSocket, token: str):
+    user = await get_user_from_token(token)
     
     if not user:
         await websocket.close(code=1008)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime, date, time
 from typing import Optional, List, Dict, Any
 
@@ -27,6 +27,35 @@ class Schedule(ScheduleBase):
     class Config:
         from_attributes = True
 
+class ScheduleExceptionSchema(BaseModel):
+    id: int
+    psychologist_id: int
+    schedule_id: Optional[int] = None
+    date: date
+    start_time: Optional[str] = None
+    end_time: Optional[str] = None
+    reason: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
+
+# Visão pública de uma exceção: só o período bloqueado, sem o motivo
+class ScheduleBlockSchema(BaseModel):
+    date: date
+    start_time: Optional[str] = None
+    end_time: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
+
+class ScheduleExceptionBulkCreate(BaseModel):
+    date_from: date
+    date_to: date
+    schedule_id: Optional[int] = None  # vazio = todas as agendas
+    start_time: Optional[str] = None  # vazio = dia inteiro
+    end_time: Optional[str] = None
+    reason: Optional[str] = ""
+
 # Notification Schemas
 class NotificationBase(BaseModel):
     title: str
@@ -56,7 +85,8 @@ class ChatMessage(BaseModel):
     user_id: int
     role: str
     content: str
-    metadata: Dict[str, Any]
+    # No modelo a coluna se chama meta_data (metadata é reservado pelo SQLAlchemy)
+    metadata: Dict[str, Any] = Field(default_factory=dict, validation_alias="meta_data")
     created_at: datetime
     
     class Config:
@@ -112,6 +112,74 @@ class AppointmentSchema(AppointmentBase):
     psychologist_id: int
     status: AppointmentStatus
     created_at: datetime
+    start_at: Optional[datetime] = None
+    end_at: Optional[datetime] = None
+    series_id: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+
+class AppointmentStatusChange(BaseModel):
+    id: int
+    status: AppointmentStatus
+
+class AppointmentBulkStatusUpdate(BaseModel):
+    items: List[AppointmentStatusChange]
+
+class AppointmentStatusResult(BaseModel):
+    id: int
+    # updated, unchanged, not_found, forbidden ou conflict
+    result: str
+    old_status: Optional[AppointmentStatus] = None
+    status: Optional[AppointmentStatus] = None
+
+
+class AppointmentChangeSchema(BaseModel):
+    id: int
+    appointment_id: int
+    action: str
+    changed_at: datetime
+    # Estado atual do agendamento (None se foi removido)
+    appointment: Optional[AppointmentSchema] = None
+
+class AppointmentChangesPage(BaseModel):
+    changes: List[AppointmentChangeSchema]
+    cursor: str
+    has_more: bool
+
+
+class AppointmentSeriesCreate(BaseModel):
+    patient_id: int
+    start_date: date
+    time: str
+    duration: Optional[int] = 50
+    description: Optional[str] = ""
+    interval_weeks: int = 1
+    occurrences: Optional[int] = None
+    until: Optional[date] = None
+    # Cria as demais sessões quando algumas datas estão ocupadas
+    skip_conflicts: bool = False
+
+class AppointmentSeriesUpdate(BaseModel):
+    time: Optional[str] = None
+    duration: Optional[int] = None
+    description: Optional[str] = None
+
+class AppointmentSeriesSchema(BaseModel):
+    id: int
+    patient_id: int
+    psychologist_id: int
+    start_date: date
+    time: str
+    duration: int
+    interval_weeks: int
+    occurrences: Optional[int] = None
+    until: Optional[date] = None
+    description: Optional[str] = None
+    created_at: datetime
+    appointments: List[AppointmentSchema] = []
+    skipped_dates: List[date] = []
 
     class Config:
         from_attributes = True
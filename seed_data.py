@@ -1,12 +1,13 @@
 from sqlalchemy.orm import Session
 from core.database import SessionLocal, engine
-from models.models import Base, User, Patient, Appointment, Request, UserType, AppointmentStatus, RequestStatus, RefreshToken
+from core.migrations import run_migrations
+from models.models import User, Patient, Appointment, Request, UserType, AppointmentStatus, RequestStatus, RefreshToken
 from utils import get_password_hash
 from datetime import date, datetime, timedelta
 import json
 
-# Cria as tabelas
-Base.metadata.create_all(bind=engine)
+# Cria/atualiza as tabelas
+run_migrations(engine)
 
 def seed_database():
     db = SessionLocal()
@@ -1,34 +1,207 @@
+from dataclasses import dataclass
+from typing import Dict, Optional
+from sqlalchemy import select, event, inspect as sa_inspect
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
-from models.models import User
-from utils import verify_password, get_password_hash, create_access_token, SECRET_KEY, ALGORITHM
-from core.database import get_db
+from models.models import User, UserType
+from utils import SECRET_KEY, ALGORITHM
+from core.cache import TTLCache
+from core.database import get_async_db, get_db
+from services.password_service import password_hasher
+import hashlib
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = db.query(User).filter(User.email == email).first()
-    if not user or not verify_password(password, user.password):
+# Usuário autenticado, sem vínculo com sessão do banco
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    type: UserType
+    email: str
+    name: str
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(id=user.id, type=user.type, email=user.email, name=user.name)
+
+
+def user_token_claims(user: User) -> dict:
+    """Claims do access token: o suficiente para autenticar sem consultar o banco"""
+    return {
+        "sub": user.email,
+        "uid": user.id,
+        "typ": user.type.value if isinstance(user.type, UserType) else user.type,
+        "name": user.name,
+        "ver": user.token_version or 0,
+    }
+
+
+class TokenVersionTable:
+    """Versão mínima aceita dos tokens de cada usuário
+
+    Guarda apenas os usuários que já revogaram tokens (token_version > 0) e
+    é recarregada do banco a cada refresh_seconds; no mesmo worker, o
+    incremento é aplicado na hora pelo evento de atualização do User.
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._versions: Dict[int, int] = {}
+        self._loaded_at: Optional[float] = None
+
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_seconds
+
+    async def refresh(self, db: AsyncSession):
+        # Marca antes de consultar para que requisições concorrentes não repitam a carga
+        self._loaded_at = time.monotonic()
+        try:
+            rows = (await db.execute(
+                select(User.id, User.token_version).where(User.token_version > 0)
+            )).all()
+        except SQLAlchemyError as e:
+            logger.warning(f"Falha ao recarregar versões de token: {e}")
+            return
+        versions = dict(rows)
+        # Incrementos locais mais novos que a leitura são preservados
+        for user_id, version in self._versions.items():
+            if version > versions.get(user_id, 0):
+                versions[user_id] = version
+        self._versions = versions
+
+    def bump(self, user_id: int, version: int):
+        if version > self._versions.get(user_id, 0):
+            self._versions[user_id] = version
+
+    def accepts(self, user_id: int, version: int) -> bool:
+        return version >= self._versions.get(user_id, 0)
+
+    def clear(self):
+        self._versions = {}
+        self._loaded_at = None
+
+
+# Cache de principals por subject (e-mail) do token, usado por tokens sem claims
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+TOKEN_VERSION_REFRESH_SECONDS = float(os.getenv("TOKEN_VERSION_REFRESH_SECONDS", "30"))
+principal_cache = TTLCache("principals", maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+# Claims de tokens já verificados, pelo digest do token; a entrada nunca passa do exp
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+token_cache = TTLCache("access_tokens", maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+token_versions = TokenVersionTable(TOKEN_VERSION_REFRESH_SECONDS)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_principal(mapper, connection, target):
+    """Remove o principal do cache quando a linha do usuário muda"""
+    principal_cache.pop(target.email)
+    # E-mail alterado: o subject antigo também sai do cache
+    for old_email in sa_inspect(target).attrs.email.history.deleted or ():
+        principal_cache.pop(old_email)
+    if target.token_version:
+        token_versions.bump(target.id, target.token_version)
+
+
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    user = (await db.execute(select(User).where(User.email == email))).scalars().first()
+    if not user:
         return False
+    # bcrypt roda no pool dedicado; o event loop segue atendendo outras requisições
+    valid, new_hash = await password_hasher.verify_and_update(password, user.password)
+    if not valid:
+        return False
+    if new_hash:
+        # Custo do bcrypt mudou (BCRYPT_ROUNDS): regrava o hash com o custo atual
+        user.password = new_hash
+        await db.commit()
     return user
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+def decode_access_token(token: str) -> Optional[dict]:
+    """Decodifica e verifica o JWT, reaproveitando a verificação de tokens já vistos
+
+    Só tokens válidos entram no cache, com validade limitada ao exp do token.
+    """
+    digest = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(digest)
+    if payload is not None:
+        return payload
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
-        raise credentials_exception
-    
-    user = db.query(User).filter(User.email == email).first()
+        return None
+    exp = payload.get("exp")
+    token_cache.set(digest, payload, None if exp is None else exp - time.time())
+    return payload
+
+async def resolve_principal(token: str, db: AsyncSession) -> Optional[Principal]:
+    """Valida o token e devolve o principal, ou None se inválido
+
+    Tokens com claims (uid, typ, ver) são resolvidos sem consultar o usuário;
+    tokens antigos, só com sub, passam pelo cache e, na falta, pelo banco.
+    """
+    payload = decode_access_token(token)
+    if payload is None:
+        return None
+    email = payload.get("sub")
+    if email is None:
+        return None
+
+    if "uid" in payload and "typ" in payload:
+        if token_versions.is_stale():
+            await token_versions.refresh(db)
+        try:
+            principal = Principal(
+                id=int(payload["uid"]),
+                type=UserType(payload["typ"]),
+                email=email,
+                name=payload.get("name") or "",
+            )
+        except (TypeError, ValueError):
+            return None
+        if not token_versions.accepts(principal.id, int(payload.get("ver", 0))):
+            return None
+        return principal
+
+    principal = principal_cache.get(email)
+    if principal is not None:
+        return principal
+
+    user = (await db.execute(select(User).where(User.email == email))).scalars().first()
     if user is None:
-        raise credentials_exception
-    return user
\ No newline at end of file
+        return None
+    principal = Principal.from_user(user)
+    principal_cache.set(email, principal)
+    return principal
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: AsyncSession = Depends(get_async_db)) -> Principal:
+    principal = await resolve_principal(credentials.credentials, db)
+    if principal is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return principal
+
+def get_current_user_model(principal: Principal = Depends(get_current_user), db: Session = Depends(get_db)) -> User:
+    """Carrega o User na sessão da requisição, para rotas que alteram o próprio usuário"""
+    user = db.get(User, principal.id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
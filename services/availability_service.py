@@ -0,0 +1,368 @@
+"""
+Horários livres a partir da agenda semanal (Schedule)
+
+Cada janela ativa da agenda é dividida em slots de slot_duration minutos,
+alinhados ao início da janela. Dos intervalos da janela são subtraídos as
+sessões agendadas (start_at/end_at) e as exceções (ScheduleException: dia
+inteiro ou faixa de horário, da agenda ou de todas as agendas do
+psicólogo); um slot fica livre quando cabe inteiro no que sobrou.
+
+Um período inteiro é resolvido com três consultas por faixa de datas
+(agendas, exceções e sessões), para um ou vários psicólogos de uma vez.
+Psicólogos sem agenda cadastrada continuam com os horários fixos antigos.
+
+O resultado de cada (psicólogo, dia) fica em cache até que uma sessão,
+agenda ou exceção daquele psicólogo mude; a invalidação vem dos eventos
+do ORM, no flush e de novo no commit.
+"""
+import os
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event, select, inspect as sa_inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+
+from core.cache import TTLCache
+from core.database import session_scope
+from models.models import (
+    Appointment, AppointmentStatus, Schedule, ScheduleException, User, UserType, parse_time
+)
+
+Interval = Tuple[datetime, datetime]
+
+# Horários usados quando o psicólogo ainda não cadastrou agenda
+LEGACY_SLOTS = ("09:00", "10:00", "11:00", "14:00", "15:00", "16:00", "17:00")
+LEGACY_SLOT_DURATION = 50
+
+# Maior período aceito numa consulta de disponibilidade
+MAX_AVAILABILITY_DAYS = 92
+# Psicólogos resolvidos por lote na disponibilidade em lote
+AVAILABILITY_CHUNK_SIZE = 50
+
+# Slots livres por (psicólogo, dia); o TTL só limita a defasagem entre workers
+AVAILABILITY_CACHE_SIZE = int(os.getenv("AVAILABILITY_CACHE_SIZE", "50000"))
+AVAILABILITY_CACHE_TTL = float(os.getenv("AVAILABILITY_CACHE_TTL", "600"))
+availability_cache = TTLCache("availability", maxsize=AVAILABILITY_CACHE_SIZE, ttl=AVAILABILITY_CACHE_TTL)
+# Incrementado a cada invalidação: cálculos iniciados antes dela não são gravados
+_generations: Dict[int, int] = defaultdict(int)
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """Ordena e funde intervalos sobrepostos ou encostados"""
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(windows: Sequence[Interval], busy: Sequence[Interval]) -> List[Interval]:
+    """Remove de windows os trechos cobertos por busy (ambos ordenados e fundidos)"""
+    free: List[Interval] = []
+    i = 0
+    for start, end in windows:
+        # Ocupações que terminam antes desta janela não afetam as seguintes
+        while i < len(busy) and busy[i][1] <= start:
+            i += 1
+        cursor = start
+        j = i
+        while j < len(busy) and busy[j][0] < end:
+            if busy[j][0] > cursor:
+                free.append((cursor, busy[j][0]))
+            cursor = max(cursor, busy[j][1])
+            j += 1
+        if cursor < end:
+            free.append((cursor, end))
+    return free
+
+
+def slots_in(window: Interval, duration: int, free: Sequence[Interval]) -> List[datetime]:
+    """Inícios dos slots da grade da janela que cabem inteiros num intervalo livre"""
+    step = timedelta(minutes=duration)
+    slots = []
+    start = window[0]
+    k = 0
+    while start + step <= window[1]:
+        while k < len(free) and free[k][1] < start + step:
+            k += 1
+        if k == len(free):
+            break
+        if free[k][0] <= start:
+            slots.append(start)
+        start += step
+    return slots
+
+
+def _at(day: date, value) -> datetime:
+    parsed = parse_time(value)
+    return datetime.combine(day, parsed) if parsed else None
+
+
+def _exception_interval(day: date, start_time, end_time) -> Interval:
+    start, end = _at(day, start_time), _at(day, end_time)
+    if start is None or end is None:
+        # Sem faixa válida: o dia inteiro
+        return datetime.combine(day, time.min), datetime.combine(day + timedelta(days=1), time.min)
+    return start, end
+
+
+def daterange(date_from: date, date_to: date) -> List[date]:
+    return [date_from + timedelta(days=n) for n in range((date_to - date_from).days + 1)]
+
+
+def compute_availability(
+    days: Sequence[date],
+    schedules: Sequence,
+    exceptions: Sequence,
+    booked: Sequence[Interval],
+) -> Dict[date, List[str]]:
+    """Slots livres ("HH:MM") de um psicólogo em cada dia
+
+    - schedules: linhas com id, day_of_week (0 = segunda, como date.weekday()),
+      start_time, end_time, slot_duration e, opcionalmente, is_active. Os
+      horários legados só valem para quem não tem nenhuma agenda; agendas
+      todas desativadas significam nenhum horário livre
+    - exceptions: linhas com schedule_id, date, start_time e end_time
+    - booked: intervalos (start_at, end_at) das sessões agendadas
+    """
+    by_weekday = defaultdict(list)
+    for schedule in schedules:
+        if getattr(schedule, "is_active", True) is not False:
+            by_weekday[schedule.day_of_week].append(schedule)
+
+    blocked = defaultdict(list)  # (data, schedule_id ou None) -> intervalos
+    for exception in exceptions:
+        blocked[(exception.date, exception.schedule_id)].append(
+            _exception_interval(exception.date, exception.start_time, exception.end_time)
+        )
+
+    booked = merge_intervals(booked)
+    result = {}
+    for day in days:
+        slots = set()
+        common = blocked.get((day, None), [])
+        if schedules:
+            windows = []
+            for schedule in by_weekday.get(day.weekday(), ()):
+                start, end = _at(day, schedule.start_time), _at(day, schedule.end_time)
+                if start is None or end is None or end <= start:
+                    continue
+                windows.append((start, end, schedule.slot_duration or LEGACY_SLOT_DURATION,
+                                blocked.get((day, schedule.id), [])))
+        else:
+            windows = [
+                (start, start + timedelta(minutes=LEGACY_SLOT_DURATION), LEGACY_SLOT_DURATION, [])
+                for start in (_at(day, value) for value in LEGACY_SLOTS)
+            ]
+        for start, end, duration, own in windows:
+            busy = merge_intervals([*booked, *common, *own])
+            free = subtract_intervals([(start, end)], busy)
+            slots.update(slots_in((start, end), duration, free))
+        result[day] = [slot.strftime("%H:%M") for slot in sorted(slots)]
+    return result
+
+
+def invalidate_availability(psychologist_id: int, days: Optional[Iterable[date]] = None):
+    """Descarta os slots em cache do psicólogo (de todos os dias, se days for None)"""
+    if psychologist_id is None:
+        return
+    _generations[psychologist_id] += 1
+    if days is None:
+        availability_cache.invalidate_where(lambda key, _: key[0] == psychologist_id)
+    else:
+        for day in set(days):
+            availability_cache.pop((psychologist_id, day))
+
+
+async def load_availability(
+    db: AsyncSession,
+    psychologist_ids: Sequence[int],
+    date_from: date,
+    date_to: date,
+) -> Dict[int, Dict[date, List[str]]]:
+    """Disponibilidade de vários psicólogos num período
+
+    Os dias em cache saem da memória; os demais são calculados com uma
+    consulta por tabela para todos os psicólogos e períodos pendentes.
+    """
+    ids = list(dict.fromkeys(psychologist_ids))
+    days = daterange(date_from, date_to)
+    result: Dict[int, Dict[date, List[str]]] = {}
+    missing: Dict[int, List[date]] = {}
+    for psychologist_id in ids:
+        result[psychologist_id] = {}
+        for day in days:
+            slots = availability_cache.get((psychologist_id, day))
+            if slots is None:
+                missing.setdefault(psychologist_id, []).append(day)
+            else:
+                result[psychologist_id][day] = list(slots)
+    if not missing:
+        return result
+
+    generations = {psychologist_id: _generations[psychologist_id] for psychologist_id in missing}
+    first = min(pending[0] for pending in missing.values())
+    last = max(pending[-1] for pending in missing.values())
+    computed = await _query_availability(db, list(missing), first, last)
+    for psychologist_id, pending in missing.items():
+        fresh = generations[psychologist_id] == _generations[psychologist_id]
+        for day in pending:
+            slots = computed[psychologist_id][day]
+            if fresh:
+                availability_cache.set((psychologist_id, day), tuple(slots))
+            result[psychologist_id][day] = slots
+    # Mantém a ordem dos dias
+    return {
+        psychologist_id: {day: by_day[day] for day in days}
+        for psychologist_id, by_day in result.items()
+    }
+
+
+async def _query_availability(
+    db: AsyncSession,
+    ids: Sequence[int],
+    date_from: date,
+    date_to: date,
+) -> Dict[int, Dict[date, List[str]]]:
+    schedules = defaultdict(list)
+    for row in (await db.execute(
+        select(
+            Schedule.id, Schedule.psychologist_id, Schedule.day_of_week,
+            Schedule.start_time, Schedule.end_time, Schedule.slot_duration, Schedule.is_active
+        ).where(Schedule.psychologist_id.in_(ids))
+    )).all():
+        schedules[row.psychologist_id].append(row)
+
+    exceptions = defaultdict(list)
+    for row in (await db.execute(
+        select(
+            ScheduleException.psychologist_id, ScheduleException.schedule_id, ScheduleException.date,
+            ScheduleException.start_time, ScheduleException.end_time
+        ).where(
+            ScheduleException.psychologist_id.in_(ids),
+            ScheduleException.date >= date_from,
+            ScheduleException.date <= date_to
+        )
+    )).all():
+        exceptions[row.psychologist_id].append(row)
+
+    # Sessões que começam na véspera podem avançar sobre o primeiro dia
+    range_start = datetime.combine(date_from - timedelta(days=1), time.min)
+    range_end = datetime.combine(date_to + timedelta(days=1), time.min)
+    booked = defaultdict(list)
+    for row in (await db.execute(
+        select(Appointment.psychologist_id, Appointment.start_at, Appointment.end_at).where(
+            Appointment.psychologist_id.in_(ids),
+            Appointment.start_at >= range_start,
+            Appointment.start_at < range_end,
+            Appointment.status == AppointmentStatus.AGENDADO
+        )
+    )).all():
+        if row.end_at is not None:
+            booked[row.psychologist_id].append((row.start_at, row.end_at))
+
+    days = daterange(date_from, date_to)
+    return {
+        psychologist_id: compute_availability(
+            days, schedules[psychologist_id], exceptions[psychologist_id], booked[psychologist_id]
+        )
+        for psychologist_id in ids
+    }
+
+
+async def iter_availability(
+    date_from: date,
+    date_to: date,
+    specialty: Optional[str] = None,
+    psychologist_ids: Optional[Sequence[int]] = None,
+    chunk_size: int = AVAILABILITY_CHUNK_SIZE,
+) -> AsyncIterator[Tuple[object, Dict[date, List[str]]]]:
+    """Percorre (psicólogo, disponibilidade) em lotes, para respostas em streaming
+
+    Cada lote usa uma sessão curta: a conexão não fica presa enquanto o
+    cliente consome a resposta.
+    """
+    query = select(User.id, User.name, User.specialty).where(User.type == UserType.PSICOLOGO)
+    if specialty:
+        query = query.where(User.specialty == specialty)
+    if psychologist_ids:
+        query = query.where(User.id.in_(list(psychologist_ids)))
+    async with session_scope() as db:
+        psychologists = (await db.execute(query.order_by(User.id))).all()
+
+    for offset in range(0, len(psychologists), chunk_size):
+        chunk = psychologists[offset:offset + chunk_size]
+        async with session_scope() as db:
+            availability = await load_availability(db, [row.id for row in chunk], date_from, date_to)
+        for row in chunk:
+            yield row, availability[row.id]
+
+
+def _days_of(*values) -> set:
+    days = set()
+    for value in values:
+        if isinstance(value, datetime):
+            days.add(value.date())
+        elif isinstance(value, date):
+            days.add(value)
+    return days
+
+
+def _pending(target) -> set:
+    session = object_session(target)
+    return session.info.setdefault("availability_invalidations", set()) if session else set()
+
+
+def _invalidate(target, psychologist_id, days=None):
+    invalidate_availability(psychologist_id, days)
+    # Repetida no commit: leituras entre o flush e o commit ainda veem o estado antigo
+    _pending(target).add((psychologist_id, frozenset(days) if days is not None else None))
+
+
+@event.listens_for(Appointment, "after_insert")
+@event.listens_for(Appointment, "after_update")
+@event.listens_for(Appointment, "after_delete")
+def _appointment_changed(mapper, connection, target):
+    state = sa_inspect(target)
+    psychologists = {target.psychologist_id, *(state.attrs.psychologist_id.history.deleted or ())}
+    days = _days_of(
+        target.date, target.start_at, target.end_at,
+        *(state.attrs.date.history.deleted or ()),
+        *(state.attrs.start_at.history.deleted or ()),
+        *(state.attrs.end_at.history.deleted or ()),
+    )
+    for psychologist_id in psychologists:
+        _invalidate(target, psychologist_id, days)
+
+
+@event.listens_for(Schedule, "after_insert")
+@event.listens_for(Schedule, "after_update")
+@event.listens_for(Schedule, "after_delete")
+def _schedule_changed(mapper, connection, target):
+    _invalidate(target, target.psychologist_id)
+
+
+@event.listens_for(ScheduleException, "after_insert")
+@event.listens_for(ScheduleException, "after_update")
+@event.listens_for(ScheduleException, "after_delete")
+def _schedule_exception_changed(mapper, connection, target):
+    state = sa_inspect(target)
+    _invalidate(target, target.psychologist_id, _days_of(target.date, *(state.attrs.date.history.deleted or ())))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    for psychologist_id, days in session.info.pop("availability_invalidations", ()):
+        invalidate_availability(psychologist_id, days)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop("availability_invalidations", None)
@@ -0,0 +1,359 @@
+"""
+Gravação de agendamentos sem reserva dupla
+
+Cada reserva ou remarcação trava a agenda do psicólogo na transação
+(lock_psychologist), procura sessões que se sobrepõem ao novo intervalo
+(start_at/end_at, considerando a duração) e só então grava. Como nenhuma
+sessão passa de MAX_APPOINTMENT_MINUTES, a busca é um intervalo limitado no
+índice (psicólogo, início): O(log n) mesmo com agendas cheias.
+
+O índice único parcial ix_appointments_active_slot (psicólogo, início, só
+sessões agendadas) continua como garantia final; a violação vira 409.
+Falhas transitórias (banco travado, conflito de serialização) são
+repetidas um número limitado de vezes.
+"""
+import asyncio
+import logging
+import os
+import random
+from datetime import date, datetime, timedelta
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_, select, text, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.models import (
+    Appointment, AppointmentStatus, Notification, Patient, User, appointment_bounds, log_appointment_changes
+)
+
+logger = logging.getLogger(__name__)
+
+BOOKING_RETRIES = int(os.getenv("BOOKING_RETRIES", "3"))
+BOOKING_RETRY_BACKOFF = float(os.getenv("BOOKING_RETRY_BACKOFF", "0.05"))
+# Duração máxima de uma sessão; limita a busca por sobreposição no índice
+MAX_APPOINTMENT_MINUTES = int(os.getenv("MAX_APPOINTMENT_MINUTES", "240"))
+# Limite de sessões geradas por uma série recorrente
+MAX_SERIES_OCCURRENCES = int(os.getenv("MAX_SERIES_OCCURRENCES", "104"))
+# Limite de agendamentos por chamada de alteração de status em lote
+MAX_BULK_STATUS_ITEMS = int(os.getenv("MAX_BULK_STATUS_ITEMS", "500"))
+
+SLOT_INDEX = "ix_appointments_active_slot"
+# Mensagem do SQLite para o índice único (não informa o nome do índice)
+_SQLITE_SLOT_COLUMNS = "appointments.psychologist_id, appointments.start_at"
+# PostgreSQL: serialization_failure e deadlock_detected
+_TRANSIENT_SQLSTATES = {"40001", "40P01"}
+# Espaço de chaves dos advisory locks de agenda no PostgreSQL
+_LOCK_NAMESPACE = 7301
+
+T = TypeVar("T")
+Interval = Tuple[datetime, datetime]
+
+
+def is_slot_conflict(exc: IntegrityError) -> bool:
+    message = str(exc.orig)
+    return SLOT_INDEX in message or _SQLITE_SLOT_COLUMNS in message
+
+
+def is_transient(exc: OperationalError) -> bool:
+    code = getattr(exc.orig, "sqlstate", None) or getattr(exc.orig, "pgcode", None)
+    message = str(exc.orig).lower()
+    return code in _TRANSIENT_SQLSTATES or "database is locked" in message or "database is busy" in message
+
+
+def slot_conflict() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Horário não disponível")
+
+
+def validate_duration(duration: Optional[int]):
+    if duration is not None and not 0 < duration <= MAX_APPOINTMENT_MINUTES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Duração deve estar entre 1 e {MAX_APPOINTMENT_MINUTES} minutos"
+        )
+
+
+async def lock_psychologist(db: AsyncSession, psychologist_id: int):
+    """Serializa reservas do mesmo psicólogo até o fim da transação
+
+    PostgreSQL: advisory lock por psicólogo. SQLite: o banco tem um único
+    escritor, então uma escrita neutra já reserva o lock de escrita antes
+    da verificação (equivale a BEGIN IMMEDIATE).
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        await db.execute(
+            text("SELECT pg_advisory_xact_lock(:namespace, :id)"),
+            {"namespace": _LOCK_NAMESPACE, "id": psychologist_id}
+        )
+    elif dialect == "sqlite":
+        await db.execute(text("UPDATE users SET id = id WHERE id = :id"), {"id": psychologist_id})
+
+
+def overlap_clause(start: datetime, end: datetime):
+    """Sessões que se sobrepõem a [start, end), como busca por faixa no índice"""
+    return and_(
+        Appointment.start_at < end,
+        Appointment.start_at > start - timedelta(minutes=MAX_APPOINTMENT_MINUTES),
+        Appointment.end_at > start
+    )
+
+
+async def commit_with_retry(db: AsyncSession, apply: Callable[[], Awaitable[T]]) -> T:
+    """Aplica as mudanças e faz commit, repetindo falhas transitórias
+
+    apply é chamado a cada tentativa (depois do rollback da anterior) e
+    devolve o resultado. Conflito com o índice de horários vira 409.
+    """
+    for attempt in range(BOOKING_RETRIES + 1):
+        try:
+            result = await apply()
+            await db.commit()
+            return result
+        except HTTPException:
+            await db.rollback()
+            raise
+        except IntegrityError as e:
+            await db.rollback()
+            if is_slot_conflict(e):
+                raise slot_conflict()
+            raise
+        except OperationalError as e:
+            await db.rollback()
+            if not is_transient(e) or attempt == BOOKING_RETRIES:
+                if is_transient(e):
+                    logger.warning(f"Agendamento desistiu após {attempt + 1} tentativas: {e}")
+                    raise HTTPException(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail="Servidor ocupado, tente novamente em instantes",
+                        headers={"Retry-After": "1"},
+                    )
+                raise
+            await asyncio.sleep(BOOKING_RETRY_BACKOFF * (2 ** attempt) * (0.5 + random.random()))
+
+
+async def book_appointment(db: AsyncSession, values: dict) -> Appointment:
+    """Grava um agendamento; 409 se o intervalo se sobrepuser a outra sessão"""
+    validate_duration(values.get("duration"))
+    start, end = appointment_bounds(values.get("date"), values.get("time"), values.get("duration"))
+
+    async def apply():
+        if start is not None:
+            await lock_psychologist(db, values["psychologist_id"])
+            if await find_conflicts(db, values["psychologist_id"], [(start, end)]):
+                raise slot_conflict()
+        appointment = Appointment(**values, status=AppointmentStatus.AGENDADO)
+        db.add(appointment)
+        await db.flush()
+        return appointment
+
+    appointment = await commit_with_retry(db, apply)
+    await db.refresh(appointment)
+    return appointment
+
+
+async def reschedule_appointment(db: AsyncSession, appointment: Appointment, changes: dict) -> Appointment:
+    """Aplica mudanças (data, horário, duração, status) conferindo sobreposição"""
+    validate_duration(changes.get("duration"))
+    # Valores finais calculados antes: numa nova tentativa o objeto está expirado
+    status_value = changes.get("status", appointment.status)
+    start, end = appointment_bounds(
+        changes.get("date", appointment.date),
+        changes.get("time", appointment.time),
+        changes.get("duration", appointment.duration)
+    )
+    moves = {"date", "time", "duration", "status"} & set(changes)
+    psychologist_id, appointment_id = appointment.psychologist_id, appointment.id
+
+    async def apply():
+        if moves and status_value == AppointmentStatus.AGENDADO and start is not None:
+            await lock_psychologist(db, psychologist_id)
+            if await find_conflicts(db, psychologist_id, [(start, end)], exclude_ids=[appointment_id]):
+                raise slot_conflict()
+        for field, value in changes.items():
+            setattr(appointment, field, value)
+
+    await commit_with_retry(db, apply)
+    await db.refresh(appointment)
+    return appointment
+
+
+def expand_series(
+    start_date: date,
+    interval_weeks: int = 1,
+    occurrences: Optional[int] = None,
+    until: Optional[date] = None,
+    limit: int = MAX_SERIES_OCCURRENCES,
+) -> List[date]:
+    """Datas de uma série semanal; termina na contagem, na data limite ou no limite geral"""
+    count = min(occurrences or limit, limit)
+    step = timedelta(weeks=interval_weeks)
+    dates = []
+    day = start_date
+    while len(dates) < count and (until is None or day <= until):
+        dates.append(day)
+        day += step
+    return dates
+
+
+def conflicts_query(psychologist_id: int, intervals: Sequence[Interval], exclude_ids: Iterable[int] = ()):
+    query = select(Appointment.start_at, Appointment.end_at).where(
+        Appointment.psychologist_id == psychologist_id,
+        Appointment.status == AppointmentStatus.AGENDADO,
+        or_(*(overlap_clause(start, end) for start, end in intervals))
+    )
+    exclude_ids = list(exclude_ids)
+    if exclude_ids:
+        query = query.where(Appointment.id.notin_(exclude_ids))
+    return query
+
+
+async def find_conflicts(
+    db: AsyncSession,
+    psychologist_id: int,
+    intervals: Sequence[Interval],
+    exclude_ids: Iterable[int] = (),
+) -> List[Interval]:
+    """Intervalos pedidos que se sobrepõem a sessões agendadas, numa única consulta"""
+    if not intervals:
+        return []
+    booked = (await db.execute(conflicts_query(psychologist_id, intervals, exclude_ids))).all()
+    return [
+        (start, end) for start, end in intervals
+        if any(row.start_at < end and row.end_at > start for row in booked)
+    ]
+
+
+async def status_change_notifications(
+    db: AsyncSession,
+    rows: Sequence,
+    new_statuses: Dict[int, AppointmentStatus],
+) -> List[Notification]:
+    """Uma notificação por paciente (com conta de usuário) reunindo as mudanças do lote"""
+    by_patient: Dict[int, list] = {}
+    for row in rows:
+        by_patient.setdefault(row.patient_id, []).append(row)
+    # Pacientes se ligam ao usuário pelo e-mail
+    users = dict((await db.execute(
+        select(Patient.id, User.id).join(User, User.email == Patient.email).where(Patient.id.in_(list(by_patient)))
+    )).all())
+
+    notifications = []
+    for patient_id, patient_rows in by_patient.items():
+        if patient_id not in users:
+            continue
+        statuses = {new_statuses[row.id] for row in patient_rows}
+        cancelled = statuses == {AppointmentStatus.CANCELADO}
+        lines = [
+            f"Sessão de {row.date} às {row.time}: {row.status.value} → {new_statuses[row.id].value}"
+            for row in sorted(patient_rows, key=lambda row: (row.date, row.time))
+        ]
+        notifications.append(Notification(
+            user_id=users[patient_id],
+            type="cancelamento" if cancelled else "sistema",
+            title="Consultas canceladas" if cancelled else "Status das consultas atualizado",
+            message="\n".join(lines),
+            action_url="/appointments"
+        ))
+    return notifications
+
+
+async def bulk_update_status(
+    db: AsyncSession,
+    psychologist_id: int,
+    changes: Dict[int, AppointmentStatus],
+) -> Tuple[Dict[int, dict], list]:
+    """Altera o status de vários agendamentos numa transação, um UPDATE por status
+
+    Devolve o resultado por id e as linhas alteradas (id, patient_id, date,
+    time, status antigo e novo), para os e-mails em lote. As notificações no
+    app (uma por paciente) são gravadas na mesma transação do UPDATE. Reativar uma sessão
+    (voltar para agendado) confere sobreposição como numa remarcação, inclusive
+    entre as reativações do próprio lote: das que se sobrepõem, vale a que
+    começa antes e as demais voltam como conflito.
+    """
+    rows = (await db.execute(
+        select(
+            Appointment.id, Appointment.psychologist_id, Appointment.patient_id, Appointment.status,
+            Appointment.date, Appointment.time, Appointment.start_at, Appointment.end_at
+        ).where(Appointment.id.in_(list(changes)))
+    )).all()
+    current = {row.id: row for row in rows}
+
+    results, pending = {}, {}
+    for appointment_id, new_status in changes.items():
+        row = current.get(appointment_id)
+        if row is None:
+            results[appointment_id] = {"result": "not_found"}
+        elif row.psychologist_id != psychologist_id:
+            results[appointment_id] = {"result": "forbidden"}
+        elif row.status == new_status:
+            results[appointment_id] = {"result": "unchanged", "old_status": row.status, "status": row.status}
+        else:
+            pending[appointment_id] = new_status
+    reactivated = [
+        current[appointment_id] for appointment_id, new_status in pending.items()
+        if new_status == AppointmentStatus.AGENDADO and current[appointment_id].start_at is not None
+    ]
+
+    async def apply():
+        blocked = set()
+        if reactivated:
+            await lock_psychologist(db, psychologist_id)
+            conflicts = set(await find_conflicts(
+                db, psychologist_id, [(row.start_at, row.end_at) for row in reactivated],
+                exclude_ids=[row.id for row in reactivated]
+            ))
+            blocked = {row.id for row in reactivated if (row.start_at, row.end_at) in conflicts}
+            # As reativações do lote estão fora da consulta acima: confere umas contra as outras
+            accepted_end = None
+            for row in sorted(reactivated, key=lambda row: (row.start_at, row.id)):
+                if row.id in blocked:
+                    continue
+                if accepted_end is not None and row.start_at < accepted_end:
+                    blocked.add(row.id)
+                else:
+                    accepted_end = row.end_at
+
+        updated = []
+        by_status: Dict[AppointmentStatus, List[int]] = {}
+        for appointment_id, new_status in pending.items():
+            if appointment_id not in blocked:
+                by_status.setdefault(new_status, []).append(appointment_id)
+        for new_status, ids in by_status.items():
+            # UPDATE em lote não dispara os eventos do ORM: o log é gravado aqui
+            returned = (await db.execute(
+                update(Appointment)
+                .where(
+                    Appointment.id.in_(ids),
+                    Appointment.psychologist_id == psychologist_id,
+                    Appointment.status != new_status
+                )
+                .values(status=new_status)
+                .returning(Appointment.id, Appointment.psychologist_id, Appointment.patient_id, Appointment.status)
+                .execution_options(synchronize_session=False)
+            )).all()
+            await db.run_sync(lambda session: log_appointment_changes(session.connection(), returned))
+            updated.extend(row.id for row in returned)
+        if updated:
+            db.add_all(await status_change_notifications(db, [current[i] for i in updated], pending))
+        return blocked, updated
+
+    blocked, updated = await commit_with_retry(db, apply)
+
+    changed = []
+    for appointment_id in updated:
+        row = current[appointment_id]
+        results[appointment_id] = {"result": "updated", "old_status": row.status, "status": pending[appointment_id]}
+        changed.append({
+            "id": row.id, "patient_id": row.patient_id, "date": row.date, "time": row.time,
+            "old_status": row.status, "status": pending[appointment_id],
+        })
+    for appointment_id in pending:
+        if appointment_id in blocked:
+            results[appointment_id] = {"result": "conflict", "old_status": current[appointment_id].status}
+        elif appointment_id not in results:
+            # Alterado por outra requisição entre a leitura e o UPDATE
+            results[appointment_id] = {"result": "unchanged", "status": pending[appointment_id]}
+    return results, changed
@@ -0,0 +1,222 @@
+"""
+Agenda do psicólogo em iCalendar (assinatura por apps de calendário)
+
+Apps de calendário não enviam cabeçalho Authorization: a URL da assinatura
+carrega um token assinado próprio (claim "cal", sem "sub", portanto nunca
+aceito como access token). O token não expira, de propósito: o app só
+conhece a URL e não tem como renová-la. Ele carrega o segredo atual do
+usuário (User.calendar_token_nonce), então regenerar ou desativar a
+assinatura invalida na hora as URLs antigas; logout-all (token_version)
+também as revoga.
+
+A versão do calendário é o contador users.calendar_version, incrementado
+na mesma transação de cada mudança nos agendamentos do psicólogo
+(log_appointment_changes), inclusive quando um agendamento passa para outro
+psicólogo. Só cresce: nem a compactação do log nem a troca de psicólogo
+fazem um ETag antigo voltar a valer. Ela é o ETag forte da resposta; um
+If-None-Match igual custa uma busca pela chave primária e volta 304. O corpo
+gerado fica em cache por psicólogo e é reaproveitado enquanto a versão
+não mudar.
+"""
+import hmac
+import logging
+import os
+import secrets
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional
+
+from jose import jwt
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.cache import TTLCache
+from core.database import session_scope
+from core.pagination import PageParams, encode_cursor, keyset
+from models.models import Appointment, AppointmentStatus, User
+from services.auth_service import decode_access_token, token_versions
+from utils import ALGORITHM, SECRET_KEY
+
+logger = logging.getLogger(__name__)
+
+CALENDAR_CHUNK_SIZE = int(os.getenv("CALENDAR_CHUNK_SIZE", "500"))
+CALENDAR_CACHE_TTL = float(os.getenv("CALENDAR_CACHE_TTL", "3600"))
+CALENDAR_CACHE_SIZE = int(os.getenv("CALENDAR_CACHE_SIZE", "1000"))
+# Calendários maiores que isso são sempre gerados em streaming, sem cache
+CALENDAR_CACHE_MAX_BYTES = int(os.getenv("CALENDAR_CACHE_MAX_BYTES", "1048576"))
+
+# Muda quando o formato gerado ou a origem da versão muda, para não reaproveitar ETags antigos
+CALENDAR_FORMAT = 2
+PRODID = "-//Blurosiere//Agenda//PT"
+
+# psicólogo -> (versão, corpo)
+calendar_cache = TTLCache("calendars", maxsize=CALENDAR_CACHE_SIZE, ttl=CALENDAR_CACHE_TTL)
+
+
+def new_calendar_nonce() -> str:
+    return secrets.token_hex(16)
+
+
+def create_calendar_token(user_id: int, nonce: str, token_version: int = 0) -> str:
+    return jwt.encode(
+        {"cal": user_id, "nonce": nonce, "ver": token_version or 0}, SECRET_KEY, algorithm=ALGORITHM
+    )
+
+
+async def resolve_calendar_token(token: str, db: AsyncSession) -> Optional[int]:
+    """Id do psicólogo dono do token de assinatura, ou None se inválido/revogado"""
+    payload = decode_access_token(token)
+    if payload is None or "cal" not in payload:
+        return None
+    if token_versions.is_stale():
+        await token_versions.refresh(db)
+    try:
+        user_id, version = int(payload["cal"]), int(payload.get("ver", 0))
+    except (TypeError, ValueError):
+        return None
+    if not token_versions.accepts(user_id, version):
+        return None
+    # Segredo atual do usuário: busca pela chave primária
+    current = (await db.execute(select(User.calendar_token_nonce).where(User.id == user_id))).scalar()
+    nonce = payload.get("nonce")
+    if not current or not isinstance(nonce, str) or not hmac.compare_digest(nonce, current):
+        return None
+    return user_id
+
+
+def calendar_version_query(psychologist_id: int):
+    return select(User.calendar_version).where(User.id == psychologist_id)
+
+
+async def calendar_version(db: AsyncSession, psychologist_id: int) -> int:
+    """Versão atual da agenda do psicólogo (busca pela chave primária)"""
+    return (await db.execute(calendar_version_query(psychologist_id))).scalar() or 0
+
+
+def calendar_etag(psychologist_id: int, version: int) -> str:
+    return f'"cal-{CALENDAR_FORMAT}-{psychologist_id}-{version}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or any(value.removeprefix("W/") == etag for value in candidates)
+
+
+def _escape(text: str) -> str:
+    return (
+        text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        .replace("\r\n", "\\n").replace("\n", "\\n")
+    )
+
+
+def _fold(line: str) -> str:
+    """Quebra linhas acima de 75 octetos, como exige a RFC 5545"""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Não corta um caractere UTF-8 ao meio
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode())
+        start, limit = end, 74
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _local(value: datetime) -> str:
+    # Horários das sessões são locais (sem fuso): DATE-TIME "flutuante"
+    return value.strftime("%Y%m%dT%H%M%S")
+
+
+def _utc(value: Optional[datetime]) -> str:
+    value = value or datetime.now(timezone.utc)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime("%Y%m%dT%H%M%SZ")
+
+
+def render_event(appointment: Appointment) -> str:
+    status = "CANCELLED" if appointment.status == AppointmentStatus.CANCELADO else "CONFIRMED"
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:appointment-{appointment.id}@blurosiere",
+        f"DTSTAMP:{_utc(appointment.created_at)}",
+        f"DTSTART:{_local(appointment.start_at)}",
+        f"DTEND:{_local(appointment.end_at)}",
+        f"SUMMARY:{_escape(appointment.description or 'Sessão')}",
+        f"STATUS:{status}",
+        "END:VEVENT",
+    ]
+    return "".join(_fold(line) for line in lines)
+
+
+# O corpo depende só dos agendamentos, para que a versão do log o identifique
+CALENDAR_HEADER = (
+    "BEGIN:VCALENDAR\r\n"
+    "VERSION:2.0\r\n"
+    f"PRODID:{PRODID}\r\n"
+    "CALSCALE:GREGORIAN\r\n"
+    "X-WR-CALNAME:Agenda Blurosiere\r\n"
+)
+CALENDAR_FOOTER = "END:VCALENDAR\r\n"
+
+
+def calendar_chunk_query(psychologist_id: int, cursor: Optional[str], chunk_size: int):
+    base = select(Appointment).where(
+        Appointment.psychologist_id == psychologist_id,
+        Appointment.start_at.isnot(None)
+    )
+    return keyset(base, PageParams(cursor=cursor, limit=chunk_size), Appointment.id, Appointment.start_at)
+
+
+async def iter_appointments(psychologist_id: int, chunk_size: int = CALENDAR_CHUNK_SIZE) -> AsyncIterator[Appointment]:
+    """Sessões do psicólogo em ordem de início, em lotes com sessões curtas"""
+    cursor = None
+    while True:
+        async with session_scope() as db:
+            rows = (await db.execute(calendar_chunk_query(psychologist_id, cursor, chunk_size))).scalars().all()
+        for appointment in rows[:chunk_size]:
+            yield appointment
+        if len(rows) <= chunk_size:
+            return
+        last = rows[chunk_size - 1]
+        cursor = encode_cursor(last.start_at, last.id)
+
+
+async def stream_calendar(psychologist_id: int, version: int) -> AsyncIterator[bytes]:
+    """Gera o calendário em pedaços; o corpo vai para o cache se couber no limite"""
+    chunks, size = [], 0
+
+    def keep(chunk: bytes) -> bytes:
+        nonlocal chunks, size
+        if chunks is not None:
+            size += len(chunk)
+            if size <= CALENDAR_CACHE_MAX_BYTES:
+                chunks.append(chunk)
+            else:
+                chunks = None
+        return chunk
+
+    yield keep(CALENDAR_HEADER.encode())
+    batch = []
+    async for appointment in iter_appointments(psychologist_id):
+        batch.append(render_event(appointment))
+        if len(batch) >= CALENDAR_CHUNK_SIZE:
+            yield keep("".join(batch).encode())
+            batch = []
+    if batch:
+        yield keep("".join(batch).encode())
+    footer = keep(CALENDAR_FOOTER.encode())
+    if chunks is not None:
+        calendar_cache.set(psychologist_id, (version, b"".join(chunks)))
+    yield footer
+
+
+def cached_calendar(psychologist_id: int, version: int) -> Optional[bytes]:
+    entry = calendar_cache.get(psychologist_id)
+    if entry is None or entry[0] != version:
+        return None
+    return entry[1]
@@ -0,0 +1,167 @@
+"""
+Feed de mudanças dos agendamentos para sincronização incremental
+
+Cada inserção ou atualização de Appointment grava uma linha em
+appointment_changes na mesma transação (eventos em models.models; UPDATEs
+em lote chamam log_appointment_changes). O cliente guarda o cursor da
+última página e pede só o que mudou depois dele.
+
+A compactação, em lotes curtos, faz duas coisas:
+- remove entradas superadas por outra mais nova do mesmo agendamento, o que
+  não invalida nenhum cursor (o estado final continua no log);
+- remove entradas mais antigas que CHANGE_LOG_RETENTION_DAYS e avança a
+  marca d'água (change_log_state). Um cursor abaixo da marca pode ter
+  perdido mudanças: o feed responde 410 com um cursor novo em X-Next-Cursor,
+  e o cliente recarrega a lista completa antes de continuar por ele.
+"""
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from itertools import takewhile
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.pagination import NEXT_CURSOR_HEADER, encode_cursor
+from models.models import Appointment, AppointmentChange, ChangeLogState, Patient, UserType
+
+logger = logging.getLogger(__name__)
+
+CHANGE_FEED_LIMIT = int(os.getenv("CHANGE_FEED_LIMIT", "200"))
+CHANGE_LOG_COMPACT_INTERVAL = int(os.getenv("CHANGE_LOG_COMPACT_INTERVAL", "3600"))
+CHANGE_LOG_RETENTION_DAYS = float(os.getenv("CHANGE_LOG_RETENTION_DAYS", "30"))
+CHANGE_LOG_COMPACT_BATCH = int(os.getenv("CHANGE_LOG_COMPACT_BATCH", "1000"))
+
+STATE_ID = 1
+
+
+async def change_log_watermark(db: AsyncSession) -> int:
+    state = await db.get(ChangeLogState, STATE_ID)
+    return state.watermark if state else 0
+
+
+async def check_cursor(db: AsyncSession, since_id: int):
+    """410 para cursores anteriores à marca d'água, com o cursor para recomeçar"""
+    watermark = await change_log_watermark(db)
+    if since_id >= watermark:
+        return
+    newest = (await db.execute(select(func.max(AppointmentChange.id)))).scalar() or 0
+    raise HTTPException(
+        status_code=status.HTTP_410_GONE,
+        detail="Cursor expirado: recarregue a lista de agendamentos e continue pelo cursor em X-Next-Cursor",
+        headers={NEXT_CURSOR_HEADER: encode_cursor(None, max(newest, watermark))},
+    )
+
+
+def changes_query(principal, since_id: int, limit: int):
+    """Mudanças visíveis ao usuário depois de since_id, com uma linha extra para has_more"""
+    query = select(AppointmentChange).where(AppointmentChange.id > since_id)
+    if principal.type == UserType.PSICOLOGO:
+        query = query.where(AppointmentChange.psychologist_id == principal.id)
+    else:
+        patient_ids = select(Patient.id).where(Patient.email == principal.email)
+        query = query.where(AppointmentChange.patient_id.in_(patient_ids))
+    return query.order_by(AppointmentChange.id).limit(limit + 1)
+
+
+async def fetch_changes(db: AsyncSession, principal, since_id: int, limit: int = CHANGE_FEED_LIMIT
+                        ) -> Tuple[List[Tuple[AppointmentChange, Optional[Appointment]]], int, bool]:
+    """Mudanças visíveis ao usuário depois de since_id
+
+    Devolve ([(mudança, agendamento atual)], último id, há mais páginas).
+    Várias mudanças do mesmo agendamento na página viram uma só, a mais nova.
+    """
+    await check_cursor(db, since_id)
+    changes = (await db.execute(changes_query(principal, since_id, limit))).scalars().all()
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    if not changes:
+        return [], since_id, False
+
+    latest = {}
+    for change in changes:
+        latest[change.appointment_id] = change
+    appointments = {
+        appointment.id: appointment
+        for appointment in (await db.execute(
+            select(Appointment).where(Appointment.id.in_(list(latest)))
+        )).scalars().all()
+    }
+    items = [
+        (change, appointments.get(change.appointment_id))
+        for change in sorted(latest.values(), key=lambda change: change.id)
+    ]
+    return items, changes[-1].id, has_more
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+async def expire_old_changes(db: AsyncSession, cutoff: datetime, batch_size: int = CHANGE_LOG_COMPACT_BATCH) -> int:
+    """Remove, do início do log, as entradas anteriores a cutoff e avança a marca d'água"""
+    removed = 0
+    while True:
+        rows = (await db.execute(
+            select(AppointmentChange.id, AppointmentChange.changed_at).order_by(AppointmentChange.id).limit(batch_size)
+        )).all()
+        # O log cresce em ordem de tempo: para na primeira entrada recente
+        expired = [row.id for row in takewhile(
+            lambda row: row.changed_at is not None and _as_utc(row.changed_at) < cutoff, rows
+        )]
+        if not expired:
+            return removed
+        await db.execute(delete(AppointmentChange).where(AppointmentChange.id.in_(expired)))
+        # A marca sobe na mesma transação da remoção
+        state = await db.get(ChangeLogState, STATE_ID)
+        if state is None:
+            db.add(ChangeLogState(id=STATE_ID, watermark=expired[-1]))
+        else:
+            state.watermark = max(state.watermark, expired[-1])
+        await db.commit()
+        removed += len(expired)
+        if len(expired) < batch_size:
+            return removed
+
+
+async def remove_superseded_changes(db: AsyncSession, batch_size: int = CHANGE_LOG_COMPACT_BATCH) -> int:
+    """Remove entradas superadas por uma mais nova do mesmo agendamento, lote a lote pelo id"""
+    removed, last_id = 0, 0
+    while True:
+        rows = (await db.execute(
+            select(AppointmentChange.id, AppointmentChange.appointment_id)
+            .where(AppointmentChange.id > last_id)
+            .order_by(AppointmentChange.id)
+            .limit(batch_size)
+        )).all()
+        if not rows:
+            return removed
+        last_id = rows[-1].id
+        newest = dict((await db.execute(
+            select(AppointmentChange.appointment_id, func.max(AppointmentChange.id))
+            .where(AppointmentChange.appointment_id.in_({row.appointment_id for row in rows}))
+            .group_by(AppointmentChange.appointment_id)
+        )).all())
+        superseded = [row.id for row in rows if row.id < newest[row.appointment_id]]
+        if superseded:
+            await db.execute(delete(AppointmentChange).where(AppointmentChange.id.in_(superseded)))
+            await db.commit()
+            removed += len(superseded)
+        if len(rows) < batch_size:
+            return removed
+
+
+async def compact_change_log(
+    db: AsyncSession,
+    retention_days: float = CHANGE_LOG_RETENTION_DAYS,
+    batch_size: int = CHANGE_LOG_COMPACT_BATCH,
+) -> int:
+    """Aplica a retenção e remove entradas superadas; devolve o total removido"""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    removed = await expire_old_changes(db, cutoff, batch_size)
+    removed += await remove_superseded_changes(db, batch_size)
+    return removed
@@ -1,3 +1,4 @@
+import logging
 import os
 from dotenv import load_dotenv
 import sib_api_v3_sdk
@@ -6,6 +7,8 @@ from sib_api_v3_sdk.rest import ApiException
 # CONFIGURAÇÃO DA API
 # =============================
 load_dotenv()
+
+logger = logging.getLogger(__name__)
  
 def get_email_client():
     """Retorna o cliente configurado para envio de e-mail."""
@@ -36,10 +39,10 @@ def send_email(to_email: str, subject: str, html_content: str,
     )
     try:
         api_instance.send_transac_email(email_data)
-        print(f"E-mail enviado para {to_email}")
+        logger.info(f"E-mail enviado para {to_email}")
         return True
     except ApiException as e:
-        print(f"Erro ao enviar e-mail para {to_email}: {e}")
+        logger.error(f"Erro ao enviar e-mail para {to_email}: {e}")
         return False
  
 # =============================
@@ -65,6 +68,30 @@ def send_email_appointment(client_email: str, client_name: str, date: str, time:
     )
  
  
+# =============================
+# EMAIL: RESUMO DE SÉRIE DE AGENDAMENTOS
+# =============================
+
+def send_email_appointment_series(client_email: str, client_name: str, dates: list, time: str):
+    """Um único e-mail com todas as sessões de uma série recorrente."""
+    email = os.getenv("EMAIL_DOMAIN")
+    items = "".join(f"<li>{day}</li>" for day in dates)
+    html = f"""
+        <h3>Olá {client_name},</h3>
+        <p>Suas consultas foram agendadas com sucesso, sempre às <strong>{time}</strong>:</p>
+        <ul>{items}</ul>
+        <p>Obrigado por utilizar nossa plataforma.</p>
+    """
+
+    return send_email(
+        to_email=client_email,
+        subject="Confirmação de Agendamentos",
+        html_content=html,
+        sender_email=email,
+        sender_name="Sistema de Agendamentos"
+    )
+
+
 # =============================
 # EMAIL: SOLICITAÇÃO ACEITA
 # =============================
@@ -192,4 +219,22 @@ def send_email_appointment_status_cancel(
         html_content=html,
         sender_email=email,
         sender_name="Sistema de Agendamentos"
-    )
\ No newline at end of file
+    )
+
+
+# =============================
+# EMAIL: STATUS ALTERADO EM LOTE
+# =============================
+def send_email_appointment_status_batch(messages: list):
+    """Envia os avisos de uma alteração em lote; uma falha não interrompe as demais."""
+    sent = 0
+    for message in messages:
+        try:
+            if message["new_status"] == "cancelado":
+                send_email_appointment_status_cancel(message["patient_email"], message["patient_name"])
+            else:
+                send_email_appointment_status_update(**message)
+            sent += 1
+        except Exception as e:
+            logger.error(f"Erro ao enviar e-mail para {message['patient_email']}: {e}")
+    return sent
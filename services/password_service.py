@@ -0,0 +1,86 @@
+"""
+Hash e verificação de senhas fora do event loop
+
+O bcrypt consome dezenas de milissegundos de CPU por chamada. As chamadas
+rodam num pool de threads dedicado (a biblioteca bcrypt libera o GIL
+durante o cálculo), com limite de fila: quando há mais logins pendentes do
+que o pool consegue absorver, a requisição recebe 503 imediatamente em vez
+de acumular latência para todo o worker.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from utils import pwd_context, truncate_password
+
+# 0 (padrão) usa o número de CPUs
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "0")) or (os.cpu_count() or 2)
+# Chamadas aguardando além das que estão em execução; 0 (padrão) = 4 por worker
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "0")) or PASSWORD_HASH_WORKERS * 4
+
+
+class PasswordHasher:
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_QUEUE):
+        self.workers = workers
+        self.max_pending = workers + max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.stats = {"verified": 0, "hashed": 0, "rehashed": 0, "rejected": 0}
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.stats["rejected"] += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Servidor ocupado, tente novamente em instantes",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verifica a senha; se o hash usa um custo antigo, devolve também o novo hash"""
+        valid, new_hash = await self._run(
+            pwd_context.verify_and_update, truncate_password(plain_password), hashed_password
+        )
+        self.stats["verified"] += 1
+        if new_hash:
+            self.stats["rehashed"] += 1
+        return valid, new_hash
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._run(pwd_context.hash, truncate_password(password))
+        self.stats["hashed"] += 1
+        return hashed
+
+    def snapshot(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            **self.stats,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,118 @@
+"""
+Ciclo de vida dos refresh tokens
+
+Cada login abre uma sessão (uma linha); /refresh rotaciona a mesma linha
+em vez de inserir outra, cada usuário tem um limite de sessões ativas e
+uma tarefa periódica remove as linhas expiradas ou revogadas. A validação
+é sempre uma busca pelo índice único de token_hash.
+
+A rotação é um UPDATE condicional no hash atual: entre refreshes
+simultâneos com o mesmo token, só um vence. O hash substituído fica em
+previous_token_hash; apresentá-lo de novo (token vazado ou corrida) revoga
+a sessão inteira.
+"""
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.models import RefreshToken
+
+logger = logging.getLogger(__name__)
+
+REFRESH_TOKEN_DAYS = int(os.getenv("REFRESH_TOKEN_DAYS", "7"))
+REFRESH_TOKENS_PER_USER = int(os.getenv("REFRESH_TOKENS_PER_USER", "10"))
+REFRESH_TOKEN_PURGE_INTERVAL = int(os.getenv("REFRESH_TOKEN_PURGE_INTERVAL", "3600"))
+
+
+def _utcnow() -> datetime:
+    # Comparações no banco usam UTC sem fuso, como os valores gravados no SQLite
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+async def issue_refresh_token(db: AsyncSession, user_id: int) -> RefreshToken:
+    """Abre uma sessão de refresh e encerra as mais antigas além do limite por usuário"""
+    refresh_token = RefreshToken.create_token(user_id, REFRESH_TOKEN_DAYS)
+    db.add(refresh_token)
+    await db.flush()
+
+    stale_ids = (await db.execute(
+        select(RefreshToken.id).where(RefreshToken.user_id == user_id)
+        .order_by(RefreshToken.created_at.desc(), RefreshToken.id.desc())
+        .offset(REFRESH_TOKENS_PER_USER)
+    )).scalars().all()
+    if stale_ids:
+        await db.execute(delete(RefreshToken).where(RefreshToken.id.in_(stale_ids)))
+    return refresh_token
+
+
+async def find_refresh_token(db: AsyncSession, token: str) -> Optional[RefreshToken]:
+    return (await db.execute(
+        select(RefreshToken).where(RefreshToken.token_hash == RefreshToken.hash_token(token))
+    )).scalars().first()
+
+
+async def rotate_refresh_token(db: AsyncSession, token: str) -> Optional[RefreshToken]:
+    """Valida o token e troca o valor da sessão no lugar; None se inválido
+
+    Um token já substituído revoga a sessão; o chamador deve fazer commit
+    também quando o resultado é None.
+    """
+    old_hash = RefreshToken.hash_token(token)
+    new_token = RefreshToken.generate_token()
+    now = _utcnow()
+    refresh_token = (await db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.token_hash == old_hash,
+            RefreshToken.is_revoked == False,
+            RefreshToken.expires_at > now
+        )
+        .values(
+            token_hash=RefreshToken.hash_token(new_token),
+            previous_token_hash=old_hash,
+            expires_at=now + timedelta(days=REFRESH_TOKEN_DAYS),
+            rotated_at=now
+        )
+        .returning(RefreshToken)
+        .execution_options(populate_existing=True, synchronize_session=False)
+    )).scalars().first()
+    if refresh_token is not None:
+        refresh_token.plain_token = new_token
+        return refresh_token
+
+    revoked = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.previous_token_hash == old_hash, RefreshToken.is_revoked == False)
+        .values(is_revoked=True)
+        .execution_options(synchronize_session=False)
+    )
+    if revoked.rowcount:
+        logger.warning("Refresh token substituído reapresentado; sessão revogada")
+    return None
+
+
+async def revoke_refresh_token(db: AsyncSession, token: str) -> bool:
+    result = await db.execute(
+        delete(RefreshToken).where(RefreshToken.token_hash == RefreshToken.hash_token(token))
+    )
+    return result.rowcount > 0
+
+
+async def revoke_user_refresh_tokens(db: AsyncSession, user_id: int) -> int:
+    result = await db.execute(delete(RefreshToken).where(RefreshToken.user_id == user_id))
+    return result.rowcount
+
+
+async def purge_refresh_tokens(db: AsyncSession) -> int:
+    """Remove sessões expiradas ou revogadas"""
+    result = await db.execute(
+        delete(RefreshToken).where(
+            or_(RefreshToken.expires_at < _utcnow(), RefreshToken.is_revoked == True)
+        )
+    )
+    await db.commit()
+    return result.rowcount
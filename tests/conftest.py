@@ -0,0 +1,27 @@
+import os
+import shutil
+import tempfile
+import pytest
+
+# Os testes usam uma cópia do banco de exemplo num diretório temporário: o
+# blurosiere.db versionado nunca é migrado nem alterado. Precisa acontecer
+# antes de qualquer import de core.database/main, que leem DATABASE_URL.
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_TMP_DIR = tempfile.mkdtemp(prefix="blurosiere-tests-")
+_TEST_DB = os.path.join(_TMP_DIR, "blurosiere.db")
+shutil.copyfile(os.path.join(_ROOT, "blurosiere.db"), _TEST_DB)
+os.environ["DATABASE_URL"] = f"sqlite:///{_TEST_DB}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("READ_REPLICA_URLS", None)
+
+from core.database import engine
+from core.migrations import ensure_schema
+
+
+@pytest.fixture(scope="session", autouse=True)
+def migrated_database():
+    """O TestClient sem contexto não executa o lifespan; aplica as migrações pendentes aqui"""
+    ensure_schema(engine)
+    yield
+    engine.dispose()
+    shutil.rmtree(_TMP_DIR, ignore_errors=True)
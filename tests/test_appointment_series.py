@@ -0,0 +1,73 @@
+import pytest
+from fastapi.testclient import TestClient
+from services.booking_service import MAX_SERIES_OCCURRENCES, expand_series
+from datetime import date
+from main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def auth_headers():
+    response = client.post("/api/v1/auth/login", json={
+        "email": "ana@test.com",
+        "password": "123456"
+    })
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_expand_series_stops_at_count_or_until():
+    assert expand_series(date(2031, 1, 6), 1, occurrences=3) == [
+        date(2031, 1, 6), date(2031, 1, 13), date(2031, 1, 20)
+    ]
+    assert expand_series(date(2031, 1, 6), 2, until=date(2031, 2, 3)) == [
+        date(2031, 1, 6), date(2031, 1, 20), date(2031, 2, 3)
+    ]
+    assert len(expand_series(date(2031, 1, 6), 1, occurrences=500, limit=10)) == 10
+
+
+def test_series_lifecycle(auth_headers):
+    body = {"patient_id": 1, "start_date": "2031-01-06", "time": "10:00", "occurrences": 4, "description": "Terapia"}
+    response = client.post("/api/v1/appointments/series/", json=body, headers=auth_headers)
+    assert response.status_code == 200
+    series = response.json()
+    assert [a["date"] for a in series["appointments"]] == ["2031-01-06", "2031-01-13", "2031-01-20", "2031-01-27"]
+    assert {a["series_id"] for a in series["appointments"]} == {series["id"]}
+
+    # Sobreposição com a série existente (10:30 cai dentro da sessão das 10:00)
+    overlapping = {**body, "time": "10:30"}
+    response = client.post("/api/v1/appointments/series/", json=overlapping, headers=auth_headers)
+    assert response.status_code == 409
+    assert response.json()["detail"]["conflicts"] == ["2031-01-06", "2031-01-13", "2031-01-20", "2031-01-27"]
+
+    longer = {**overlapping, "occurrences": 5, "skip_conflicts": True}
+    response = client.post("/api/v1/appointments/series/", json=longer, headers=auth_headers)
+    assert response.status_code == 200
+    assert [a["date"] for a in response.json()["appointments"]] == ["2031-02-03"]
+    assert len(response.json()["skipped_dates"]) == 4
+    client.delete(f"/api/v1/appointments/series/{response.json()['id']}?from_date=2031-01-01", headers=auth_headers)
+
+    # Só as sessões a partir de from_date mudam
+    response = client.put(
+        f"/api/v1/appointments/series/{series['id']}?from_date=2031-01-13",
+        json={"time": "14:00"}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert [a["time"] for a in response.json()["appointments"]] == ["10:00", "14:00", "14:00", "14:00"]
+
+    response = client.delete(f"/api/v1/appointments/series/{series['id']}?from_date=2031-01-20", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["cancelled"] == 2
+
+    response = client.get(f"/api/v1/appointments/series/{series['id']}", headers=auth_headers)
+    assert [a["status"] for a in response.json()["appointments"]] == ["agendado", "agendado", "cancelado", "cancelado"]
+    assert response.json()["until"] == "2031-01-19"
+
+    client.delete(f"/api/v1/appointments/series/{series['id']}?from_date=2031-01-01", headers=auth_headers)
+
+
+def test_series_beyond_cap_is_rejected(auth_headers):
+    body = {"patient_id": 1, "start_date": "2031-01-06", "time": "10:00", "until": "2035-01-01", "description": "Longa"}
+    response = client.post("/api/v1/appointments/series/", json=body, headers=auth_headers)
+    assert response.status_code == 400
+    assert str(MAX_SERIES_OCCURRENCES) in response.json()["detail"]
@@ -0,0 +1,120 @@
+import time
+from datetime import timedelta
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, select
+from core.cache import TTLCache
+from core.database import SessionLocal, async_engine
+from models.models import User
+from services.auth_service import (
+    Principal, decode_access_token, principal_cache, token_cache, token_versions
+)
+from utils import create_access_token
+from main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def auth_headers():
+    response = client.post("/api/v1/auth/login", json={
+        "email": "ana@test.com",
+        "password": "123456"
+    })
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def user_queries():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "FROM users" in statement:
+            statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+
+def test_ttl_cache_evicts_and_expires():
+    cache = TTLCache("teste", maxsize=2, ttl=0.05, register=False)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    stats = cache.snapshot()
+    assert stats["evictions"] == 1 and stats["expirations"] >= 1
+
+
+def test_claims_token_skips_user_lookup(auth_headers, user_queries):
+    token_versions.clear()
+    client.get("/api/v1/notifications/", headers=auth_headers)  # carrega a tabela de versões
+    user_queries.clear()
+
+    assert client.get("/api/v1/notifications/", headers=auth_headers).status_code == 200
+    assert client.get("/api/v1/notifications/", headers=auth_headers).status_code == 200
+
+    assert user_queries == []
+
+
+def test_legacy_token_uses_principal_cache(user_queries):
+    principal_cache.clear()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'ana@test.com'})}"}
+    assert client.get("/api/v1/notifications/", headers=headers).status_code == 200
+    assert client.get("/api/v1/notifications/", headers=headers).status_code == 200
+
+    assert len(user_queries) == 1
+    principal = principal_cache.get("ana@test.com")
+    assert isinstance(principal, Principal) and principal.email == "ana@test.com"
+
+
+def test_logout_all_revokes_issued_tokens(auth_headers):
+    response = client.post("/api/v1/auth/logout-all", headers=auth_headers)
+    assert response.status_code == 200
+
+    assert client.get("/api/v1/notifications/", headers=auth_headers).status_code == 401
+    login = client.post("/api/v1/auth/login", json={"email": "ana@test.com", "password": "123456"})
+    fresh = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    assert client.get("/api/v1/notifications/", headers=fresh).status_code == 200
+
+
+def test_principal_invalidated_when_user_changes():
+    legacy = {"Authorization": f"Bearer {create_access_token({'sub': 'ana@test.com'})}"}
+    client.get("/api/v1/notifications/", headers=legacy)
+    assert principal_cache.get("ana@test.com") is not None
+
+    with SessionLocal() as db:
+        user = db.scalars(select(User).where(User.email == "ana@test.com")).one()
+        original = user.name
+        user.name = original + " (editado)"
+        db.commit()
+        assert principal_cache.get("ana@test.com") is None
+        user.name = original
+        db.commit()
+
+
+def test_verified_tokens_are_cached(monkeypatch):
+    import services.auth_service as auth_service
+    token = create_access_token({"sub": "ana@test.com", "name": "cache"})
+    calls = []
+    decode = auth_service.jwt.decode
+    monkeypatch.setattr(auth_service.jwt, "decode", lambda *a, **kw: calls.append(1) or decode(*a, **kw))
+
+    first = decode_access_token(token)
+    assert decode_access_token(token) == first
+    assert decode_access_token(token + "x") is None
+    assert decode_access_token(token + "x") is None
+    assert len(calls) == 3
+    assert token_cache.snapshot()["hits"] >= 1
+
+
+def test_token_cache_honours_exp():
+    token = create_access_token({"sub": "ana@test.com"}, expires_delta=timedelta(seconds=1))
+    assert decode_access_token(token) is not None
+    # exp tem resolução de segundos
+    time.sleep(2.1)
+    assert decode_access_token(token) is None
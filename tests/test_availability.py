@@ -0,0 +1,187 @@
+import asyncio
+from collections import namedtuple
+from datetime import date, datetime
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from core.database import AsyncSessionLocal, SessionLocal, async_engine
+from models.models import Appointment, AppointmentStatus, Schedule, ScheduleException
+from services.availability_service import (
+    availability_cache, compute_availability, load_availability, merge_intervals, subtract_intervals
+)
+from main import app
+
+client = TestClient(app)
+
+ScheduleRow = namedtuple("ScheduleRow", "id day_of_week start_time end_time slot_duration")
+ExceptionRow = namedtuple("ExceptionRow", "schedule_id date start_time end_time")
+
+MONDAY = date(2030, 1, 7)
+
+
+def at(hour, minute=0, day=MONDAY):
+    return datetime(day.year, day.month, day.day, hour, minute)
+
+
+def test_subtract_intervals():
+    windows = [(at(9), at(12)), (at(14), at(18))]
+    busy = merge_intervals([(at(10), at(11)), (at(10, 30), at(11, 30)), (at(17), at(19))])
+    assert subtract_intervals(windows, busy) == [
+        (at(9), at(10)), (at(11, 30), at(12)), (at(14), at(17))
+    ]
+
+
+def test_slots_follow_schedule_bookings_and_exceptions():
+    schedules = [
+        ScheduleRow(1, 0, "08:00", "12:00", 60),
+        ScheduleRow(2, 0, "14:00", "16:00", 30),
+    ]
+    exceptions = [
+        ExceptionRow(2, MONDAY, "15:00", "16:00"),
+        ExceptionRow(None, date(2030, 1, 14), None, None),
+    ]
+    # Sessão de 50 min às 09:30 ocupa os slots das 09:00 e das 10:00
+    booked = [(at(9, 30), at(10, 20))]
+
+    result = compute_availability(
+        [MONDAY, date(2030, 1, 8), date(2030, 1, 14)], schedules, exceptions, booked
+    )
+
+    assert result[MONDAY] == ["08:00", "11:00", "14:00", "14:30"]
+    assert result[date(2030, 1, 8)] == []
+    assert result[date(2030, 1, 14)] == []
+
+
+def test_without_schedule_falls_back_to_fixed_slots():
+    booked = [(at(10, 30), at(11, 20))]
+    result = compute_availability([MONDAY], [], [], booked)
+    assert result[MONDAY] == ["09:00", "14:00", "15:00", "16:00", "17:00"]
+
+
+def test_inactive_schedules_do_not_fall_back_to_fixed_slots():
+    InactiveRow = namedtuple("InactiveRow", "id day_of_week start_time end_time slot_duration is_active")
+    schedules = [InactiveRow(1, 0, "08:00", "12:00", 60, False)]
+    assert compute_availability([MONDAY], schedules, [], [])[MONDAY] == []
+
+
+def test_deactivated_agenda_has_no_free_slots():
+    token = client.post("/api/v1/auth/login", json={"email": "ana@test.com", "password": "123456"}).json()
+    headers = {"Authorization": f"Bearer {token['access_token']}"}
+    with SessionLocal() as db:
+        schedules = db.query(Schedule).filter(Schedule.psychologist_id == 2).all()
+        previous = {schedule.id: schedule.is_active for schedule in schedules}
+    created = client.post("/api/v1/schedule/", json={
+        "day_of_week": 0, "start_time": "08:00", "end_time": "10:00", "slot_duration": 60
+    }, headers=headers).json()
+    try:
+        for schedule_id in [*previous, created["id"]]:
+            client.put(f"/api/v1/schedule/{schedule_id}", json={"is_active": False}, headers=headers)
+        response = client.get("/api/v1/appointments/available-slots", params={
+            "date": "2030-03-04", "psychologist_id": 2
+        })
+        assert response.json() == []
+    finally:
+        client.delete(f"/api/v1/schedule/{created['id']}", headers=headers)
+        for schedule_id, active in previous.items():
+            client.put(f"/api/v1/schedule/{schedule_id}", json={"is_active": active}, headers=headers)
+
+
+def test_range_uses_one_query_per_table():
+    availability_cache.clear()
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    async def load():
+        async with AsyncSessionLocal() as db:
+            return await load_availability(db, [1, 2], date(2030, 1, 1), date(2030, 1, 31))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        availability = asyncio.run(load())
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+    assert len(statements) == 3
+    assert len(availability[1]) == 31
+
+
+def test_available_slots_endpoint():
+    response = client.get("/api/v1/appointments/available-slots", params={
+        "date": "2030-01-07", "psychologist_id": 1
+    })
+    assert response.status_code == 200
+    assert "09:00" in response.json()
+
+    response = client.get("/api/v1/appointments/available-slots/range", params={
+        "psychologist_id": 1, "date_from": "2030-01-07", "date_to": "2030-01-09"
+    })
+    assert response.status_code == 200
+    assert list(response.json()) == ["2030-01-07", "2030-01-08", "2030-01-09"]
+
+    response = client.get("/api/v1/appointments/available-slots", params={
+        "date": "07/01/2030", "psychologist_id": 1
+    })
+    assert response.status_code == 400
+
+
+def test_bulk_availability_streams_all_psychologists():
+    response = client.get("/api/v1/appointments/availability", params={
+        "date_from": "2030-01-07", "date_to": "2030-01-13"
+    })
+    assert response.status_code == 200
+    items = response.json()
+    assert [item["psychologist_id"] for item in items] == [1, 2]
+    assert len(items[0]["availability"]) == 7
+
+    response = client.get("/api/v1/appointments/availability", params={
+        "date_from": "2030-01-07", "date_to": "2030-01-07", "psychologist_id": [2]
+    })
+    assert [item["psychologist_id"] for item in response.json()] == [2]
+
+    response = client.get("/api/v1/appointments/availability", params={
+        "date_from": "2030-01-07", "date_to": "2031-01-07"
+    })
+    assert response.status_code == 400
+
+
+def slots_for(psychologist_id, day):
+    return client.get("/api/v1/appointments/available-slots", params={
+        "date": day.isoformat(), "psychologist_id": psychologist_id
+    }).json()
+
+
+def test_cached_slots_invalidated_by_changes():
+    availability_cache.clear()
+    day = date(2030, 2, 4)  # segunda-feira
+    assert "10:00" in slots_for(2, day)
+    hits = availability_cache.snapshot()["hits"]
+    assert "10:00" in slots_for(2, day)
+    assert availability_cache.snapshot()["hits"] == hits + 1
+
+    with SessionLocal() as db:
+        appointment = Appointment(psychologist_id=2, date=day, time="10:00", duration=50,
+                                  status=AppointmentStatus.AGENDADO)
+        db.add(appointment)
+        db.commit()
+        assert "10:00" not in slots_for(2, day)
+
+        appointment.status = AppointmentStatus.CANCELADO
+        db.commit()
+        assert "10:00" in slots_for(2, day)
+
+        schedule = Schedule(psychologist_id=2, day_of_week=0, start_time="13:00",
+                            end_time="15:00", slot_duration=60, is_active=True)
+        db.add(schedule)
+        db.commit()
+        assert slots_for(2, day) == ["13:00", "14:00"]
+
+        db.add(ScheduleException(psychologist_id=2, schedule_id=schedule.id, date=day,
+                                 start_time="14:00", end_time="15:00"))
+        db.commit()
+        assert slots_for(2, day) == ["13:00"]
+
+        db.delete(schedule)
+        db.delete(appointment)
+        db.commit()
+    assert "10:00" in slots_for(2, day)
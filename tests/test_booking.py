@@ -0,0 +1,125 @@
+import asyncio
+import time
+from datetime import date
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from core.database import Base, build_async_engine, make_async_sessionmaker
+from models.models import Appointment, AppointmentStatus
+from services.booking_service import book_appointment, reschedule_appointment
+
+
+@pytest.fixture
+def sessions(tmp_path):
+    engine = build_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'booking.db'}")
+
+    async def create():
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create())
+    yield make_async_sessionmaker(engine)
+    asyncio.run(engine.dispose())
+
+
+def test_concurrent_bookings_never_double_book(sessions):
+    slots = [f"{hour:02d}:00" for hour in range(8, 18)]
+    attempts = 300
+
+    async def attempt(i):
+        async with sessions() as db:
+            try:
+                await book_appointment(db, {
+                    "patient_id": i, "psychologist_id": 1, "date": date(2030, 1, 7),
+                    "time": slots[i % len(slots)], "duration": 50
+                })
+                return 201
+            except HTTPException as e:
+                return e.status_code
+
+    async def scenario():
+        start = time.perf_counter()
+        results = await asyncio.gather(*(attempt(i) for i in range(attempts)))
+        elapsed = time.perf_counter() - start
+        async with sessions() as db:
+            per_slot = (await db.execute(
+                select(Appointment.time, func.count()).where(Appointment.status == AppointmentStatus.AGENDADO)
+                .group_by(Appointment.time)
+            )).all()
+        return results, elapsed, per_slot
+
+    results, elapsed, per_slot = asyncio.run(scenario())
+    print(f"\n{attempts} reservas simultâneas em {elapsed:.2f}s ({attempts / elapsed:.0f}/s)")
+
+    assert results.count(201) == len(slots)
+    assert results.count(409) == attempts - len(slots)
+    assert sorted(per_slot) == [(slot, 1) for slot in slots]
+
+
+def test_cancelled_slot_can_be_booked_again(sessions):
+    values = {"patient_id": 1, "psychologist_id": 1, "date": date(2030, 1, 7), "time": "10:00"}
+
+    async def scenario():
+        async with sessions() as db:
+            first = await book_appointment(db, values)
+            with pytest.raises(HTTPException) as conflict:
+                await book_appointment(db, values)
+            assert conflict.value.status_code == 409
+            first.status = AppointmentStatus.CANCELADO
+            await db.commit()
+            second = await book_appointment(db, values)
+            return first.id, second.id
+
+    first_id, second_id = asyncio.run(scenario())
+    assert second_id != first_id
+
+
+def test_bookings_conflict_by_duration(sessions):
+    day = date(2030, 1, 7)
+
+    async def book(time_value, duration=50, psychologist_id=1):
+        async with sessions() as db:
+            try:
+                appointment = await book_appointment(db, {
+                    "patient_id": 1, "psychologist_id": psychologist_id, "date": day,
+                    "time": time_value, "duration": duration
+                })
+                return appointment.id
+            except HTTPException as e:
+                return e.status_code
+
+    async def reschedule(appointment_id, changes):
+        async with sessions() as db:
+            appointment = await db.get(Appointment, appointment_id)
+            try:
+                await reschedule_appointment(db, appointment, changes)
+                return 200
+            except HTTPException as e:
+                return e.status_code
+
+    async def scenario():
+        long_session = await book("09:00", duration=90)
+        results = {
+            "10:00 após sessão de 90 min": await book("10:00"),
+            "09:30 dentro da sessão": await book("09:30"),
+            "08:30 avançando sobre ela": await book("08:30", duration=45),
+            "10:30 após o fim": await book("10:30"),
+            "outro psicólogo": await book("09:30", psychologist_id=2),
+            "duração acima do limite": await book("20:00", duration=600),
+        }
+        late = await book("12:00")
+        results["remarcar sobre a sessão"] = await reschedule(late, {"time": "09:45"})
+        results["remarcar para horário livre"] = await reschedule(late, {"time": "13:00"})
+        results["estender até a próxima"] = await reschedule(long_session, {"duration": 100})
+        return results
+
+    results = asyncio.run(scenario())
+    assert results["10:00 após sessão de 90 min"] == 409
+    assert results["09:30 dentro da sessão"] == 409
+    assert results["08:30 avançando sobre ela"] == 409
+    assert isinstance(results["10:30 após o fim"], int) and results["10:30 após o fim"] not in (400, 409)
+    assert results["outro psicólogo"] not in (400, 409)
+    assert results["duração acima do limite"] == 400
+    assert results["remarcar sobre a sessão"] == 409
+    assert results["remarcar para horário livre"] == 200
+    assert results["estender até a próxima"] == 409
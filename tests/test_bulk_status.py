@@ -0,0 +1,133 @@
+import pytest
+from fastapi.testclient import TestClient
+import routers.appointments
+from core.database import SessionLocal
+from models.models import Appointment
+from main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def auth_headers():
+    response = client.post("/api/v1/auth/login", json={
+        "email": "ana@test.com",
+        "password": "123456"
+    })
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def created():
+    """Ids dos agendamentos criados no teste, removidos ao final"""
+    ids = []
+    yield ids
+    with SessionLocal() as db:
+        db.query(Appointment).filter(Appointment.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    batches = []
+    monkeypatch.setattr(routers.appointments, "send_email_appointment", lambda *args, **kwargs: None)
+    monkeypatch.setattr(routers.appointments, "send_email_appointment_status_batch", batches.append)
+    return batches
+
+
+def book(headers, created, day, hour):
+    response = client.post("/api/v1/appointments/", json={
+        "patient_id": 1, "psychologist_id": 2, "date": day, "time": hour, "description": "Lote"
+    }, headers=headers)
+    assert response.status_code == 200
+    created.append(response.json()["id"])
+    return response.json()["id"]
+
+
+def test_bulk_status_reports_each_item(auth_headers, sent, created):
+    done, cancelled = book(auth_headers, created, "2032-06-07", "09:00"), book(auth_headers, created, "2032-06-07", "10:00")
+    cursor = client.get("/api/v1/appointments/changes", headers=auth_headers).json()
+    while cursor["has_more"]:
+        cursor = client.get(f"/api/v1/appointments/changes?since={cursor['cursor']}", headers=auth_headers).json()
+
+    response = client.put("/api/v1/appointments/bulk-status", json={"items": [
+        {"id": done, "status": "concluido"},
+        {"id": cancelled, "status": "cancelado"},
+        {"id": 999999, "status": "concluido"},
+    ]}, headers=auth_headers)
+    assert response.status_code == 200
+    assert [(item["id"], item["result"], item["status"]) for item in response.json()] == [
+        (done, "updated", "concluido"), (cancelled, "updated", "cancelado"), (999999, "not_found", None)
+    ]
+
+    # Um único lote de e-mails com as duas mudanças
+    assert len(sent) == 1
+    assert sorted(message["new_status"] for message in sent[0]) == ["cancelado", "concluido"]
+
+    # Repetir não muda nada nem envia e-mails
+    response = client.put("/api/v1/appointments/bulk-status", json={"items": [{"id": done, "status": "concluido"}]},
+                          headers=auth_headers)
+    assert response.json()[0]["result"] == "unchanged"
+    assert len(sent) == 1
+
+    # A mudança em lote aparece no feed de sincronização
+    changes = client.get(f"/api/v1/appointments/changes?since={cursor['cursor']}", headers=auth_headers).json()["changes"]
+    assert [(change["appointment_id"], change["action"]) for change in changes] == [(done, "update"), (cancelled, "cancel")]
+
+
+def test_bulk_reactivation_checks_overlap(auth_headers, sent, created):
+    first = book(auth_headers, created, "2032-06-14", "09:00")
+    client.put("/api/v1/appointments/bulk-status", json={"items": [{"id": first, "status": "cancelado"}]},
+               headers=auth_headers)
+    book(auth_headers, created, "2032-06-14", "09:30")
+
+    response = client.put("/api/v1/appointments/bulk-status", json={"items": [{"id": first, "status": "agendado"}]},
+                          headers=auth_headers)
+    assert response.json() == [{"id": first, "result": "conflict", "old_status": "cancelado", "status": None}]
+
+
+def test_bulk_reactivations_check_each_other(auth_headers, sent, created):
+    first = book(auth_headers, created, "2032-06-21", "09:00")
+    client.put("/api/v1/appointments/bulk-status", json={"items": [{"id": first, "status": "cancelado"}]},
+               headers=auth_headers)
+    second = book(auth_headers, created, "2032-06-21", "09:30")
+    client.put("/api/v1/appointments/bulk-status", json={"items": [{"id": second, "status": "cancelado"}]},
+               headers=auth_headers)
+
+    # Nenhuma sessão ativa no horário, mas as duas reativações se sobrepõem
+    response = client.put("/api/v1/appointments/bulk-status", json={"items": [
+        {"id": second, "status": "agendado"},
+        {"id": first, "status": "agendado"},
+    ]}, headers=auth_headers)
+    assert response.status_code == 200
+    assert [(item["id"], item["result"]) for item in response.json()] == [(second, "conflict"), (first, "updated")]
+
+
+def test_bulk_status_notifies_each_patient_once(auth_headers, sent, created):
+    # Paciente 2 com conta de usuário (ligada pelo e-mail)
+    login = client.post("/api/v1/auth/login", json={"email": "paciente2@test.com", "password": "123456"})
+    if login.status_code != 200:
+        login = client.post("/api/v1/auth/register", json={
+            "email": "paciente2@test.com", "password": "123456", "name": "Paciente 2", "type": "paciente"
+        })
+    patient_headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    before = {item["id"] for item in client.get("/api/v1/notifications/?limit=100", headers=patient_headers).json()}
+
+    ids = []
+    for hour in ("09:00", "10:00"):
+        response = client.post("/api/v1/appointments/", json={
+            "patient_id": 2, "psychologist_id": 2, "date": "2032-06-28", "time": hour, "description": "Lote"
+        }, headers=auth_headers)
+        created.append(response.json()["id"])
+        ids.append(response.json()["id"])
+
+    response = client.put("/api/v1/appointments/bulk-status", json={
+        "items": [{"id": appointment_id, "status": "cancelado"} for appointment_id in ids]
+    }, headers=auth_headers)
+    assert [item["result"] for item in response.json()] == ["updated", "updated"]
+
+    new = [item for item in client.get("/api/v1/notifications/?limit=100", headers=patient_headers).json()
+           if item["id"] not in before]
+    assert len(new) == 1
+    assert new[0]["type"] == "cancelamento"
+    assert "2032-06-28 às 09:00" in new[0]["message"] and "2032-06-28 às 10:00" in new[0]["message"]
@@ -0,0 +1,124 @@
+import pytest
+from fastapi.testclient import TestClient
+import routers.appointments
+from core.database import SessionLocal
+from models.models import Appointment
+from services.calendar_service import _fold, calendar_cache, create_calendar_token
+from main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def no_emails(monkeypatch):
+    monkeypatch.setattr(routers.appointments, "send_email_appointment", lambda *args, **kwargs: None)
+
+
+@pytest.fixture
+def created():
+    """Ids dos agendamentos criados no teste, removidos ao final"""
+    ids = []
+    yield ids
+    with SessionLocal() as db:
+        db.query(Appointment).filter(Appointment.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+
+
+@pytest.fixture
+def auth_headers():
+    response = client.post("/api/v1/auth/login", json={
+        "email": "ana@test.com",
+        "password": "123456"
+    })
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_long_lines_are_folded():
+    folded = _fold("SUMMARY:" + "Sessão de acompanhamento " * 10)
+    lines = folded.split("\r\n")
+    assert all(len(line.encode()) <= 75 for line in lines)
+    assert "".join(line[1:] if i else line for i, line in enumerate(lines[:-1])).startswith("SUMMARY:Sessão")
+
+
+def test_calendar_feed_etag_and_cache(auth_headers, created):
+    url = client.get("/api/v1/calendar/subscription", headers=auth_headers).json()["url"]
+    path = url[url.index("/api/v1"):]
+
+    # Sem Authorization: o token da URL basta
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/calendar")
+    assert response.text.startswith("BEGIN:VCALENDAR\r\n") and response.text.endswith("END:VCALENDAR\r\n")
+    etag, body = response.headers["etag"], response.content
+
+    # Mesma versão: 304 sem corpo
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # Sem If-None-Match, o corpo já gerado é reaproveitado
+    hits = calendar_cache.stats["hits"]
+    response = client.get(path)
+    assert response.content == body
+    assert calendar_cache.stats["hits"] == hits + 1
+
+    response = client.post("/api/v1/appointments/", json={
+        "patient_id": 1, "psychologist_id": 2, "date": "2032-05-03", "time": "09:00", "description": "Sessão ICS"
+    }, headers=auth_headers)
+    created.append(response.json()["id"])
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert "DTSTART:20320503T090000" in response.text
+    assert "SUMMARY:Sessão ICS" in response.text
+
+
+def test_calendar_token_is_not_an_access_token():
+    token = create_calendar_token(2, "nonce")
+    assert client.get("/api/v1/appointments/", headers={"Authorization": f"Bearer {token}"}).status_code == 401
+    assert client.get("/api/v1/calendar/not-a-token.ics").status_code == 404
+
+
+def test_calendar_subscription_regenerate_and_revoke(auth_headers):
+    def feed_path(url):
+        return url[url.index("/api/v1"):]
+
+    old = feed_path(client.get("/api/v1/calendar/subscription", headers=auth_headers).json()["url"])
+    # Consultar de novo devolve a mesma URL
+    assert feed_path(client.get("/api/v1/calendar/subscription", headers=auth_headers).json()["url"]) == old
+
+    response = client.post("/api/v1/calendar/subscription/regenerate", headers=auth_headers)
+    assert response.status_code == 200
+    new = feed_path(response.json()["url"])
+    assert new != old
+    assert client.get(old).status_code == 404
+    assert client.get(new).status_code == 200
+
+    assert client.delete("/api/v1/calendar/subscription", headers=auth_headers).status_code == 204
+    assert client.get(new).status_code == 404
+
+    # Uma nova assinatura volta a funcionar, sem reativar as URLs antigas
+    renewed = feed_path(client.get("/api/v1/calendar/subscription", headers=auth_headers).json()["url"])
+    assert client.get(renewed).status_code == 200
+    assert client.get(new).status_code == 404
+
+
+def test_calendar_version_never_goes_back(auth_headers, created):
+    url = client.get("/api/v1/calendar/subscription", headers=auth_headers).json()["url"]
+    path = url[url.index("/api/v1"):]
+    first = client.get(path).headers["etag"]
+
+    response = client.post("/api/v1/appointments/", json={
+        "patient_id": 1, "psychologist_id": 2, "date": "2032-05-10", "time": "09:00", "description": "Troca"
+    }, headers=auth_headers)
+    created.append(response.json()["id"])
+    second = client.get(path).headers["etag"]
+
+    # Sai da agenda: a versão sobe, sem repetir um ETag já emitido
+    with SessionLocal() as db:
+        db.get(Appointment, response.json()["id"]).psychologist_id = 1
+        db.commit()
+    third = client.get(path)
+    assert third.headers["etag"] not in (first, second)
+    assert "Troca" not in third.text
+    assert client.get(path, headers={"If-None-Match": first}).status_code == 200
@@ -0,0 +1,167 @@
+import asyncio
+import pytest
+from datetime import date, datetime, timedelta, timezone
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import Session
+from core.database import AsyncSessionLocal, Base, make_async_sessionmaker
+from core.pagination import NEXT_CURSOR_HEADER, decode_cursor
+from models.models import Appointment, AppointmentChange, UserType
+from services.auth_service import Principal
+from services.change_feed_service import change_log_watermark, compact_change_log, fetch_changes
+import routers.appointments
+import services.email_service
+from main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def no_emails(monkeypatch):
+    for module, name in (
+        (routers.appointments, "send_email_appointment"),
+        (services.email_service, "send_email_appointment_status_update"),
+        (services.email_service, "send_email_appointment_status_cancel"),
+    ):
+        monkeypatch.setattr(module, name, lambda *args, **kwargs: None)
+
+
+@pytest.fixture
+def auth_headers():
+    response = client.post("/api/v1/auth/login", json={
+        "email": "ana@test.com",
+        "password": "123456"
+    })
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def latest_cursor(headers):
+    page = client.get("/api/v1/appointments/changes", headers=headers).json()
+    while page["has_more"]:
+        page = client.get(f"/api/v1/appointments/changes?since={page['cursor']}", headers=headers).json()
+    return page["cursor"]
+
+
+def test_feed_returns_only_changes_after_cursor(auth_headers):
+    cursor = latest_cursor(auth_headers)
+    response = client.post("/api/v1/appointments/", json={
+        "patient_id": 1, "psychologist_id": 2, "date": "2032-03-01", "time": "09:00", "description": "Feed"
+    }, headers=auth_headers)
+    appointment_id = response.json()["id"]
+    client.put(f"/api/v1/appointments/{appointment_id}", json={"time": "11:00"}, headers=auth_headers)
+
+    response = client.get(f"/api/v1/appointments/changes?since={cursor}", headers=auth_headers)
+    assert response.status_code == 200
+    page = response.json()
+    # Inserção e alteração do mesmo agendamento viram uma entrada com o estado atual
+    assert [change["appointment_id"] for change in page["changes"]] == [appointment_id]
+    assert page["changes"][0]["appointment"]["time"] == "11:00"
+    assert page["has_more"] is False
+
+    cursor = page["cursor"]
+    assert client.get(f"/api/v1/appointments/changes?since={cursor}", headers=auth_headers).json()["changes"] == []
+
+    client.put(f"/api/v1/appointments/{appointment_id}", json={"status": "cancelado"}, headers=auth_headers)
+    changes = client.get(f"/api/v1/appointments/changes?since={cursor}", headers=auth_headers).json()["changes"]
+    assert [(change["appointment_id"], change["action"]) for change in changes] == [(appointment_id, "cancel")]
+
+
+def test_feed_pages_and_survives_compaction(auth_headers):
+    cursor = latest_cursor(auth_headers)
+    ids = []
+    for hour in ("08:00", "12:00", "16:00"):
+        response = client.post("/api/v1/appointments/", json={
+            "patient_id": 2, "psychologist_id": 2, "date": "2032-03-08", "time": hour, "description": "Feed"
+        }, headers=auth_headers)
+        ids.append(response.json()["id"])
+
+    page = client.get(f"/api/v1/appointments/changes?since={cursor}&limit=2", headers=auth_headers).json()
+    assert page["has_more"] is True
+    assert [change["appointment_id"] for change in page["changes"]] == ids[:2]
+
+    for appointment_id in ids:
+        client.put(f"/api/v1/appointments/{appointment_id}", json={"status": "cancelado"}, headers=auth_headers)
+
+    async def compact():
+        async with AsyncSessionLocal() as db:
+            return await compact_change_log(db)
+
+    assert asyncio.run(compact()) > 0
+    # O cursor anterior à compactação continua entregando o estado final
+    changes = client.get(f"/api/v1/appointments/changes?since={cursor}", headers=auth_headers).json()["changes"]
+    assert [(change["appointment_id"], change["action"]) for change in changes] == [(i, "cancel") for i in ids]
+
+
+def test_cancelled_series_appears_in_feed(auth_headers):
+    cursor = latest_cursor(auth_headers)
+    series = client.post("/api/v1/appointments/series/", json={
+        "patient_id": 1, "start_date": "2032-04-05", "time": "15:00", "occurrences": 2, "description": "Feed"
+    }, headers=auth_headers).json()
+    client.delete(f"/api/v1/appointments/series/{series['id']}?from_date=2032-04-01", headers=auth_headers)
+
+    changes = client.get(f"/api/v1/appointments/changes?since={cursor}", headers=auth_headers).json()["changes"]
+    assert {(change["appointment_id"], change["action"]) for change in changes} == {
+        (appointment["id"], "cancel") for appointment in series["appointments"]
+    }
+    assert all(change["appointment"]["status"] == "cancelado" for change in changes)
+
+
+def test_update_without_real_change_is_not_logged():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        appointment = Appointment(psychologist_id=1, patient_id=1, date=date(2032, 3, 15), time="09:00",
+                                  description="Feed")
+        db.add(appointment)
+        db.commit()
+
+        def logged():
+            return db.scalar(select(func.count(AppointmentChange.id)))
+
+        # Mesmo valor do que foi carregado: o objeto fica "sujo", mas nada muda
+        appointment.description = appointment.description
+        db.commit()
+        assert logged() == 1
+
+        appointment.description = "Feed alterado"
+        db.commit()
+        assert logged() == 2
+    engine.dispose()
+
+
+def test_retention_expires_old_cursors(tmp_path):
+    url = f"sqlite:///{tmp_path / 'feed.db'}"
+    sync_engine = create_engine(url)
+    Base.metadata.create_all(bind=sync_engine)
+    old = datetime.now(timezone.utc) - timedelta(days=40)
+    with Session(sync_engine) as db:
+        db.add_all([
+            AppointmentChange(appointment_id=i % 3, psychologist_id=1, action="update", changed_at=old)
+            for i in range(7)
+        ] + [
+            AppointmentChange(appointment_id=i, psychologist_id=1, action="update") for i in (10, 11, 10)
+        ])
+        db.commit()
+    sync_engine.dispose()
+
+    engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"))
+    principal = Principal(id=1, type=UserType.PSICOLOGO, email="ana@test.com", name="Ana")
+
+    async def scenario():
+        try:
+            async with make_async_sessionmaker(engine)() as db:
+                # Lotes de 2: a retenção para na primeira entrada recente
+                assert await compact_change_log(db, retention_days=30, batch_size=2) == 8
+                assert await change_log_watermark(db) == 7
+                with pytest.raises(HTTPException) as error:
+                    await fetch_changes(db, principal, 3)
+                assert error.value.status_code == 410
+                assert decode_cursor(error.value.headers[NEXT_CURSOR_HEADER])[1] == 10
+                items, last_id, _ = await fetch_changes(db, principal, 7)
+                return [change.appointment_id for change, _ in items], last_id
+        finally:
+            await engine.dispose()
+
+    assert asyncio.run(scenario()) == ([11, 10], 10)
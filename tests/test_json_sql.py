@@ -0,0 +1,34 @@
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from core.database import Base
+from core.json_sql import json_array_contains
+from models.models import Request
+
+
+def test_json_array_contains_filters_in_sql():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        db.add_all([
+            Request(patient_email="a@test.com", preferred_dates=["2030-01-07", "2030-01-08"]),
+            Request(patient_email="b@test.com", preferred_dates=["2030-01-09"]),
+            Request(patient_email="c@test.com", preferred_dates=[]),
+        ])
+        db.commit()
+
+        emails = db.scalars(
+            select(Request.patient_email).where(json_array_contains(Request.preferred_dates, "2030-01-08"))
+        ).all()
+        loaded = db.scalars(select(Request).where(Request.patient_email == "a@test.com")).one()
+
+    assert emails == ["a@test.com"]
+    assert loaded.preferred_dates == ["2030-01-07", "2030-01-08"]
+    engine.dispose()
+
+
+def test_json_array_contains_compiles_for_postgresql():
+    from sqlalchemy.dialects import postgresql
+    sql = str(select(Request.id).where(
+        json_array_contains(Request.preferred_dates, "2030-01-07")
+    ).compile(dialect=postgresql.dialect()))
+    assert "@> jsonb_build_array" in sql
@@ -0,0 +1,187 @@
+from sqlalchemy import create_engine, inspect, Table, Column, Integer, String, MetaData
+from core.database import Base
+from core.migrations import (
+    run_migrations, get_schema_version, latest_version, ensure_schema, backfill_in_batches,
+    wrap_invalid_json
+)
+
+
+def make_engine(tmp_path, name="migracao.db"):
+    return create_engine(f"sqlite:///{tmp_path / name}")
+
+
+def test_fresh_database_reaches_latest_version(tmp_path):
+    engine = make_engine(tmp_path)
+    assert get_schema_version(engine) == 0
+
+    applied = run_migrations(engine)
+
+    assert applied[-1] == latest_version()
+    assert get_schema_version(engine) == latest_version()
+    assert "appointments" in inspect(engine).get_table_names()
+    assert run_migrations(engine) == []
+    engine.dispose()
+
+
+def test_legacy_database_gets_new_indexes(tmp_path):
+    engine = make_engine(tmp_path)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP INDEX ix_appointments_psychologist_date_status")
+        connection.exec_driver_sql("DROP INDEX ix_notifications_user_read_created")
+
+    ensure_schema(engine)
+
+    names = {index["name"] for table in ("appointments", "notifications")
+             for index in inspect(engine).get_indexes(table)}
+    assert "ix_appointments_psychologist_date_status" in names
+    assert "ix_notifications_user_read_created" in names
+    engine.dispose()
+
+
+def test_backfill_runs_in_batches(tmp_path):
+    engine = make_engine(tmp_path)
+    table = Table(
+        "itens", MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("nome", String),
+        Column("slug", String, nullable=True),
+    )
+    table.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(table.insert(), [{"nome": f"Item {i}"} for i in range(25)])
+
+    total = backfill_in_batches(
+        engine, table, table.c.slug.is_(None),
+        lambda row: {"slug": row.nome.lower().replace(" ", "-")},
+        batch_size=10
+    )
+
+    assert total == 25
+    with engine.connect() as connection:
+        slugs = [row.slug for row in connection.execute(table.select().order_by(table.c.id))]
+    assert slugs[0] == "item-0" and None not in slugs
+    engine.dispose()
+
+
+def test_appointment_bounds_backfilled_on_legacy_database(tmp_path):
+    engine = make_engine(tmp_path)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP INDEX ix_appointments_psychologist_start")
+        connection.exec_driver_sql("DROP INDEX ix_appointments_patient_start")
+        connection.exec_driver_sql("DROP INDEX ix_appointments_active_slot")
+        connection.exec_driver_sql("DROP INDEX ix_appointments_series_start")
+        connection.exec_driver_sql("ALTER TABLE appointments DROP COLUMN start_at")
+        connection.exec_driver_sql("ALTER TABLE appointments DROP COLUMN end_at")
+        connection.exec_driver_sql(
+            "INSERT INTO appointments (psychologist_id, date, time, duration) VALUES "
+            "(1, '2030-01-07', '10:00', 50), (1, '2030-01-07', 'manhã', 50)"
+        )
+
+    ensure_schema(engine)
+
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(
+            "SELECT start_at, end_at FROM appointments ORDER BY id"
+        ).fetchall()
+    assert rows[0] == ("2030-01-07 10:00:00.000000", "2030-01-07 10:50:00.000000")
+    assert rows[1] == (None, None)
+    names = {index["name"] for index in inspect(engine).get_indexes("appointments")}
+    assert "ix_appointments_psychologist_start" in names
+    engine.dispose()
+
+
+def test_json_text_and_schedule_exceptions_migrated(tmp_path):
+    engine = make_engine(tmp_path)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE schedule_exceptions")
+        connection.exec_driver_sql("ALTER TABLE schedules ADD COLUMN exceptions TEXT")
+        connection.exec_driver_sql(
+            "INSERT INTO schedules (psychologist_id, day_of_week, exceptions) VALUES "
+            "(1, 0, '[\"2030-01-07\", \"2030-01-14\", \"2030-01-07\", \"inválida\"]')"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO requests (patient_email, preferred_dates, preferred_times) VALUES "
+            "('a@test.com', '[\"2030-01-07\"]', ''), ('b@test.com', NULL, 'manhã')"
+        )
+
+    run_migrations(engine)
+
+    with engine.connect() as connection:
+        dates = connection.exec_driver_sql(
+            "SELECT date FROM schedule_exceptions ORDER BY date"
+        ).scalars().all()
+        requests = connection.exec_driver_sql(
+            "SELECT preferred_dates, preferred_times FROM requests ORDER BY id"
+        ).fetchall()
+    assert dates == ["2030-01-07", "2030-01-14"]
+    assert requests == [('["2030-01-07"]', "[]"), ("[]", '["manhã"]')]
+    assert "exceptions" not in {col["name"] for col in inspect(engine).get_columns("schedules")}
+    engine.dispose()
+
+
+def test_invalid_json_text_wrapped_before_cast(tmp_path):
+    # Caminho do PostgreSQL: o cast para JSON abortaria no primeiro texto inválido
+    engine = make_engine(tmp_path)
+    table = Table("itens", MetaData(), Column("id", Integer, primary_key=True), Column("dados", String))
+    table.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(table.insert(), [{"dados": '{"a": 1}'}, {"dados": "texto solto"}])
+        assert wrap_invalid_json(connection, "itens", "dados", "{}") == 1
+
+    with engine.connect() as connection:
+        values = connection.execute(table.select().order_by(table.c.id)).fetchall()
+    assert [row.dados for row in values] == ['{"a": 1}', '{"raw": "texto solto"}']
+    engine.dispose()
+
+
+def test_legacy_refresh_tokens_hashed(tmp_path):
+    from models.models import RefreshToken
+    engine = make_engine(tmp_path)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE refresh_tokens")
+        connection.exec_driver_sql(
+            "CREATE TABLE refresh_tokens (id INTEGER PRIMARY KEY, token VARCHAR, user_id INTEGER, "
+            "expires_at DATETIME, is_revoked BOOLEAN, created_at DATETIME)"
+        )
+        connection.exec_driver_sql("CREATE UNIQUE INDEX ix_refresh_tokens_token ON refresh_tokens (token)")
+        connection.exec_driver_sql(
+            "INSERT INTO refresh_tokens (token, user_id, expires_at, is_revoked) VALUES "
+            "('ativo', 1, '2999-01-01 00:00:00', 0), ('revogado', 1, '2999-01-01 00:00:00', 1), "
+            "('expirado', 1, '2000-01-01 00:00:00', 0)"
+        )
+
+    run_migrations(engine)
+
+    with engine.connect() as connection:
+        hashes = connection.exec_driver_sql("SELECT token_hash FROM refresh_tokens").scalars().all()
+    assert hashes == [RefreshToken.hash_token("ativo")]
+    assert "token" not in {col["name"] for col in inspect(engine).get_columns("refresh_tokens")}
+    names = {index["name"] for index in inspect(engine).get_indexes("refresh_tokens")}
+    assert {"ix_refresh_tokens_token_hash", "ix_refresh_tokens_user_created"} <= names
+    engine.dispose()
+
+
+def test_duplicate_active_slots_resolved_before_unique_index(tmp_path):
+    engine = make_engine(tmp_path)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP INDEX ix_appointments_active_slot")
+        connection.exec_driver_sql(
+            "INSERT INTO appointments (psychologist_id, date, time, duration, status, start_at) VALUES "
+            "(1, '2030-01-07', '10:00', 50, 'AGENDADO', '2030-01-07 10:00:00.000000'), "
+            "(1, '2030-01-07', '10:00', 50, 'AGENDADO', '2030-01-07 10:00:00.000000'), "
+            "(1, '2030-01-07', '11:00', 50, 'AGENDADO', '2030-01-07 11:00:00.000000')"
+        )
+
+    run_migrations(engine)
+
+    with engine.connect() as connection:
+        statuses = connection.exec_driver_sql("SELECT status FROM appointments ORDER BY id").scalars().all()
+    assert statuses == ["AGENDADO", "CANCELADO", "AGENDADO"]
+    names = {index["name"] for index in inspect(engine).get_indexes("appointments")}
+    assert "ix_appointments_active_slot" in names
+    engine.dispose()
@@ -0,0 +1,151 @@
+import pytest
+from datetime import date, datetime, timedelta
+from fastapi import HTTPException, Response
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from core.database import Base
+from core.pagination import (
+    PageParams, decode_cursor, encode_cursor, finish_page, keyset, offset_page, NEXT_CURSOR_HEADER
+)
+from models.models import Appointment, Notification
+from main import app
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def walk(db, statement, id_column, sort_column, sort_attr, descending, limit=3):
+    seen, cursor = [], None
+    while True:
+        page = PageParams(cursor=cursor, limit=limit)
+        response = Response()
+        rows = finish_page(
+            db.scalars(keyset(statement, page, id_column, sort_column, descending)).all(),
+            page, response, sort_attr
+        )
+        assert len(rows) <= limit
+        seen.extend(row.id for row in rows)
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return seen
+
+
+def test_cursor_roundtrip():
+    for value in (datetime(2030, 1, 7, 10, 0), date(2030, 1, 7), "abc", 42, None):
+        assert decode_cursor(encode_cursor(value, 7)) == (value, 7)
+    with pytest.raises(HTTPException):
+        decode_cursor("não-é-cursor")
+
+
+def test_ascending_pages_cover_all_rows_with_nulls(db):
+    base = datetime(2030, 1, 7, 9, 0)
+    db.add_all([
+        Appointment(psychologist_id=1, date=(base + timedelta(hours=i % 4)).date(),
+                    time=f"{9 + i % 4:02d}:00" if i % 5 else "inválida")
+        for i in range(11)
+    ])
+    db.commit()
+    expected = db.scalars(
+        select(Appointment.id).order_by(Appointment.start_at.asc().nulls_first(), Appointment.id)
+    ).all()
+
+    seen = walk(db, select(Appointment).where(Appointment.psychologist_id == 1),
+                Appointment.id, Appointment.start_at, "start_at", descending=False)
+
+    assert seen == expected
+
+
+def test_descending_pages_cover_all_rows_with_ties(db):
+    created = datetime(2030, 1, 7, 9, 0)
+    db.add_all([
+        Notification(user_id=1, title=str(i), created_at=created if i % 2 else None)
+        for i in range(8)
+    ] + [Notification(user_id=1, title="novo", created_at=created + timedelta(days=1))])
+    db.commit()
+    expected = db.scalars(
+        select(Notification.id).order_by(Notification.created_at.desc().nulls_first(), Notification.id.desc())
+    ).all()
+
+    seen = walk(db, select(Notification).where(Notification.user_id == 1),
+                Notification.id, Notification.created_at, "created_at", descending=True)
+
+    assert seen == expected
+
+
+def test_list_endpoint_returns_next_cursor():
+    client = TestClient(app)
+    first = client.get("/api/v1/psychologists/?limit=1")
+    assert first.status_code == 200
+    assert len(first.json()) == 1
+    cursor = first.headers.get(NEXT_CURSOR_HEADER)
+    if cursor:
+        second = client.get(f"/api/v1/psychologists/?limit=1&cursor={cursor}")
+        assert second.json()[0]["id"] != first.json()[0]["id"]
+    assert client.get("/api/v1/psychologists/?cursor=xyz").status_code == 400
+    assert client.get("/api/v1/psychologists/?limit=1000").status_code == 422
+
+
+def test_legacy_offset_matches_keyset_order(db):
+    created = datetime(2030, 1, 7, 9, 0)
+    db.add_all([Notification(user_id=1, title=str(i), created_at=created + timedelta(hours=i % 3)) for i in range(7)])
+    db.commit()
+    statement = select(Notification).where(Notification.user_id == 1)
+    expected = walk(db, statement, Notification.id, Notification.created_at, "created_at", descending=True)
+
+    params, seen = PageParams(cursor=None, limit=3), []
+    for offset in range(0, 9, 3):
+        seen.extend(row.id for row in db.scalars(offset_page(
+            statement, params, offset, Notification.id, Notification.created_at, descending=True
+        )))
+    assert seen == expected
+
+
+def test_legacy_page_parameters_still_accepted():
+    client = TestClient(app)
+    token = client.post("/api/v1/auth/login", json={"email": "ana@test.com", "password": "123456"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = client.get("/api/v1/notifications/?page=2&limit=5", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["Deprecation"] == "true"
+    response = client.get("/api/v1/chat/history?offset=10", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["Deprecation"] == "true"
+    assert "Deprecation" not in client.get("/api/v1/notifications/", headers=headers).headers
+
+
+def test_unpaginated_list_still_returns_every_row():
+    client = TestClient(app)
+    token = client.post("/api/v1/auth/login", json={"email": "ana@test.com", "password": "123456"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    # Sem cursor nem limit: lista completa, como antes da paginação
+    legacy = client.get("/api/v1/appointments/", headers=headers)
+    assert legacy.status_code == 200
+    assert legacy.headers["Deprecation"] == "true"
+    assert NEXT_CURSOR_HEADER not in legacy.headers
+
+    ids, cursor = [], None
+    while True:
+        url = "/api/v1/appointments/?limit=2" + (f"&cursor={cursor}" if cursor else "")
+        page = client.get(url, headers=headers)
+        assert "Deprecation" not in page.headers
+        ids.extend(item["id"] for item in page.json())
+        cursor = page.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            break
+    assert ids == [item["id"] for item in legacy.json()]
+
+
+def test_cors_exposes_next_cursor_to_credentialed_requests():
+    client = TestClient(app)
+    response = client.get("/api/v1/psychologists/?limit=1", headers={"Origin": "http://localhost:3000"})
+    assert response.headers["access-control-allow-credentials"] == "true"
+    assert NEXT_CURSOR_HEADER in response.headers["access-control-expose-headers"].split(", ")
@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from services.password_service import PasswordHasher
+import services.password_service as password_service
+
+
+@pytest.fixture
+def fast_context(monkeypatch):
+    context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=5)
+    monkeypatch.setattr(password_service, "pwd_context", context)
+    return context
+
+
+@pytest.mark.asyncio
+async def test_verify_runs_in_pool_and_rehashes_old_cost(fast_context):
+    hasher = PasswordHasher(workers=2, max_queue=2)
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("segredo")
+
+    valid, new_hash = await hasher.verify_and_update("segredo", old_hash)
+    assert valid and new_hash.startswith("$2b$05$")
+
+    valid, new_hash = await hasher.verify_and_update("errada", old_hash)
+    assert not valid and new_hash is None
+
+    current = await hasher.hash("segredo")
+    assert await hasher.verify_and_update("segredo", current) == (True, None)
+    hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_returns_503(fast_context):
+    hasher = PasswordHasher(workers=1, max_queue=1)
+    hashed = fast_context.hash("segredo")
+
+    results = await asyncio.gather(
+        *(hasher.verify_and_update("segredo", hashed) for _ in range(6)),
+        return_exceptions=True
+    )
+
+    rejected = [r for r in results if isinstance(r, HTTPException)]
+    assert rejected and all(r.status_code == 503 for r in rejected)
+    assert any(r == (True, None) for r in results)
+    assert hasher.snapshot()["rejected"] == len(rejected)
+    hasher.shutdown()
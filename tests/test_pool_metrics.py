@@ -0,0 +1,70 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from core import database, pool_metrics
+from main import app
+
+
+@pytest.fixture
+def small_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_POOL_SIZE", 1)
+    monkeypatch.setattr(database, "DB_MAX_OVERFLOW", 1)
+    monkeypatch.setattr(database, "DB_POOL_TIMEOUT", 0.05)
+    engine = database.build_engine(f"sqlite:///{tmp_path / 'pool.db'}", "test_pool")
+    yield engine
+    engine.dispose()
+    pool_metrics.unregister("test_pool")
+
+
+def test_checkout_latency_and_counters(small_pool):
+    with small_pool.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+    metrics = pool_metrics.registry["test_pool"].snapshot()
+    assert metrics["counters"]["connects"] == 1
+    assert metrics["counters"]["checkouts"] == 1
+    assert metrics["counters"]["checkins"] == 1
+    assert metrics["checkout_latency_ms"]["count"] == 1
+    assert metrics["pool"]["size"] == 1
+    assert metrics["pool"]["checked_out"] == 0
+
+
+def test_overflow_and_timeout_are_counted(small_pool):
+    first = small_pool.connect()
+    second = small_pool.connect()
+    try:
+        with pytest.raises(PoolTimeoutError):
+            small_pool.connect()
+        metrics = pool_metrics.registry["test_pool"].snapshot()
+        assert metrics["pool"]["checked_out"] == 2
+    finally:
+        second.close()
+        first.close()
+
+    counters = pool_metrics.registry["test_pool"].snapshot()["counters"]
+    assert counters["overflow_checkouts"] == 1
+    assert counters["timeouts"] == 1
+
+
+def test_connection_lifetime_recorded_on_close(small_pool):
+    with small_pool.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    small_pool.dispose()
+
+    lifetime = pool_metrics.registry["test_pool"].snapshot()["connection_lifetime_s"]
+    assert lifetime["count"] == 1
+
+
+def test_internal_endpoint_exposes_pools(monkeypatch):
+    client = TestClient(app)
+    # Sem token configurado as rotas internas não são servidas
+    monkeypatch.delenv("INTERNAL_METRICS_TOKEN", raising=False)
+    assert client.get("/internal/db-pool").status_code == 404
+    assert client.get("/internal/caches").status_code == 404
+
+    monkeypatch.setenv("INTERNAL_METRICS_TOKEN", "segredo")
+    assert client.get("/internal/db-pool").status_code == 403
+    response = client.get("/internal/db-pool", headers={"X-Internal-Token": "segredo"})
+    assert response.status_code == 200
+    assert "primary" in response.json()["engines"]
@@ -0,0 +1,124 @@
+import pytest
+from datetime import date, datetime
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from constants import PAGINATION
+from core.database import Base
+from core.pagination import encode_cursor, keyset, legacy_page_params, page_params_with
+from models.models import Appointment, ChatMessage, Notification, ScheduleException, UserType
+from services.auth_service import Principal
+from services.booking_service import conflicts_query
+from services.calendar_service import calendar_chunk_query, calendar_version_query
+from services.change_feed_service import CHANGE_FEED_LIMIT, changes_query
+from routers.appointments import patient_appointments_query, patient_by_email_query, psychologist_appointments_query
+from routers.chat import history_query
+from routers.dashboard import upcoming_appointments_query
+from routers.notifications import notifications_query, unread_count_query
+from routers.patients import patients_page_query
+from routers.psychologists import psychologists_page_query
+from routers.requests import pending_request_query, requests_page_query
+from routers.schedule import exceptions_query, schedule_page_query
+
+PSYCHOLOGIST = Principal(id=1, type=UserType.PSICOLOGO, email="psi@test.com", name="Psi")
+PATIENT = Principal(id=2, type=UserType.PACIENTE, email="paciente@test.com", name="Paciente")
+START_CURSOR = encode_cursor(datetime(2030, 1, 7, 10), 100)
+CREATED_CURSOR = encode_cursor(datetime(2030, 1, 1), 100)
+ID_CURSOR = encode_cursor(None, 100)
+DEFAULT_LIMIT = PAGINATION["DEFAULT_LIMIT"]
+
+
+def list_pages(cursor):
+    """Primeira página, página seguinte (cursor) e lista completa de compatibilidade"""
+    return {
+        "first": legacy_page_params(cursor=None, limit=DEFAULT_LIMIT),
+        "next": legacy_page_params(cursor=cursor, limit=None),
+        "legacy": legacy_page_params(cursor=None, limit=None),
+    }
+
+
+def hot_queries():
+    """Consultas mais frequentes, montadas pelas mesmas funções que os routers usam"""
+    db = Session()
+    queries = {}
+    for variant, page in list_pages(START_CURSOR).items():
+        queries[f"appointments_psychologist_{variant}"] = psychologist_appointments_query(1, page)
+        queries[f"appointments_patient_{variant}"] = patient_appointments_query(1, page)
+    for variant, page in list_pages(ID_CURSOR).items():
+        queries[f"patients_{variant}"] = patients_page_query(1, page)
+        queries[f"psychologists_{variant}"] = psychologists_page_query(db, page)
+        queries[f"schedule_{variant}"] = schedule_page_query(db, 1, page)
+    for variant, page in list_pages(CREATED_CURSOR).items():
+        queries[f"requests_psychologist_{variant}"] = requests_page_query(db, PSYCHOLOGIST, page)
+        queries[f"requests_patient_{variant}"] = requests_page_query(db, PATIENT, page)
+
+    notifications_page = page_params_with(10)(cursor=CREATED_CURSOR, limit=10)
+    chat_page = page_params_with(50)(cursor=CREATED_CURSOR, limit=50)
+    queries.update({
+        "notifications_next": keyset(
+            notifications_query(1), notifications_page, Notification.id, Notification.created_at, descending=True
+        ),
+        "notifications_unread_next": keyset(
+            notifications_query(1, read=False), notifications_page, Notification.id, Notification.created_at,
+            descending=True
+        ),
+        "notifications_unread_count": unread_count_query(1),
+        "chat_history_next": keyset(
+            history_query(db, 1), chat_page, ChatMessage.id, ChatMessage.created_at, descending=True
+        ),
+        "patient_by_email": patient_by_email_query("paciente@test.com"),
+        "requests_pending_check": pending_request_query(db, "paciente@test.com", 1),
+        "appointments_overlap_conflict": conflicts_query(
+            1, [(datetime(2030, 1, 7, 10), datetime(2030, 1, 7, 10, 50))]
+        ),
+        "dashboard_psychologist_upcoming": upcoming_appointments_query(
+            Appointment.psychologist_id, 1, datetime(2030, 1, 1)
+        ),
+        "dashboard_patient_upcoming": upcoming_appointments_query(Appointment.patient_id, 1, datetime(2030, 1, 1)),
+        "schedule_exceptions_range": exceptions_query(
+            db.query(ScheduleException), 1, date(2030, 1, 1), date(2030, 1, 31)
+        ),
+        "appointment_changes_psychologist": changes_query(PSYCHOLOGIST, 100, CHANGE_FEED_LIMIT),
+        "appointment_changes_patient": changes_query(PATIENT, 100, CHANGE_FEED_LIMIT),
+        "calendar_version": calendar_version_query(1),
+        "calendar_chunk": calendar_chunk_query(1, START_CURSOR, 500),
+    })
+    # Query do ORM (routers síncronos) vira o select() equivalente
+    return {name: getattr(query, "statement", query) for name, query in queries.items()}
+
+
+HOT_QUERIES = hot_queries()
+
+
+@pytest.fixture(scope="module")
+def plan_engine():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def explain(engine, statement):
+    compiled = statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}").fetchall()
+    return [row[-1] for row in rows]
+
+
+def scan_steps(plan):
+    """Passos do plano que percorrem a tabela ou um índice inteiro"""
+    return [step for step in plan if step.startswith("SCAN")]
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_uses_index(plan_engine, name):
+    plan = explain(plan_engine, HOT_QUERIES[name])
+    assert any(step.startswith("SEARCH") for step in plan), plan
+    assert not scan_steps(plan), f"{name} faz varredura completa: {plan}"
+
+
+def test_full_index_scan_is_rejected(plan_engine):
+    # Ordenar pelo índice sem filtrar percorre o índice inteiro: SCAN ... USING INDEX
+    statement = select(Appointment).order_by(Appointment.psychologist_id, Appointment.start_at)
+    plan = explain(plan_engine, statement)
+    assert any("USING INDEX" in step for step in plan), plan
+    assert scan_steps(plan)
@@ -0,0 +1,85 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from starlette.requests import Request
+from core import database
+from core.migrations import run_migrations
+from main import app
+
+
+def make_request(token=None):
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+    return Request({"type": "http", "method": "GET", "headers": headers})
+
+
+def bound_url(dependency, request):
+    generator = dependency(request)
+    db = next(generator)
+    try:
+        return str(db.get_bind().url)
+    finally:
+        generator.close()
+
+
+@pytest.fixture
+def replicas(tmp_path):
+    urls = []
+    for name in ("replica_a.db", "replica_b.db"):
+        url = f"sqlite:///{tmp_path / name}"
+        router = database.build_engine(url)
+        run_migrations(router)
+        router.dispose()
+        urls.append(url)
+    yield database.configure_read_replicas(urls, sticky_seconds=60)
+    database.configure_read_replicas([])
+
+
+def test_reads_use_primary_without_replicas():
+    database.configure_read_replicas([])
+    assert bound_url(database.get_read_db, make_request("abc")) == str(database.engine.url)
+
+
+def test_reads_round_robin_across_replicas(replicas):
+    request = make_request("leitor")
+    urls = [bound_url(database.get_read_db, request) for _ in range(4)]
+
+    assert urls[0] != urls[1]
+    assert urls[0] == urls[2] and urls[1] == urls[3]
+    assert str(database.engine.url) not in urls
+
+
+def test_recent_writer_sticks_to_primary(replicas):
+    client = TestClient(app)
+    response = client.post(
+        "/api/v1/contact/",
+        json={"name": "A", "email": "a@test.com", "subject": "s", "message": "m"},
+        headers={"Authorization": "Bearer escritor"}
+    )
+    assert response.status_code == 200
+
+    assert bound_url(database.get_read_db, make_request("escritor")) == str(database.engine.url)
+    assert bound_url(database.get_read_db, make_request("outro")) != str(database.engine.url)
+
+
+@pytest.mark.asyncio
+async def test_async_reads_use_replica(replicas):
+    generator = database.get_async_read_db(make_request("leitor"))
+    db = await generator.__anext__()
+    try:
+        assert "replica_" in str(db.get_bind().url)
+    finally:
+        await generator.aclose()
+
+
+@pytest.mark.asyncio
+async def test_adispose_closes_async_replica_connections(replicas):
+    from core.pool_metrics import registry
+    metrics = [registry[f"replica_{i}_async"] for i in range(len(replicas.async_engines))]
+    for session_factory in replicas.async_sessions:
+        async with session_factory() as db:
+            await db.execute(text("SELECT 1"))
+
+    await replicas.adispose()
+
+    assert all(metrics_entry.counters["closes"] >= 1 for metrics_entry in metrics)
+    assert not any(name.startswith("replica_") for name in registry)
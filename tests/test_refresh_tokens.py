@@ -0,0 +1,111 @@
+import asyncio
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+import services.refresh_token_service as refresh_token_service
+from core.database import AsyncSessionLocal, SessionLocal
+from models.models import RefreshToken, User
+from main import app
+
+client = TestClient(app)
+
+
+def login():
+    response = client.post("/api/v1/auth/login", json={
+        "email": "ana@test.com",
+        "password": "123456"
+    })
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_refresh_rotates_same_row():
+    refresh_token = login()["refresh_token"]
+    with SessionLocal() as db:
+        before = db.scalar(select(func.count()).select_from(RefreshToken))
+
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 200
+    rotated = response.json()["refresh_token"]
+    assert rotated != refresh_token
+
+    with SessionLocal() as db:
+        assert db.scalar(select(func.count()).select_from(RefreshToken)) == before
+        row = db.scalars(select(RefreshToken).where(
+            RefreshToken.token_hash == RefreshToken.hash_token(rotated)
+        )).one()
+        assert row.rotated_at is not None
+        # Só o hash é gravado
+        assert db.scalars(select(RefreshToken).where(
+            RefreshToken.token_hash == RefreshToken.hash_token(refresh_token)
+        )).first() is None
+
+    reused = client.post("/api/v1/auth/refresh", json={"refresh_token": refresh_token})
+    assert reused.status_code == 401
+
+
+def test_live_tokens_capped_per_user(monkeypatch):
+    monkeypatch.setattr(refresh_token_service, "REFRESH_TOKENS_PER_USER", 3)
+    data = [login() for _ in range(5)]
+    user_id = data[-1]["user"]["id"]
+
+    with SessionLocal() as db:
+        count = db.scalar(select(func.count()).where(RefreshToken.user_id == user_id))
+    assert count == 3
+    # A sessão mais antiga foi encerrada
+    assert client.post("/api/v1/auth/refresh", json={"refresh_token": data[0]["refresh_token"]}).status_code == 401
+    assert client.post("/api/v1/auth/refresh", json={"refresh_token": data[-1]["refresh_token"]}).status_code == 200
+
+
+def test_purge_removes_expired_and_revoked():
+    with SessionLocal() as db:
+        user_id = db.scalar(select(User.id).where(User.email == "ana@test.com"))
+        expired = RefreshToken.create_token(user_id, 1)
+        expired.expires_at = datetime.utcnow() - timedelta(days=1)
+        revoked = RefreshToken.create_token(user_id, 1)
+        revoked.is_revoked = True
+        live = RefreshToken.create_token(user_id, 1)
+        db.add_all([expired, revoked, live])
+        db.commit()
+        ids = [expired.id, revoked.id, live.id]
+
+    async def purge():
+        async with AsyncSessionLocal() as db:
+            return await refresh_token_service.purge_refresh_tokens(db)
+
+    assert asyncio.run(purge()) >= 2
+    with SessionLocal() as db:
+        remaining = db.scalars(select(RefreshToken.id).where(RefreshToken.id.in_(ids))).all()
+    assert remaining == [ids[2]]
+
+
+def test_reused_token_revokes_session():
+    stolen = login()["refresh_token"]
+    rotated = client.post("/api/v1/auth/refresh", json={"refresh_token": stolen}).json()["refresh_token"]
+
+    # O token substituído reaparece: a sessão toda é encerrada
+    assert client.post("/api/v1/auth/refresh", json={"refresh_token": stolen}).status_code == 401
+    assert client.post("/api/v1/auth/refresh", json={"refresh_token": rotated}).status_code == 401
+
+
+def test_concurrent_refresh_has_single_winner():
+    refresh_token = login()["refresh_token"]
+
+    async def attempt():
+        async with AsyncSessionLocal() as db:
+            rotated = await refresh_token_service.rotate_refresh_token(db, refresh_token)
+            await db.commit()
+            return rotated.plain_token if rotated else None
+
+    async def race():
+        return await asyncio.gather(*(attempt() for _ in range(5)))
+
+    results = asyncio.run(race())
+    winners = [token for token in results if token]
+    assert len(winners) == 1
+    with SessionLocal() as db:
+        row = db.scalars(select(RefreshToken).where(
+            RefreshToken.token_hash == RefreshToken.hash_token(winners[0])
+        )).one()
+        # Os perdedores apresentaram o hash substituído: a sessão foi revogada
+        assert row.is_revoked
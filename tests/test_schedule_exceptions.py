@@ -0,0 +1,99 @@
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def auth_headers():
+    response = client.post("/api/v1/auth/login", json={
+        "email": "ana@test.com",
+        "password": "123456"
+    })
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def monday_schedule(auth_headers):
+    response = client.post("/api/v1/schedule/", json={
+        "day_of_week": 0, "start_time": "13:00", "end_time": "15:00", "slot_duration": 60
+    }, headers=auth_headers)
+    yield response.json()
+    client.delete(f"/api/v1/schedule/{response.json()['id']}", headers=auth_headers)
+
+
+def token_for(email, user_type):
+    response = client.post("/api/v1/auth/login", json={"email": email, "password": "123456"})
+    if response.status_code != 200:
+        response = client.post("/api/v1/auth/register", json={
+            "email": email, "password": "123456", "name": "Teste", "type": user_type
+        })
+    return response.json()["access_token"]
+
+
+def slots(date_from, date_to):
+    return client.get("/api/v1/appointments/available-slots/range", params={
+        "psychologist_id": 2, "date_from": date_from, "date_to": date_to
+    }).json()
+
+
+def test_vacation_blocks_and_releases_range(auth_headers, monday_schedule):
+    assert slots("2033-01-03", "2033-01-10")["2033-01-10"] == ["13:00", "14:00"]
+
+    vacation = {"date_from": "2033-01-03", "date_to": "2033-01-16", "reason": "Férias"}
+    response = client.post("/api/v1/schedule/exceptions/bulk", json=vacation, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["created"] == 14
+    assert all(day_slots == [] for day_slots in slots("2033-01-03", "2033-01-16").values())
+
+    # Repetir o mesmo período não duplica linhas
+    response = client.post("/api/v1/schedule/exceptions/bulk", json=vacation, headers=auth_headers)
+    assert (response.json()["created"], response.json()["skipped"]) == (0, 14)
+
+    # Encurta as férias: libera a segunda semana
+    response = client.delete("/api/v1/schedule/exceptions/bulk", params={
+        "date_from": "2033-01-10", "date_to": "2033-01-16"
+    }, headers=auth_headers)
+    assert response.json()["removed"] == 7
+    result = slots("2033-01-03", "2033-01-10")
+    assert result["2033-01-03"] == [] and result["2033-01-10"] == ["13:00", "14:00"]
+
+    client.delete("/api/v1/schedule/exceptions/bulk", params={
+        "date_from": "2033-01-03", "date_to": "2033-01-09"
+    }, headers=auth_headers)
+
+
+def test_bulk_exception_time_range(auth_headers, monday_schedule):
+    response = client.post("/api/v1/schedule/exceptions/bulk", json={
+        "date_from": "2033-02-07", "date_to": "2033-02-14", "schedule_id": monday_schedule["id"],
+        "start_time": "14:00", "end_time": "15:00"
+    }, headers=auth_headers)
+    assert response.json()["created"] == 8
+    result = slots("2033-02-07", "2033-02-14")
+    assert result["2033-02-07"] == result["2033-02-14"] == ["13:00"]
+
+    bad = {"date_from": "2033-02-07", "date_to": "2033-02-14", "start_time": "15:00", "end_time": "14:00"}
+    assert client.post("/api/v1/schedule/exceptions/bulk", json=bad, headers=auth_headers).status_code == 400
+    too_long = {"date_from": "2033-01-01", "date_to": "2035-01-01"}
+    assert client.post("/api/v1/schedule/exceptions/bulk", json=too_long, headers=auth_headers).status_code == 400
+
+
+def test_other_users_only_see_blocked_ranges(auth_headers):
+    client.post("/api/v1/schedule/exceptions/bulk", json={
+        "date_from": "2033-03-07", "date_to": "2033-03-07", "start_time": "09:00", "end_time": "12:00",
+        "reason": "Consulta médica"
+    }, headers=auth_headers)
+    params = {"psychologist_id": 2, "date_from": "2033-03-07", "date_to": "2033-03-07"}
+    try:
+        own = client.get("/api/v1/schedule/exceptions", params=params, headers=auth_headers).json()
+        assert own[0]["reason"] == "Consulta médica"
+
+        for email, user_type in (("excecoes.paciente@test.com", "paciente"), ("excecoes.psi@test.com", "psicologo")):
+            headers = {"Authorization": f"Bearer {token_for(email, user_type)}"}
+            response = client.get("/api/v1/schedule/exceptions", params=params, headers=headers)
+            assert response.json() == [{"date": "2033-03-07", "start_time": "09:00", "end_time": "12:00"}]
+    finally:
+        client.delete("/api/v1/schedule/exceptions/bulk", params={
+            "date_from": "2033-03-07", "date_to": "2033-03-07"
+        }, headers=auth_headers)
@@ -0,0 +1,51 @@
+import asyncio
+from fastapi import WebSocketDisconnect
+from core.database import async_engine
+from routers.websocket import websocket_endpoint
+from services.auth_service import principal_cache
+from services.websocket_manager import manager
+from utils import create_access_token
+
+
+class FakeWebSocket:
+    def __init__(self, closed: asyncio.Event):
+        self.closed = closed
+        self.accepted = False
+
+    async def accept(self):
+        self.accepted = True
+
+    async def close(self, code: int = 1000):
+        pass
+
+    async def send_json(self, message: dict):
+        pass
+
+    async def receive_text(self) -> str:
+        await self.closed.wait()
+        raise WebSocketDisconnect()
+
+
+def test_open_sockets_hold_no_pooled_connections(monkeypatch):
+    # Token só com sub e sem cache: cada handshake consulta o banco
+    monkeypatch.setattr(principal_cache, "maxsize", 0)
+    token = create_access_token({"sub": "ana@test.com"})
+
+    async def scenario():
+        closed = asyncio.Event()
+        sockets = [FakeWebSocket(closed) for _ in range(1000)]
+        tasks = [asyncio.create_task(websocket_endpoint(ws, token)) for ws in sockets]
+        while not all(ws.accepted for ws in sockets):
+            await asyncio.sleep(0.01)
+
+        checked_out = async_engine.pool.checkedout()
+        connected = sum(len(c) for c in manager.active_connections.values())
+        closed.set()
+        await asyncio.gather(*tasks)
+        return checked_out, connected
+
+    checked_out, connected = asyncio.run(scenario())
+
+    assert connected == 1000
+    assert checked_out == 0
+    assert manager.active_connections == {}
@@ -34,7 +34,17 @@ except (ValueError, TypeError):
 # CONFIGURAÇÃO DO HASH DE SENHA (Bcrypt)
 # ============================================================
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Custo do bcrypt (2^rounds iterações); hashes com outro custo são refeitos no login
+try:
+    BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+except (ValueError, TypeError):
+    BCRYPT_ROUNDS = 12
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+def truncate_password(password: str) -> str:
+    """Trunca para 72 caracteres (limite do bcrypt 3.x)"""
+    return password[:72] if len(password) > 72 else password
 
 # ------------------------------------------------------------
 # Função para verificar se a senha informada corresponde ao hash armazenado
@@ -53,10 +63,7 @@ def get_password_hash(password):
     """
     Recebe a senha em texto puro e retorna seu hash criptografado com bcrypt.
     """
-    # Trunca para 72 caracteres (limite do bcrypt 3.x)
-    if len(password) > 72:
-        password = password[:72]
-    return pwd_context.hash(password)
+    return pwd_context.hash(truncate_password(password))
 
 # ============================================================
 # CRIAÇÃO DE TOKEN JWT (Autenticação)
@@ -71,14 +78,15 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()  # Copia os dados do usuário
     
     # Define o tempo de expiração do token
+    now = datetime.now(timezone.utc)
     if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
+        expire = now + expires_delta
     else:
         # Caso nenhum tempo seja definido, o padrão é 15 minutos
-        expire = datetime.now(timezone.utc) + timedelta(minutes=15)
+        expire = now + timedelta(minutes=15)
     
-    # Adiciona a data de expiração ao dicionário de dados
-    to_encode.update({"exp": expire})
+    # Adiciona a data de emissão e a de expiração ao dicionário de dados
+    to_encode.update({"iat": now, "exp": expire})
     
     # Codifica os dados em um token JWT usando a SECRET_KEY e o algoritmo definido
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)